@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latencia de las consultas del DW: diseño plano, particionado con índices y agregados
+-------------------------------------------------------------------------------------
+Uso:
+  python bench/bench_consultas.py [--repeticiones 5] [--consultas top_clientes ...]
+                                  [--explicar] [--conservar-plano]
+                                  [--resultados bench/resultados_consultas.jsonl]
+
+Mide cada consulta (dw/consultas.py, sin cache) sobre el DW de las variables PG* (cargado
+antes con load_dw.py; para volumen, p.ej. PGDATABASE=bench_dw tras bench/bench_etapas.py
+--con-dw) de tres formas, con los mismos datos:
+
+  plano:        docs/queries_hechos.sql sobre el diseño anterior, copiado al esquema
+                bench_plano: hecho_ventas como una sola tabla con solo su clave primaria
+                (id_venta), dimensiones con su clave primaria
+  particionado: docs/queries_hechos.sql sobre el DW (dw/esquema.sql + dw/restricciones.sql):
+                particiones anuales por id_tiempo, BRIN en id_tiempo y B-tree por producto
+                y cliente
+  agregados:    docs/queries.sql, que lee los agregados de dw/agregados.py
+
+Cada consulta corre con sus parámetros por defecto (todos los años) y filtrada al último
+año con datos. Se informa la mediana y el mínimo de --repeticiones corridas (después de una
+de calentamiento) y la mejora; las mediciones se agregan a --resultados. --explicar muestra
+el plan (EXPLAIN ANALYZE) de cada consulta en las tres formas.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+BASE = Path(__file__).resolve().parents[1]
+BENCH = BASE / "bench"
+sys.path.insert(0, str(BASE / "dw"))
+from agregados import QUERIES_HECHOS  # noqa: E402
+from consultas import Consultas  # noqa: E402
+from bench_etapas import commit_actual  # noqa: E402
+
+PLANO = "bench_plano"
+# Tabla -> clave primaria en el diseño anterior
+CLAVES_PLANO = {
+    "dim_cliente": "sk_cliente",
+    "dim_producto": "sk_producto",
+    "dim_tiempo": "id_tiempo",
+    "hecho_ventas": "id_venta",
+}
+# diseño -> (search_path, consultas sobre los hechos o sobre los agregados)
+DISENOS = {"plano": (f"{PLANO}, public", "hechos"), "particionado": ("public", "hechos"),
+           "agregados": ("public", "agregados")}
+
+
+def crear_plano(conn):
+    """Copia las tablas del DW al esquema bench_plano con el diseño anterior."""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {PLANO} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {PLANO}"))
+    for tabla, clave in CLAVES_PLANO.items():
+        conn.execute(text(f"CREATE TABLE {PLANO}.{tabla} AS TABLE public.{tabla}"))
+        conn.execute(text(f"ALTER TABLE {PLANO}.{tabla} ADD PRIMARY KEY ({clave})"))
+        conn.execute(text(f"ANALYZE {PLANO}.{tabla}"))
+
+
+def variantes(q: Consultas, ultimo_anio: int) -> list:
+    """(consulta, variante, parámetros): por defecto y filtrada al último año."""
+    casos = []
+    for nombre, c in q.consultas.items():
+        casos.append((nombre, "todos los años", {}))
+        filtros = {k: ultimo_anio for k in c.parametros if k.startswith("anio")}
+        if filtros:
+            casos.append((nombre, f"año {ultimo_anio}", filtros))
+    return casos
+
+
+def medir(conn, sql: str, params: dict, repeticiones: int) -> list:
+    conn.execute(text(sql), params).fetchall()  # calentamiento (caché de páginas)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def explicar(conn, sql: str, params: dict):
+    for (linea,) in conn.execute(text(f"EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF) {sql}"), params):
+        print("    " + linea)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--consultas", nargs="+", default=None, help="Por defecto todas")
+    parser.add_argument("--explicar", action="store_true", help="Mostrar EXPLAIN ANALYZE")
+    parser.add_argument("--conservar-plano", dest="conservar_plano", action="store_true",
+                        help=f"No borrar el esquema {PLANO} al terminar")
+    parser.add_argument("--resultados", default=str(BENCH / "resultados_consultas.jsonl"))
+    args = parser.parse_args(argv)
+
+    q = Consultas(ruta_sql=QUERIES_HECHOS)
+    fuentes = {"hechos": q, "agregados": Consultas(engine=q.engine)}
+    with q.engine.connect() as conn:
+        filas = conn.execute(text("SELECT count(*), max(id_tiempo) / 10000 FROM hecho_ventas")).one()
+        if not filas[0]:
+            sys.exit("hecho_ventas está vacía: cargar el DW con load_dw.py antes de medir")
+        ultimo_anio = filas[1]
+        print(f"Hechos: {filas[0]:,} | copiando al esquema {PLANO}...", flush=True)
+        inicio = time.perf_counter()
+        crear_plano(conn)
+        conn.commit()
+        print(f"Diseño plano listo ({time.perf_counter() - inicio:.1f}s)")
+
+        casos = [c for c in variantes(q, ultimo_anio) if not args.consultas or c[0] in args.consultas]
+        commit, fecha = commit_actual(), datetime.now(timezone.utc).isoformat(timespec="seconds")
+        mediciones = []
+        try:
+            for nombre, variante, params in casos:
+                m = {"fecha": fecha, "commit": commit, "hechos": filas[0], "consulta": nombre,
+                     "variante": variante}
+                for diseno, (ruta, fuente) in DISENOS.items():
+                    consulta = fuentes[fuente].consultas[nombre]
+                    valores = consulta.valores(params)
+                    conn.execute(text(f"SET search_path TO {ruta}"))
+                    tiempos = medir(conn, consulta.sql, valores, args.repeticiones)
+                    m[diseno] = {"mediana_ms": statistics.median(tiempos), "min_ms": min(tiempos)}
+                    if args.explicar:
+                        print(f"\n-- {nombre} ({variante}), {diseno}")
+                        explicar(conn, consulta.sql, valores)
+                conn.rollback()
+                mediciones.append(m)
+        finally:
+            if not args.conservar_plano:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {PLANO} CASCADE"))
+                conn.commit()
+    q.engine.dispose()
+
+    print(f"\n{'Consulta':<22}{'Variante':<18}{'Plano (ms)':>12}{'Particionado (ms)':>19}"
+          f"{'Agregados (ms)':>16}   Mejora vs plano")
+    for m in mediciones:
+        plano = m["plano"]["mediana_ms"]
+        mejoras = " / ".join(f"{plano / m[d]['mediana_ms']:.1f}x" if m[d]["mediana_ms"] else "-"
+                             for d in ("particionado", "agregados"))
+        print(f"{m['consulta']:<22}{m['variante']:<18}{plano:>12.1f}"
+              f"{m['particionado']['mediana_ms']:>19.1f}{m['agregados']['mediana_ms']:>16.2f}   {mejoras}")
+
+    ruta = Path(args.resultados)
+    with open(ruta, "a", encoding="utf-8") as f:
+        for m in mediciones:
+            f.write(json.dumps(m, ensure_ascii=False) + "\n")
+    print(f"\nMedianas de {args.repeticiones} corridas; resultados agregados a {ruta}")
+
+
+if __name__ == "__main__":
+    main()
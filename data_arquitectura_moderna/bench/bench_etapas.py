@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark por etapa del ETL a distintas escalas, con línea base y detección de regresiones
+------------------------------------------------------------------------------------------
+Uso:
+  python bench/bench_etapas.py [--escalas 1000000 5000000] [--etapas limpia_ventas transformacion ...]
+                               [--con-dw] [--chunksize N] [--trabajo bench/_trabajo]
+                               [--resultados bench/resultados_etapas.jsonl]
+                               [--base bench/linea_base_etapas.json] [--guardar-base]
+                               [--tolerancia 0.2]
+
+Para cada escala (filas de ventas) genera los datos crudos con generar_datos.py en un
+datalake de trabajo aparte (no toca datalake/ ni datamart/ del proyecto) y corre cada
+etapa en un proceso nuevo, así el RSS pico medido es solo de esa etapa:
+
+  limpia_clientes, limpia_productos, limpia_ventas -> transformacion -> crear_datamart
+                                                                     -> load_dw (--con-dw)
+
+Si una etapa falla, las siguientes de esa escala se omiten y el script termina con
+código 1. Por etapa se registra tiempo de pared, tiempo de CPU, RSS pico y filas/s. Cada medición
+se agrega a --resultados (JSON lines, con fecha y commit) y se compara con --base: una
+etapa es regresión si su tiempo o su RSS pico superan la base en más de --tolerancia
+(y en más de 0,5 s / 50 MB, para no reaccionar a ruido en etapas cortas). Con regresiones
+el script termina con código 1. --guardar-base deja las mediciones actuales como base.
+
+load_dw usa las variables PG* de dw/load_dw.py y recrea el esquema: con --con-dw conviene
+apuntar PGDATABASE a una base de pruebas. La salida de cada etapa queda en
+<trabajo>/logs/<escala>_<etapa>.log y sus métricas detalladas (filas por regla, bytes
+leídos/escritos; ver etl/metricas.py) en <trabajo>/metricas/<id de corrida>.jsonl. Los
+datos generados se reutilizan si ya existen con los mismos parámetros.
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+BENCH = BASE / "bench"
+
+# etapa -> módulo con main(argv)
+ETAPAS = {
+    "limpia_clientes": "limpia_clientes",
+    "limpia_productos": "limpia_productos",
+    "limpia_ventas": "limpia_ventas",
+    "transformacion": "transformacion",
+    "crear_datamart": "crear_datamart",
+    "load_dw": "load_dw",
+}
+LIMPIEZAS = ("limpia_clientes", "limpia_productos", "limpia_ventas")
+MINIMO_SEGUNDOS = 0.5
+MINIMO_MB = 50.0
+
+
+def _correr_etapa(trabajo: str, modulo: str, argv: list, log: str) -> dict:
+    """Corre en un proceso nuevo: importa la etapa dentro del datalake de trabajo y la mide."""
+    os.environ["ETL_DATALAKE"] = str(Path(trabajo) / "datalake")
+    os.environ["ETL_DATAMART"] = str(Path(trabajo) / "datamart")
+    os.environ["ETL_METRICAS"] = str(Path(trabajo) / "metricas")
+    for carpeta in ("etl", "scripts", "dw"):
+        sys.path.insert(0, str(BASE / carpeta))
+    from metricas import rss_pico_mb
+
+    m = importlib.import_module(modulo)
+    inicio, cpu = time.perf_counter(), time.process_time()
+    with open(log, "w", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+        m.main(argv)
+    return {"segundos": time.perf_counter() - inicio,
+            "cpu_segundos": time.process_time() - cpu,
+            "rss_pico_mb": rss_pico_mb()}
+
+
+def _generar(crudos: str, escala: int, sucio: float, semilla: int):
+    sys.path.insert(0, str(BENCH))
+    from generar_datos import generar
+    generar(crudos, escala, tasa=sucio, semilla=semilla)
+
+
+def en_proceso_nuevo(funcion, *args):
+    """
+    Corre ``funcion`` en un proceso recién creado. Linux conserva el RSS pico a través de
+    exec, por eso este proceso no importa pandas ni genera datos: así el pico de cada
+    etapa es solo suyo.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(funcion, *args).result()
+
+
+def medir(trabajo: Path, etapa: str, argv: list, log: Path) -> dict:
+    return en_proceso_nuevo(_correr_etapa, str(trabajo), ETAPAS[etapa], argv, str(log))
+
+
+def preparar_datos(trabajo: Path, escala: int, sucio: float, semilla: int):
+    """Genera los crudos de la escala salvo que ya estén con los mismos parámetros."""
+    crudos = trabajo / "datalake" / "datos_crudos"
+    marca = crudos / "_generado.json"
+    parametros = {"ventas": escala, "sucio": sucio, "semilla": semilla}
+    if marca.exists() and json.loads(marca.read_text(encoding="utf-8")) == parametros:
+        print(f"Datos de {escala:,} ventas reutilizados")
+        return
+    inicio = time.perf_counter()
+    en_proceso_nuevo(_generar, str(crudos), escala, sucio, semilla)
+    marca.write_text(json.dumps(parametros), encoding="utf-8")
+    print(f"Datos de {escala:,} ventas generados en {time.perf_counter() - inicio:.1f}s")
+
+
+def commit_actual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def leer_base(ruta: Path) -> dict:
+    if not ruta.exists():
+        return {}
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+def clave(escala: int, etapa: str) -> str:
+    return f"{escala}/{etapa}"
+
+
+def regresiones(medicion: dict, base: dict, tolerancia: float) -> list:
+    """Métricas de ``medicion`` que empeoraron respecto de ``base`` más allá de la tolerancia."""
+    peores = []
+    for metrica, minimo in (("segundos", MINIMO_SEGUNDOS), ("rss_pico_mb", MINIMO_MB)):
+        actual, previo = medicion.get(metrica), base.get(metrica)
+        if actual is None or not previo:
+            continue
+        if actual > previo * (1 + tolerancia) and actual - previo > minimo:
+            peores.append(f"{metrica} {previo:.1f} -> {actual:.1f} ({(actual / previo - 1) * 100:+.0f}%)")
+    return peores
+
+
+def imprimir_tabla(mediciones: list, base: dict):
+    print(f"\n{'Escala':>12} {'Etapa':<18}{'Pared (s)':>10}{'CPU (s)':>9}{'RSS (MB)':>10}"
+          f"{'filas/s':>12}{'vs base':>10}")
+    for m in mediciones:
+        previo = base.get(clave(m["escala"], m["etapa"]), {}).get("segundos")
+        delta = f"{(m['segundos'] / previo - 1) * 100:+.0f}%" if previo else "-"
+        rss = f"{m['rss_pico_mb']:.0f}" if m["rss_pico_mb"] is not None else "-"
+        print(f"{m['escala']:>12,} {m['etapa']:<18}{m['segundos']:>10.2f}{m['cpu_segundos']:>9.2f}"
+              f"{rss:>10}{m['filas_por_s']:>12,.0f}{delta:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1_000_000],
+                        help="Filas de ventas por escala (p.ej. 1000000 10000000 50000000)")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=None,
+                        help="Etapas a medir (por defecto todas menos load_dw)")
+    parser.add_argument("--con-dw", dest="con_dw", action="store_true",
+                        help="Incluir load_dw (recrea el esquema en PGDATABASE)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="--chunksize para las etapas limpia_*")
+    parser.add_argument("--sucio", type=float, default=0.02, help="Tasa base de defectos")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--trabajo", default=str(BENCH / "_trabajo"))
+    parser.add_argument("--resultados", default=str(BENCH / "resultados_etapas.jsonl"))
+    parser.add_argument("--base", default=str(BENCH / "linea_base_etapas.json"))
+    parser.add_argument("--guardar-base", dest="guardar_base", action="store_true",
+                        help="Guardar estas mediciones como línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Empeoramiento relativo tolerado antes de marcar regresión")
+    args = parser.parse_args(argv)
+
+    etapas = args.etapas or [e for e in ETAPAS if e != "load_dw" or args.con_dw]
+    if args.con_dw and "load_dw" not in etapas:
+        etapas.append("load_dw")
+    ruta_base = Path(args.base)
+    base = leer_base(ruta_base)
+    commit = commit_actual()
+    # Los procesos de cada etapa heredan el id: una corrida del benchmark, un archivo de métricas
+    os.environ.setdefault("ETL_RUN_ID", f"bench-{datetime.now():%Y%m%dT%H%M%S}")
+
+    mediciones, encontradas, fallidas = [], [], []
+    for escala in args.escalas:
+        trabajo = Path(args.trabajo).resolve() / f"ventas_{escala}"
+        (trabajo / "logs").mkdir(parents=True, exist_ok=True)
+        preparar_datos(trabajo, escala, args.sucio, args.semilla)
+        for etapa in etapas:
+            argv_etapa = []
+            if etapa in LIMPIEZAS and args.chunksize:
+                argv_etapa = ["--chunksize", str(args.chunksize)]
+            if etapa in ("transformacion", "crear_datamart"):
+                # Se mide el camino Parquet; los CSV entregables son solo del proyecto
+                argv_etapa = ["--formato", "parquet"]
+            if etapa == "transformacion":
+                # Carga inicial siempre: sin historia SCD ni calendario de corridas previas
+                shutil.rmtree(trabajo / "datalake" / "datos_curados", ignore_errors=True)
+            log = trabajo / "logs" / f"{escala}_{etapa}.log"
+            print(f"[{escala:,}] {etapa}...", flush=True)
+            try:
+                m = medir(trabajo, etapa, argv_etapa, log)
+            except Exception as e:  # incluye sys.exit() de la etapa, que llega como error del pool
+                print(f"==== Falló {etapa} a escala {escala:,}: {e!r} (ver {log}) ====")
+                fallidas.append((escala, etapa))
+                break
+            m.update({
+                "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": commit, "escala": escala, "etapa": etapa,
+                "filas_por_s": escala / m["segundos"] if m["segundos"] > 0 else 0.0,
+                "chunksize": args.chunksize,
+            })
+            mediciones.append(m)
+            peores = regresiones(m, base.get(clave(escala, etapa), {}), args.tolerancia)
+            if peores:
+                encontradas.append((escala, etapa, peores))
+
+    ruta = Path(args.resultados)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        for m in mediciones:
+            f.write(json.dumps(m, ensure_ascii=False) + "\n")
+
+    imprimir_tabla(mediciones, base)
+    print(f"\nResultados agregados a {ruta}")
+    if args.guardar_base:
+        for m in mediciones:
+            base[clave(m["escala"], m["etapa"])] = {k: m[k] for k in
+                                                    ("segundos", "cpu_segundos", "rss_pico_mb", "commit", "fecha")}
+        ruta_base.write_text(json.dumps(base, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Línea base actualizada: {ruta_base}")
+    elif not base:
+        print("Sin línea base para comparar (usar --guardar-base)")
+
+    if encontradas:
+        print("\n==== Regresiones respecto de la línea base ====")
+        for escala, etapa, peores in encontradas:
+            print(f" - {escala:,} {etapa}: " + "; ".join(peores))
+    if fallidas:
+        print("Etapas fallidas (las siguientes de esa escala no se midieron): "
+              + ", ".join(f"{etapa} ({escala:,})" for escala, etapa in fallidas))
+    if encontradas or fallidas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
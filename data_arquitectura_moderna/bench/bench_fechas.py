@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: limpiar_fecha (fila a fila) vs parsear_fechas (vectorizado)
+----------------------------------------------------------------------
+Uso:
+  python bench/bench_fechas.py [--filas 10000000] [--muestra-ref 200000]
+
+Genera una columna de fechas con formatos mezclados y marcadores de vacío.
+La versión vectorizada se mide sobre todas las filas; la versión fila a fila es lineal
+por fila, así que se mide sobre una muestra y se extrapola (correrla completa sobre
+10M filas toma decenas de minutos). Además verifica que ambas den el mismo resultado.
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+from fechas import parsear_fechas  # noqa: E402
+
+
+def limpiar_fecha(fecha):
+    """Parser anterior de limpia_ventas.py, fila a fila (la referencia del benchmark)."""
+    if pd.isna(fecha):
+        return pd.NaT
+    s = str(fecha).strip()
+
+    # Vacíos y marcadores comunes
+    if s in ("", "NA", "N/A", "--", "None", "null"):
+        return pd.NaT
+
+    # Normalizar separadores a "/"
+    s = s.replace("\\", "/").replace(".", "/").replace("-", "/")
+
+    # Intentos con formatos más comunes
+    formatos = ("%Y/%m/%d", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y")
+    for fmt in formatos:
+        try:
+            return pd.to_datetime(s, format=fmt, errors="raise")
+        except Exception:
+            pass
+    return pd.to_datetime(s, errors="coerce", dayfirst=True)
+
+
+def generar_fechas(n: int, seed: int = 42) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    dias = pd.date_range("2020-01-01", "2024-12-31", freq="D")
+    fechas = dias[rng.integers(0, len(dias), n)]
+    # ~60% ISO, el resto repartido en formatos locales y algo de basura
+    estilos = rng.choice(6, n, p=[0.60, 0.15, 0.10, 0.08, 0.05, 0.02])
+    salida = np.empty(n, dtype=object)
+    plantillas = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%y", "%Y/%m/%d"]
+    for k, fmt in enumerate(plantillas):
+        m = estilos == k
+        salida[m] = fechas[m].strftime(fmt)
+    basura = np.array(["", "N/A", "null", "31/02/2023", "sin fecha"], dtype=object)
+    m = estilos == 5
+    salida[m] = basura[rng.integers(0, len(basura), int(m.sum()))]
+    return pd.Series(salida)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--muestra-ref", dest="muestra", type=int, default=200_000)
+    args = parser.parse_args()
+
+    s = generar_fechas(args.filas)
+    print(f"Columna generada: {len(s):,} filas")
+
+    t0 = time.perf_counter()
+    fechas, conteo = parsear_fechas(s)
+    t_vec = time.perf_counter() - t0
+    print(f"parsear_fechas (vectorizado): {t_vec:.2f}s sobre {len(s):,} filas")
+    for k, v in conteo.items():
+        print(f" - {k}: {v:,}")
+
+    muestra = s.iloc[:min(args.muestra, len(s))]
+    t0 = time.perf_counter()
+    ref = muestra.apply(limpiar_fecha)
+    t_ref = time.perf_counter() - t0
+    t_ref_total = t_ref * len(s) / len(muestra)
+    print(f"limpiar_fecha (fila a fila): {t_ref:.2f}s sobre {len(muestra):,} filas "
+          f"-> estimado {t_ref_total:.0f}s sobre {len(s):,}")
+
+    iguales = ref.equals(fechas.iloc[:len(muestra)])
+    print(f"Resultados idénticos en la muestra: {iguales}")
+    print(f"Aceleración estimada: {t_ref_total / t_vec:.0f}x")
+    if not iguales:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark: limpiar_monto (cadena de regex) vs NormalizadorMontos (formato por archivo)
+--------------------------------------------------------------------------------------
+Uso:
+  python bench/bench_montos.py [--filas 10000000] [--formato coma|punto] [--distintos 500000]
+
+Genera una columna de montos en texto con el formato indicado: enteros planos, con
+símbolo y separador de miles, con decimales, negativos contables y algo de basura.
+Mide ambas versiones sobre todas las filas y compara resultados: coincidencias, valores
+que solo la versión nueva interpreta (rescatados), los que solo la anterior interpretaba
+y los que ambas interpretan distinto.
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+from montos import NormalizadorMontos, FORMATOS_MONTO  # noqa: E402
+
+
+def limpiar_monto(s: pd.Series) -> pd.Series:
+    """Cadena anterior de limpia_ventas.py, valor por valor (la referencia del benchmark)."""
+    s = s.astype(str).str.replace(r"[\$\.,](?=\d{3}(\D|$))", "", regex=True)\
+                     .str.replace(",", ".", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _con_miles(enteros: np.ndarray, miles: str) -> np.ndarray:
+    return np.array([f"{v:,}".replace(",", miles) for v in enteros.tolist()], dtype=object)
+
+
+def catalogo_montos(distintos: int, formato: str, rng) -> np.ndarray:
+    """``distintos`` montos en texto con estilos mezclados (también lo usa generar_datos.py)."""
+    fmt = FORMATOS_MONTO[formato]
+    enteros = rng.integers(100, 5_000_000, distintos)
+    centavos = rng.integers(0, 100, distintos)
+    estilos = rng.choice(7, distintos, p=[0.45, 0.20, 0.12, 0.10, 0.05, 0.05, 0.03])
+    catalogo = np.empty(distintos, dtype=object)
+    m = estilos == 0
+    catalogo[m] = enteros[m].astype(str).astype(object)                        # 19592
+    m = estilos == 1
+    catalogo[m] = "$" + _con_miles(enteros[m], fmt.miles)                         # $19.592
+    m = estilos == 2
+    catalogo[m] = _con_miles(enteros[m], fmt.miles)                               # 19.592
+    m = estilos == 3
+    catalogo[m] = [f"{e}{fmt.decimal}{c:02d}" for e, c in                         # 1.234,05
+                   zip(_con_miles(enteros[m], fmt.miles), centavos[m].tolist())]
+    m = estilos == 4
+    catalogo[m] = "(" + _con_miles(enteros[m], fmt.miles) + ")"                   # (1.500)
+    m = estilos == 5
+    catalogo[m] = "CLP " + _con_miles(enteros[m], fmt.miles)                      # CLP 1.500
+    m = estilos == 6
+    basura = np.array(["", "N/A", "sin monto", f"1{fmt.miles}23{fmt.decimal}4", "--"], dtype=object)
+    catalogo[m] = basura[rng.integers(0, len(basura), int(m.sum()))]
+    return catalogo
+
+
+def generar_montos(n: int, formato: str = "coma", distintos: int = 500_000, seed: int = 42) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    # Los montos se repiten: se arma un catálogo de valores distintos y se muestrea de él
+    catalogo = catalogo_montos(distintos, formato, rng)
+    return pd.Series(catalogo[rng.integers(0, distintos, n)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--formato", choices=list(FORMATOS_MONTO), default="coma")
+    parser.add_argument("--distintos", type=int, default=500_000)
+    args = parser.parse_args()
+
+    s = generar_montos(args.filas, args.formato, args.distintos)
+    print(f"Columna generada: {len(s):,} filas, formato '{args.formato}'")
+
+    t0 = time.perf_counter()
+    ref = limpiar_monto(s)
+    t_ref = time.perf_counter() - t0
+    print(f"limpiar_monto (regex): {t_ref:.2f}s")
+
+    t0 = time.perf_counter()
+    normalizador = NormalizadorMontos()
+    nuevo = normalizador.normalizar(s)
+    t_nuevo = time.perf_counter() - t0
+    print(f"NormalizadorMontos: {t_nuevo:.2f}s")
+    normalizador.imprimir_reporte()
+
+    a, b = ref.to_numpy(), nuevo.to_numpy()
+    ambos = ~np.isnan(a) & ~np.isnan(b)
+    print(f"Coinciden: {int((ambos & (a == b)).sum() + (np.isnan(a) & np.isnan(b)).sum()):,}")
+    print(f"Rescatados (solo la versión nueva los interpreta): {int((np.isnan(a) & ~np.isnan(b)).sum()):,}")
+    print(f"Perdidos (solo la regex los interpretaba): {int((~np.isnan(a) & np.isnan(b)).sum()):,}")
+    distintos = ambos & (a != b)
+    print(f"Interpretados distinto: {int(distintos.sum()):,}")
+    for i in np.flatnonzero(distintos)[:5]:
+        print(f"  {s.iat[i]!r}: regex {a[i]} / nuevo {b[i]}")
+    print(f"Aceleración: {t_ref / t_nuevo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generador de datos sintéticos: clientes.csv, productos.csv y ventas.csv a escala
+--------------------------------------------------------------------------------
+Uso:
+  python bench/generar_datos.py [--ventas 1000000] [--clientes N] [--productos N]
+                                [--salida bench/_datos] [--sucio 0.02] [--semilla 42]
+
+Escribe los tres archivos crudos con el mismo esquema que datos_origen/, con la suciedad
+que los scripts limpia_*.py deben resolver (``--sucio`` es la tasa base de cada defecto):
+
+- ventas: fechas en formatos mezclados (ISO, dd/mm/aaaa, dd-mm-aaaa, dd.mm.aa, aaaa/mm/dd)
+  y texto no parseable; montos como texto de moneda ($19.592, CLP 19.592, 1.234,05,
+  negativos contables, basura; ver bench_montos.py); id_venta duplicados; cantidades
+  negativas o vacías; ids de producto y cliente que no existen (huérfanos)
+- clientes: edades fuera de rango o no numéricas, espacios alrededor del texto y filas
+  duplicadas
+- productos: espacios alrededor del texto y filas duplicadas
+
+Por defecto hay un cliente cada 20 ventas y un producto cada 1.000 (mínimo 50 y 10, como
+el conjunto de ejemplo). Las ventas se escriben en lotes de --lote filas, así que generar
+50M filas no necesita más memoria que generar 1M. Con la misma semilla el resultado es
+el mismo.
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_montos import catalogo_montos  # noqa: E402
+
+UBICACIONES = ["Santiago", "Valparaíso", "Concepción", "La Serena", "Antofagasta"]
+CATEGORIAS_CLIENTE = ["Nuevo", "Frecuente", "Inactivo"]
+CATEGORIAS_PRODUCTO = ["Tecnología", "Ropa", "Electrodoméstico", "Alimentos"]
+PROVEEDORES = ["Proveedor A", "Proveedor B", "Proveedor C"]
+FORMATOS_FECHA = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%y", "%Y/%m/%d"]
+FECHAS_BASURA = ["", "N/A", "sin fecha", "31/02/2023", "2023-13-01"]
+EDADES_BASURA = ["-5", "150", "N/A", "abc", "999"]
+MONTOS_DISTINTOS = 200_000
+
+
+def _ensuciar_texto(valores: np.ndarray, tasa: float, rng) -> np.ndarray:
+    """Agrega espacios alrededor de una fracción ``tasa`` de los textos."""
+    valores = valores.astype(object)
+    m = rng.random(len(valores)) < tasa
+    valores[m] = "  " + valores[m] + " "
+    return valores
+
+
+def _duplicar_filas(df: pd.DataFrame, tasa: float, rng) -> pd.DataFrame:
+    extra = rng.integers(0, len(df), int(len(df) * tasa))
+    return pd.concat([df, df.iloc[extra]], ignore_index=True)
+
+
+def generar_clientes(n: int, tasa: float, rng) -> pd.DataFrame:
+    ids = np.arange(1, n + 1)
+    edad = rng.integers(18, 91, n).astype(str).astype(object)
+    m = rng.random(n) < tasa
+    edad[m] = rng.choice(EDADES_BASURA, int(m.sum()))
+    df = pd.DataFrame({
+        "id_cliente": ids,
+        "nombre": _ensuciar_texto("Cliente " + ids.astype(str).astype(object), tasa, rng),
+        "edad": edad,
+        "ubicacion": _ensuciar_texto(rng.choice(UBICACIONES, n).astype(object), tasa, rng),
+        "categoria": rng.choice(CATEGORIAS_CLIENTE, n),
+    })
+    return _duplicar_filas(df, tasa / 2, rng)
+
+
+def generar_productos(n: int, tasa: float, rng) -> pd.DataFrame:
+    ids = np.arange(1, n + 1)
+    df = pd.DataFrame({
+        "id_producto": ids,
+        "nombre_producto": _ensuciar_texto("Producto " + ids.astype(str).astype(object), tasa, rng),
+        "categoria": rng.choice(CATEGORIAS_PRODUCTO, n),
+        "proveedor": _ensuciar_texto(rng.choice(PROVEEDORES, n).astype(object), tasa, rng),
+    })
+    return _duplicar_filas(df, tasa / 2, rng)
+
+
+def catalogo_fechas(inicio="2021-01-01", fin="2024-12-31") -> np.ndarray:
+    """Texto de cada día del rango en cada formato: [día, formato] (strftime una sola vez)."""
+    dias = pd.date_range(inicio, fin, freq="D")
+    return np.stack([dias.strftime(f).to_numpy(dtype=object) for f in FORMATOS_FECHA], axis=1)
+
+
+def generar_lote_ventas(primer_id: int, n: int, clientes: int, productos: int, tasa: float,
+                        fechas: np.ndarray, montos: np.ndarray, rng) -> pd.DataFrame:
+    ids = np.arange(primer_id, primer_id + n, dtype=np.int64)
+    # Duplicados: una fracción repite un id_venta ya emitido (en este lote o en uno anterior)
+    m = rng.random(n) < tasa
+    ids[m] = rng.integers(1, ids[m] + 1)
+
+    # ~70% ISO y el resto repartido entre los otros formatos; ``tasa`` de basura
+    estilo = np.where(rng.random(n) < 0.7, 0, rng.integers(1, len(FORMATOS_FECHA), n))
+    fecha = fechas[rng.integers(0, len(fechas), n), estilo]
+    m = rng.random(n) < tasa
+    fecha[m] = rng.choice(FECHAS_BASURA, int(m.sum()))
+
+    cantidad = rng.integers(1, 21, n).astype(np.float64)
+    cantidad[rng.random(n) < tasa] *= -1
+    cantidad[rng.random(n) < tasa / 2] = np.nan
+
+    id_producto = rng.integers(1, productos + 1, n)
+    m = rng.random(n) < tasa / 2
+    id_producto[m] = productos + rng.integers(1, 100, int(m.sum()))
+    id_cliente = rng.integers(1, clientes + 1, n)
+    m = rng.random(n) < tasa / 2
+    id_cliente[m] = clientes + rng.integers(1, 100, int(m.sum()))
+
+    return pd.DataFrame({
+        "id_venta": ids,
+        "id_producto": id_producto,
+        "id_sucursal": id_cliente,
+        "fecha": fecha,
+        "cantidad": pd.array(cantidad, dtype="Int64"),
+        "monto": montos[rng.integers(0, len(montos), n)],
+    })
+
+
+def generar(salida, ventas: int, clientes: int = None, productos: int = None,
+            tasa: float = 0.02, semilla: int = 42, lote: int = 1_000_000) -> dict:
+    """Escribe los tres CSV en ``salida``. Retorna las filas escritas por archivo."""
+    salida = Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    clientes = clientes or max(50, ventas // 20)
+    productos = productos or max(10, ventas // 1000)
+    rng = np.random.default_rng(semilla)
+
+    filas = {}
+    df = generar_clientes(clientes, tasa, rng)
+    df.to_csv(salida / "clientes.csv", index=False)
+    filas["clientes"] = len(df)
+    df = generar_productos(productos, tasa, rng)
+    df.to_csv(salida / "productos.csv", index=False)
+    filas["productos"] = len(df)
+
+    fechas = catalogo_fechas()
+    montos = catalogo_montos(MONTOS_DISTINTOS, "coma", rng)
+    for inicio in range(0, ventas, lote):
+        n = min(lote, ventas - inicio)
+        df = generar_lote_ventas(inicio + 1, n, clientes, productos, tasa, fechas, montos, rng)
+        df.to_csv(salida / "ventas.csv", index=False, mode="w" if inicio == 0 else "a",
+                  header=inicio == 0)
+    filas["ventas"] = ventas
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ventas", type=int, default=1_000_000)
+    parser.add_argument("--clientes", type=int, default=None, help="Por defecto ventas / 20")
+    parser.add_argument("--productos", type=int, default=None, help="Por defecto ventas / 1000")
+    parser.add_argument("--salida", default=str(Path(__file__).resolve().parent / "_datos"))
+    parser.add_argument("--sucio", type=float, default=0.02, help="Tasa base de cada defecto")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=1_000_000, help="Filas de ventas por escritura")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    filas = generar(args.salida, args.ventas, args.clientes, args.productos,
+                    args.sucio, args.semilla, args.lote)
+    print(f"Generado en {time.perf_counter() - inicio:.1f}s: "
+          + ", ".join(f"{t} {n:,} filas" for t, n in filas.items()))
+    print("Salida:", Path(args.salida).resolve())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,37 @@
+-- Consultas analíticas del DW, con nombre y parámetros para dw/consultas.py
+-- (python dw/consultas.py --listar). Los parámetros van como :nombre (bind de SQLAlchemy;
+-- en psql, \set anio_desde 2023). "-- parametros:" declara los valores por defecto.
+-- Leen los agregados que load_dw.py mantiene al día (dw/agregados.py), no hecho_ventas:
+-- unas pocas filas por mes y categoría o por año y cliente. Las mismas consultas sobre los
+-- hechos están en docs/queries_hechos.sql.
+
+-- name: ventas_mes_categoria
 -- Total ventas por mes y categoria
-SELECT d.anio, d.mes, p.categoria, SUM(f.total) AS total_ventas
-FROM hecho_ventas f
-JOIN dim_tiempo d ON f.id_tiempo = d.id_tiempo
-JOIN dim_producto p ON f.id_producto = p.id_producto
-GROUP BY d.anio, d.mes, p.categoria
-ORDER BY d.anio, d.mes, p.categoria;
+-- parametros: anio_desde=None, anio_hasta=None
+SELECT anio, mes, categoria, total_ventas
+FROM agg_ventas_mes_categoria
+WHERE (:anio_desde IS NULL OR anio >= :anio_desde)
+  AND (:anio_hasta IS NULL OR anio <= :anio_hasta)
+ORDER BY anio, mes, categoria;
 
+-- name: top_clientes
 -- Top clientes por total ventas
-SELECT c.nombre_cliente, c.ubicacion, SUM(f.total) AS total_ventas
-FROM hecho_ventas f
-JOIN dim_cliente c ON f.id_cliente = c.id_cliente
-GROUP BY c.nombre_cliente, c.ubicacion
-ORDER BY total_ventas DESC
-LIMIT 10;
+-- parametros: limite=10, anio=None
+SELECT nombre_cliente, ubicacion, SUM(total_ventas) AS total_ventas
+FROM agg_ventas_anio_cliente
+WHERE (:anio IS NULL OR anio = :anio)
+GROUP BY nombre_cliente, ubicacion
+ORDER BY total_ventas DESC, nombre_cliente, ubicacion
+LIMIT :limite;
 
--- Año acumulativo por mes 
+-- name: ventas_ytd
+-- Año acumulativo por mes
+-- parametros: anio=None
 SELECT
-  d.anio, d.mes,
-  SUM(f.total) AS ventas_mes,
-  SUM(SUM(f.total)) OVER (PARTITION BY d.anio ORDER BY d.mes) AS ventas_ytd
-FROM hecho_ventas f
-JOIN dim_tiempo d ON f.id_tiempo = d.id_tiempo
-GROUP BY d.anio, d.mes
-ORDER BY d.anio, d.mes;
+  anio, mes,
+  SUM(total_ventas) AS ventas_mes,
+  SUM(SUM(total_ventas)) OVER (PARTITION BY anio ORDER BY mes) AS ventas_ytd
+FROM agg_ventas_mes_categoria
+WHERE (:anio IS NULL OR anio = :anio)
+GROUP BY anio, mes
+ORDER BY anio, mes;
@@ -0,0 +1,41 @@
+-- Las consultas de docs/queries.sql calculadas directo sobre hecho_ventas, sin los agregados
+-- de dw/agregados.py: referencia para análisis ad-hoc, para dw/agregados.py --verificar y
+-- para bench/bench_consultas.py. Mismos nombres, parámetros y columnas.
+-- Los filtros de fecha van sobre f.id_tiempo (yyyymmdd) como rango: así Postgres descarta
+-- las particiones anuales de hecho_ventas que no corresponden y usa su índice BRIN.
+
+-- name: ventas_mes_categoria
+-- Total ventas por mes y categoria
+-- parametros: anio_desde=None, anio_hasta=None
+SELECT d.anio, d.mes, p.categoria, SUM(f.total) AS total_ventas
+FROM hecho_ventas f
+JOIN dim_tiempo d ON f.id_tiempo = d.id_tiempo
+JOIN dim_producto p ON f.sk_producto = p.sk_producto
+WHERE (:anio_desde IS NULL OR f.id_tiempo >= :anio_desde * 10000)
+  AND (:anio_hasta IS NULL OR f.id_tiempo < (:anio_hasta + 1) * 10000)
+GROUP BY d.anio, d.mes, p.categoria
+ORDER BY d.anio, d.mes, p.categoria;
+
+-- name: top_clientes
+-- Top clientes por total ventas
+-- parametros: limite=10, anio=None
+SELECT c.nombre_cliente, c.ubicacion, SUM(f.total) AS total_ventas
+FROM hecho_ventas f
+JOIN dim_cliente c ON f.sk_cliente = c.sk_cliente
+WHERE (:anio IS NULL OR f.id_tiempo BETWEEN :anio * 10000 AND :anio * 10000 + 9999)
+GROUP BY c.nombre_cliente, c.ubicacion
+ORDER BY total_ventas DESC, c.nombre_cliente, c.ubicacion
+LIMIT :limite;
+
+-- name: ventas_ytd
+-- Año acumulativo por mes
+-- parametros: anio=None
+SELECT
+  d.anio, d.mes,
+  SUM(f.total) AS ventas_mes,
+  SUM(SUM(f.total)) OVER (PARTITION BY d.anio ORDER BY d.mes) AS ventas_ytd
+FROM hecho_ventas f
+JOIN dim_tiempo d ON f.id_tiempo = d.id_tiempo
+WHERE (:anio IS NULL OR f.id_tiempo BETWEEN :anio * 10000 AND :anio * 10000 + 9999)
+GROUP BY d.anio, d.mes
+ORDER BY d.anio, d.mes;
@@ -0,0 +1,144 @@
+"""
+Agregados materializados del DW
+-------------------------------
+Uso:
+  python dw/agregados.py [--anios 2023 2024] [--verificar]
+
+Tablas resumen para las consultas de docs/queries.sql, así los dashboards leen unas pocas
+filas pre-agregadas en vez de recorrer hecho_ventas:
+
+- agg_ventas_mes_categoria: total y cantidad de ventas por anio, mes y categoría de producto
+  (ventas_mes_categoria y ventas_ytd)
+- agg_ventas_anio_cliente: total y cantidad de ventas por anio, cliente y ubicación
+  (top_clientes)
+
+load_dw.py las refresca en la misma transacción de la carga, antes de incrementar la versión
+de carga: los lectores siguen viendo los agregados anteriores hasta el commit y nunca ven
+hechos y agregados desfasados. La carga completa los recalcula enteros; la incremental solo
+los años (particiones) donde el merge insertó o reasignó hechos, más los de los hechos que
+apuntan a una versión de cliente/producto corregida en su lugar (SCD tipo 2: un cambio con
+fecha efectiva el mismo día que abrió la versión la corrige sin crear otra).
+
+docs/queries_hechos.sql tiene las mismas consultas directo sobre los hechos: --verificar
+compara las dos versiones (sin parámetros y por cada año).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+QUERIES_HECHOS = BASE / "docs" / "queries_hechos.sql"
+
+# tabla -> (columnas, SELECT sobre los hechos con {filtro} en WHERE)
+AGREGADOS = {
+    "agg_ventas_mes_categoria": (
+        "anio INT NOT NULL, mes INT NOT NULL, categoria VARCHAR(50), "
+        "total_ventas NUMERIC NOT NULL, ventas BIGINT NOT NULL",
+        "SELECT d.anio, d.mes, p.categoria, SUM(f.total), COUNT(*) "
+        "FROM hecho_ventas f "
+        "JOIN dim_tiempo d ON f.id_tiempo = d.id_tiempo "
+        "JOIN dim_producto p ON f.sk_producto = p.sk_producto "
+        "WHERE {filtro} GROUP BY d.anio, d.mes, p.categoria"),
+    "agg_ventas_anio_cliente": (
+        "anio INT NOT NULL, nombre_cliente VARCHAR(50), ubicacion VARCHAR(100), "
+        "total_ventas NUMERIC NOT NULL, ventas BIGINT NOT NULL",
+        "SELECT f.id_tiempo / 10000, c.nombre_cliente, c.ubicacion, SUM(f.total), COUNT(*) "
+        "FROM hecho_ventas f "
+        "JOIN dim_cliente c ON f.sk_cliente = c.sk_cliente "
+        "WHERE {filtro} GROUP BY 1, c.nombre_cliente, c.ubicacion"),
+}
+
+
+def agregados_existen(cur) -> bool:
+    cur.execute("SELECT bool_and(to_regclass(t) IS NOT NULL) FROM unnest(%s) AS t", (list(AGREGADOS),))
+    return bool(cur.fetchone()[0])
+
+
+def refrescar_agregados(cur, anios: list = None) -> list:
+    """
+    Recalcula los agregados: todos, o solo los de ``anios`` (cada año lee una partición de
+    hecho_ventas). Crea las tablas si faltan. Usa el cursor dado; el commit es de quien llama.
+    Retorna por tabla las filas escritas y los segundos.
+    """
+    stats = []
+    for tabla, (columnas, select) in AGREGADOS.items():
+        inicio = time.perf_counter()
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({columnas})")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {tabla}_anio ON {tabla} (anio)")
+        if anios is None:
+            cur.execute(f"TRUNCATE {tabla}")
+            cur.execute(f"INSERT INTO {tabla} {select.format(filtro='TRUE')}")
+            filas = cur.rowcount
+        else:
+            cur.execute(f"DELETE FROM {tabla} WHERE anio = ANY(%s)", (list(anios),))
+            filas = 0
+            for anio in anios:
+                # Rango sobre id_tiempo: el planificador lee solo la partición del año
+                cur.execute(f"INSERT INTO {tabla} "
+                            f"{select.format(filtro='f.id_tiempo >= %s AND f.id_tiempo < %s')}",
+                            (anio * 10000, (anio + 1) * 10000))
+                filas += cur.rowcount
+        cur.execute(f"ANALYZE {tabla}")
+        stats.append({"tabla": tabla, "filas": filas, "anios": anios,
+                      "segundos": time.perf_counter() - inicio})
+    return stats
+
+
+def verificar(q) -> list:
+    """
+    Compara cada consulta de docs/queries.sql (agregados) con su versión sobre los hechos,
+    sin parámetros y por año. Retorna las diferencias encontradas (vacía si coinciden).
+    """
+    import pandas as pd
+    from sqlalchemy import text
+    from consultas import leer_consultas
+
+    hechos = leer_consultas(QUERIES_HECHOS)
+    with q.engine.connect() as conn:
+        anios = [a for (a,) in conn.execute(text("SELECT DISTINCT anio FROM agg_ventas_mes_categoria ORDER BY 1"))]
+    diferencias = []
+    for nombre, consulta in q.consultas.items():
+        filtros = [k for k in consulta.parametros if k.startswith("anio")]
+        casos = [{}] + ([{k: a for k in filtros} for a in anios] if filtros else [])
+        for params in casos:
+            agregado = q.consultar(nombre, usar_cache=False, **params)
+            with q.engine.connect() as conn:
+                directo = pd.read_sql_query(text(hechos[nombre].sql), conn, params=hechos[nombre].valores(params))
+            try:
+                pd.testing.assert_frame_equal(agregado, directo, check_dtype=False)
+            except AssertionError as e:
+                diferencias.append(f"{nombre} {params}: {e}")
+    return diferencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--anios", type=int, nargs="+", default=None,
+                        help="Refrescar solo estos años (por defecto todos)")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Comparar con las consultas sobre los hechos (docs/queries_hechos.sql)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BASE / "etl"))
+    from consultas import Consultas
+    from version_carga import incrementar_version
+
+    q = Consultas()
+    with q.engine.begin() as conn, conn.connection.cursor() as cur:
+        for st in refrescar_agregados(cur, args.anios):
+            print(f"Refrescado: {st['tabla']} ({st['filas']} filas, {st['segundos']:.2f}s)")
+        version = incrementar_version(cur)
+    print(f"Versión de carga {version}")
+    if args.verificar:
+        diferencias = verificar(q)
+        for d in diferencias:
+            print("Diferencia:", d)
+        print("Agregados verificados ✅" if not diferencias else f"{len(diferencias)} diferencias ❌")
+        if diferencias:
+            sys.exit(1)
+    q.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Consultas analíticas del DW con cache
+-------------------------------------
+Uso:
+  python dw/consultas.py --listar
+  python dw/consultas.py ventas_mes_categoria [--param anio_desde=2023 ...] [--sin-cache]
+                         [--repetir N] [--limpiar-cache]
+
+Las consultas con nombre y parámetros están en docs/queries.sql ("-- name:", "-- parametros:";
+ver el encabezado del archivo). Cada resultado se guarda en una cache de dos niveles:
+
+- memoria: LRU acotada en MB (tamaño real del DataFrame)
+- disco: un pickle por resultado en cache_consultas/, LRU por fecha de último uso, acotada
+  en MB; sobrevive entre procesos (varios dashboards comparten los resultados)
+
+La clave es un hash del SQL, los parámetros, la base y la versión de carga del DW
+(dw/version_carga.py), que load_dw.py incrementa en cada carga: un resultado vale hasta
+que llegan datos nuevos, sin TTL. Cada consulta paga un SELECT de una fila para leer la
+versión; si el DW no tiene versión (cargado antes de dw_carga) no se cachea.
+
+  from consultas import Consultas
+  q = Consultas()
+  df = q.consultar("top_clientes", limite=5, anio=2023)
+  q.estadisticas()   # aciertos en memoria/disco, fallos, desalojos, MB usados
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE / "etl"))
+from load_dw import url, PGHOST, PGPORT, PGDATABASE  # noqa: E402
+from version_carga import leer_version  # noqa: E402
+
+QUERIES = BASE / "docs" / "queries.sql"
+CACHE = Path(os.getenv("ETL_CACHE_CONSULTAS", BASE / "cache_consultas"))
+PATRON_NOMBRE = re.compile(r"^--\s*name:\s*(\w+)\s*$", re.MULTILINE)
+
+
+class Consulta:
+    def __init__(self, nombre: str, sql: str, descripcion: str = "", parametros: dict = None):
+        self.nombre, self.sql, self.descripcion = nombre, sql, descripcion
+        self.parametros = dict(parametros or {})
+
+    def valores(self, params: dict) -> dict:
+        """Parámetros completos (por defecto + dados); error si sobra alguno."""
+        desconocidos = set(params) - set(self.parametros)
+        if desconocidos:
+            raise ValueError(f"{self.nombre}: parámetros desconocidos {sorted(desconocidos)} "
+                             f"(acepta {sorted(self.parametros)})")
+        return {**self.parametros, **params}
+
+
+def leer_consultas(ruta=QUERIES) -> dict:
+    """Consultas de un archivo .sql por nombre ("-- name:", descripción, "-- parametros:")."""
+    texto = Path(ruta).read_text(encoding="utf-8")
+    marcas = list(PATRON_NOMBRE.finditer(texto))
+    consultas = {}
+    for i, m in enumerate(marcas):
+        fin = marcas[i + 1].start() if i + 1 < len(marcas) else len(texto)
+        descripcion, parametros, cuerpo = [], {}, []
+        for linea in texto[m.end():fin].strip().splitlines():
+            if cuerpo or not linea.startswith("--"):
+                cuerpo.append(linea)
+            elif linea.lstrip("- ").startswith("parametros:"):
+                for par in filter(None, (p.strip() for p in linea.split(":", 1)[1].split(","))):
+                    clave, valor = par.split("=", 1)
+                    parametros[clave.strip()] = ast.literal_eval(valor.strip())
+            else:
+                descripcion.append(linea.lstrip("- "))
+        sql = "\n".join(cuerpo).strip().rstrip(";")
+        consultas[m.group(1)] = Consulta(m.group(1), sql, " ".join(descripcion), parametros)
+    return consultas
+
+
+def _mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(index=True, deep=True).sum() / 2**20
+
+
+class CacheResultados:
+    """LRU de DataFrames en memoria y en disco, cada nivel acotado en MB."""
+
+    def __init__(self, carpeta=CACHE, max_memoria_mb: float = 64, max_disco_mb: float = 512):
+        self.carpeta = Path(carpeta)
+        self.max_memoria_mb, self.max_disco_mb = max_memoria_mb, max_disco_mb
+        self.memoria = OrderedDict()   # clave -> (DataFrame, MB)
+        self.memoria_mb = 0.0
+        self.stats = dict.fromkeys(("aciertos_memoria", "aciertos_disco", "fallos",
+                                    "desalojos_memoria", "desalojos_disco"), 0)
+
+    def _ruta(self, clave: str) -> Path:
+        return self.carpeta / f"{clave}.pkl"
+
+    def obtener(self, clave: str):
+        if clave in self.memoria:
+            self.memoria.move_to_end(clave)
+            self.stats["aciertos_memoria"] += 1
+            return self.memoria[clave][0]
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                df = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.stats["fallos"] += 1
+            return None
+        os.utime(ruta)  # último uso, para el LRU del disco
+        self.stats["aciertos_disco"] += 1
+        self._en_memoria(clave, df)
+        return df
+
+    def guardar(self, clave: str, df: pd.DataFrame):
+        self._en_memoria(clave, df)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        tmp = self._ruta(clave).with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(self._ruta(clave))
+        self._podar_disco()
+
+    def _en_memoria(self, clave: str, df: pd.DataFrame):
+        mb = _mb(df)
+        if mb > self.max_memoria_mb:
+            return
+        self.memoria[clave] = (df, mb)
+        self.memoria_mb += mb
+        while self.memoria_mb > self.max_memoria_mb:
+            _, (_, viejo) = self.memoria.popitem(last=False)
+            self.memoria_mb -= viejo
+            self.stats["desalojos_memoria"] += 1
+
+    def _podar_disco(self):
+        archivos = []
+        for ruta in self.carpeta.glob("*.pkl"):
+            try:
+                st = ruta.stat()
+            except FileNotFoundError:  # otro proceso la desalojó
+                continue
+            archivos.append((st.st_mtime, st.st_size, ruta))
+        total = sum(a[1] for a in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total <= self.max_disco_mb * 2**20:
+                break
+            ruta.unlink(missing_ok=True)
+            total -= tamano
+            self.stats["desalojos_disco"] += 1
+
+    def disco_mb(self) -> float:
+        return sum(r.stat().st_size for r in self.carpeta.glob("*.pkl")) / 2**20 if self.carpeta.exists() else 0.0
+
+    def limpiar(self):
+        self.memoria.clear()
+        self.memoria_mb = 0.0
+        for ruta in self.carpeta.glob("*.pkl"):
+            ruta.unlink(missing_ok=True)
+
+
+class Consultas:
+    """Corre las consultas de docs/queries.sql contra el DW, con cache por versión de carga."""
+
+    def __init__(self, engine=None, ruta_sql=QUERIES, cache: CacheResultados = None):
+        self.engine = engine or create_engine(url, future=True)
+        self.consultas = leer_consultas(ruta_sql)
+        self.cache = cache if cache is not None else CacheResultados()
+        self.base = f"{PGHOST}:{PGPORT}/{PGDATABASE}"
+
+    def nombres(self) -> list:
+        return list(self.consultas)
+
+    def version(self):
+        with self.engine.connect() as conn, conn.connection.cursor() as cur:
+            return leer_version(cur)
+
+    def clave(self, consulta: Consulta, valores: dict, version: str) -> str:
+        contenido = json.dumps([self.base, consulta.sql, valores, version], sort_keys=True, default=str)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def consultar(self, nombre: str, usar_cache: bool = True, **params) -> pd.DataFrame:
+        if nombre not in self.consultas:
+            raise KeyError(f"No existe la consulta {nombre} (disponibles: {', '.join(self.consultas)})")
+        consulta = self.consultas[nombre]
+        valores = consulta.valores(params)
+        version = self.version() if usar_cache else None
+        clave = self.clave(consulta, valores, version) if version is not None else None
+        if clave is not None:
+            df = self.cache.obtener(clave)
+            if df is not None:
+                return df.copy()
+        elif usar_cache:
+            self.cache.stats["fallos"] += 1
+
+        with self.engine.connect() as conn:
+            df = pd.read_sql_query(text(consulta.sql), conn, params=valores)
+        if clave is not None:
+            self.cache.guardar(clave, df)
+            df = df.copy()
+        return df
+
+    def estadisticas(self) -> dict:
+        s = dict(self.cache.stats)
+        consultas = s["aciertos_memoria"] + s["aciertos_disco"] + s["fallos"]
+        s["tasa_aciertos"] = round((s["aciertos_memoria"] + s["aciertos_disco"]) / consultas, 3) if consultas else 0.0
+        s["memoria_mb"] = round(self.cache.memoria_mb, 3)
+        s["disco_mb"] = round(self.cache.disco_mb(), 3)
+        return s
+
+
+def _parametro(texto: str) -> tuple:
+    clave, valor = texto.split("=", 1)
+    try:
+        return clave, ast.literal_eval(valor)
+    except (ValueError, SyntaxError):
+        return clave, valor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("nombre", nargs="?", help="Consulta de docs/queries.sql")
+    parser.add_argument("--param", action="append", default=[], type=_parametro,
+                        help="clave=valor (repetible)")
+    parser.add_argument("--listar", action="store_true", help="Mostrar consultas y parámetros")
+    parser.add_argument("--sin-cache", dest="sin_cache", action="store_true")
+    parser.add_argument("--repetir", type=int, default=1, help="Correr N veces (para ver la cache)")
+    parser.add_argument("--limpiar-cache", dest="limpiar_cache", action="store_true")
+    parser.add_argument("--max-memoria-mb", dest="max_memoria_mb", type=float, default=64)
+    parser.add_argument("--max-disco-mb", dest="max_disco_mb", type=float, default=512)
+    args = parser.parse_args(argv)
+
+    cache = CacheResultados(max_memoria_mb=args.max_memoria_mb, max_disco_mb=args.max_disco_mb)
+    if args.limpiar_cache:
+        cache.limpiar()
+        print("Cache de consultas vaciada:", cache.carpeta.resolve())
+    if args.listar:
+        for c in leer_consultas().values():
+            params = ", ".join(f"{k}={v!r}" for k, v in c.parametros.items())
+            print(f"{c.nombre}({params}): {c.descripcion}")
+        return
+    if not args.nombre:
+        if not args.limpiar_cache:
+            parser.error("falta el nombre de la consulta (o --listar)")
+        return
+
+    q = Consultas(cache=cache)
+    print("Versión de carga del DW:", q.version())
+    for _ in range(args.repetir):
+        inicio = time.perf_counter()
+        df = q.consultar(args.nombre, usar_cache=not args.sin_cache, **dict(args.param))
+        print(f"{args.nombre}: {len(df)} filas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    print(df.to_string(index=False))
+    print("Cache:", json.dumps(q.estadisticas(), ensure_ascii=False))
+    q.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
--- Borrar primero la tabla de hechos (tiene FKs)
+-- Solo tablas y columnas: claves primarias, FKs e índices están en dw/restricciones.sql y
+-- load_dw.py los crea después de la carga masiva (validar e indexar una vez al final es
+-- mucho más barato que fila por fila durante el COPY).
+
+-- Agregados de dw/agregados.py (se derivan de los hechos; load_dw.py los recalcula)
+DROP TABLE IF EXISTS agg_ventas_mes_categoria;
+DROP TABLE IF EXISTS agg_ventas_anio_cliente;
+
+-- Borrar primero la tabla de hechos (tiene FKs; CASCADE borra también sus particiones)
 DROP TABLE IF EXISTS hecho_ventas CASCADE;
 
 -- Luego las dimensiones
@@ -6,40 +14,60 @@ DROP TABLE IF EXISTS dim_producto CASCADE;
 DROP TABLE IF EXISTS dim_cliente  CASCADE;
 DROP TABLE IF EXISTS dim_tiempo   CASCADE;
 
--- Dimensión Cliente
+-- Dimensión Cliente (SCD tipo 2: una fila por versión, ver etl/scd.py)
 CREATE TABLE dim_cliente (
-    id_cliente     SERIAL PRIMARY KEY,
+    sk_cliente     INT NOT NULL,
+    id_cliente     INT NOT NULL,
     nombre_cliente VARCHAR(50),
     edad           INT ,
     ubicacion      VARCHAR(100),
-    categoria      VARCHAR(50)
+    categoria      VARCHAR(50),
+    valido_desde   DATE NOT NULL,
+    valido_hasta   DATE,            -- NULL = versión vigente
+    es_actual      BOOLEAN NOT NULL
 );
 
--- Dimensión Producto
+-- Dimensión Producto (SCD tipo 2)
 CREATE TABLE dim_producto (
-    id_producto SERIAL PRIMARY KEY,
+    sk_producto INT NOT NULL,
+    id_producto INT NOT NULL,
     nombre_producto VARCHAR(50),
     categoria VARCHAR(50),
-    proveedor VARCHAR(50)
+    proveedor VARCHAR(50),
+    valido_desde DATE NOT NULL,
+    valido_hasta DATE,
+    es_actual BOOLEAN NOT NULL
 );
 
--- Dimensión Tiempo (fecha calendario)
+-- Dimensión Tiempo (calendario completo, ver etl/calendario.py)
 CREATE TABLE dim_tiempo (
-  id_tiempo  INT PRIMARY KEY,   -- formato yyyymmdd (ej: 20250811)
+  id_tiempo  INT NOT NULL,      -- formato yyyymmdd (ej: 20250811)
   fecha      DATE NOT NULL,
   anio       INT  NOT NULL,
   mes        INT  NOT NULL,
-  dia        INT  NOT NULL
+  dia        INT  NOT NULL,
+  trimestre  INT  NOT NULL,
+  anio_iso   INT  NOT NULL,
+  semana_iso INT  NOT NULL,
+  dia_semana INT  NOT NULL,     -- 1 = lunes ... 7 = domingo
+  fin_de_mes BOOLEAN NOT NULL
 );
 
--- Tabla de Hechos de Ventas
+-- dw_carga (versión de carga, ver dw/version_carga.py) no se borra aquí: la cache de
+-- dw/consultas.py depende de que la versión nunca se repita
+
+-- Tabla de Hechos de Ventas, particionada por rango de id_tiempo (una partición por año,
+-- hecho_ventas_<anio>, creadas por dw/particiones.py antes de cargar): las consultas con
+-- filtro de fecha solo leen los años que piden
 CREATE TABLE hecho_ventas (
-  id_venta     SERIAL PRIMARY KEY,  
-  id_cliente   INT NOT NULL REFERENCES dim_cliente(id_cliente),
-  id_producto  INT NOT NULL REFERENCES dim_producto(id_producto),
-  id_tiempo    INT NOT NULL REFERENCES dim_tiempo(id_tiempo),
+  id_venta     SERIAL,
+  id_cliente   INT NOT NULL,        -- clave natural (la versión va en sk_cliente)
+  id_producto  INT NOT NULL,
+  sk_cliente   INT NOT NULL,
+  sk_producto  INT NOT NULL,
+  id_tiempo    INT NOT NULL,
   cantidad     INT NOT NULL,
   total        NUMERIC(12,2) NOT NULL
-);
+) PARTITION BY RANGE (id_tiempo);
 
 
@@ -0,0 +1,186 @@
+"""
+Carga incremental (upsert) al DW
+--------------------------------
+En lugar de borrar y recrear el esquema, los datos curados se cargan a tablas de staging
+temporales (COPY) y desde ahí se fusionan:
+
+- dimensiones: INSERT ... ON CONFLICT (clave sustituta) DO UPDATE, solo si algo cambió (una
+  versión nueva entra como fila nueva; la anterior se actualiza al cerrarse su vigencia, o
+  se corrige en su lugar si se abrió el mismo día, ver etl/scd.py)
+- hechos: INSERT ... ON CONFLICT (id_venta, id_tiempo) (la clave primaria de la tabla
+  particionada, ver dw/particiones.py): se agregan las ventas nuevas y de las existentes solo
+  se actualizan sk_cliente/sk_producto si cambió la versión vigente en su fecha. Una venta ya
+  cargada que llega con otra fecha conserva la fila original, como antes (así id_venta sigue
+  siendo única entre particiones); las particiones de años nuevos se crean antes del merge
+- agregados (dw/agregados.py): se recalculan solo los años donde el merge insertó o reasignó
+  hechos, más los años de los hechos que apuntan a versiones corregidas en su lugar (mismo
+  sk, otros atributos: p.ej. otra categoría)
+
+Todo ocurre en una única transacción: mientras corre, los lectores siguen viendo la versión
+anterior completa, y si algo falla no queda nada a medias. La versión de carga
+(dw/version_carga.py) se incrementa en esa misma transacción.
+"""
+import time
+
+from agregados import agregados_existen, refrescar_agregados
+from copia import copiar_lotes
+from particiones import anios, crear_particiones, es_particionada
+from version_carga import incrementar_version
+
+CLAVES = {
+    "dim_cliente": "sk_cliente",
+    "dim_producto": "sk_producto",
+    "dim_tiempo": "id_tiempo",
+    "hecho_ventas": "id_venta",
+}
+# ON CONFLICT de las tablas particionadas: su clave primaria incluye la de partición
+CONFLICTO = {"hecho_ventas": "id_venta, id_tiempo"}
+ORDEN = ["dim_cliente", "dim_producto", "dim_tiempo", "hecho_ventas"]
+SUSTITUTAS = ("sk_cliente", "sk_producto")
+VIGENCIA = ("valido_desde", "valido_hasta", "es_actual")
+
+# Columnas agregadas al esquema después de la primera versión: un DW ya existente las recibe
+# (nulas) antes del merge, y el ON CONFLICT DO UPDATE de las dimensiones las completa
+MIGRACIONES = {
+    "dim_tiempo": [("trimestre", "INT"), ("anio_iso", "INT"), ("semana_iso", "INT"),
+                   ("dia_semana", "INT"), ("fin_de_mes", "BOOLEAN")],
+}
+
+
+def sql_fusion(tabla: str, columnas: list) -> str:
+    clave = CLAVES[tabla]
+    conflicto_en = CONFLICTO.get(tabla, clave)
+    cols = ", ".join(columnas)
+    # DISTINCT ON: ON CONFLICT DO UPDATE no admite la misma clave dos veces en un comando
+    origen = f"SELECT DISTINCT ON ({clave}) {cols} FROM stg_{tabla} ORDER BY {clave}"
+    # Hechos: ventas nuevas, y en las existentes solo se reasigna la versión de cliente/producto
+    # (una fecha efectiva hacia atrás cambia la versión vigente de ventas ya cargadas)
+    attrs = [c for c in columnas if c not in conflicto_en.split(", ")]
+    if tabla == "hecho_ventas":
+        attrs = [c for c in attrs if c in SUSTITUTAS]
+    if not attrs:
+        conflicto = f"ON CONFLICT ({conflicto_en}) DO NOTHING"
+    else:
+        sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in attrs)
+        viejos = ", ".join(f"t.{c}" for c in attrs)
+        nuevos = ", ".join(f"EXCLUDED.{c}" for c in attrs)
+        conflicto = (f"ON CONFLICT ({conflicto_en}) DO UPDATE SET {sets} "
+                     f"WHERE ({viejos}) IS DISTINCT FROM ({nuevos})")
+    if tabla in CONFLICTO:
+        # Tabla particionada: RETURNING no admite xmax; las nuevas se cuentan contra la foto
+        # previa al INSERT (todas las partes del comando ven la misma). También retorna los
+        # años tocados, para refrescar solo esos agregados
+        en_t = ", ".join(f"t.{c}" for c in conflicto_en.split(", "))
+        en_s = ", ".join(f"s.{c}" for c in conflicto_en.split(", "))
+        return (f"WITH nuevas AS (SELECT count(*) AS n FROM ({origen}) s WHERE NOT EXISTS "
+                f"(SELECT 1 FROM {tabla} t WHERE ({en_t}) = ({en_s}))), "
+                f"m AS (INSERT INTO {tabla} AS t ({cols}) {origen} {conflicto} "
+                f"RETURNING t.id_tiempo / 10000 AS anio) "
+                f"SELECT (SELECT n FROM nuevas), count(*) - (SELECT n FROM nuevas), "
+                f"array_agg(DISTINCT anio) FROM m")
+    if clave in SUSTITUTAS:
+        # Versiones corregidas en su lugar (otros atributos, no solo el cierre de vigencia):
+        # se comparan contra la foto previa al INSERT y se retornan sus claves sustitutas
+        atributos = [c for c in attrs if c not in VIGENCIA]
+        viejos = ", ".join(f"t.{c}" for c in atributos)
+        nuevos = ", ".join(f"s.{c}" for c in atributos)
+        return (f"WITH corregidas AS (SELECT s.{clave} FROM ({origen}) s JOIN {tabla} t USING ({clave}) "
+                f"WHERE ({viejos}) IS DISTINCT FROM ({nuevos})), "
+                f"m AS (INSERT INTO {tabla} AS t ({cols}) {origen} {conflicto} "
+                f"RETURNING (xmax = 0) AS insertado) "
+                f"SELECT count(*) FILTER (WHERE insertado), count(*) FILTER (WHERE NOT insertado), "
+                f"(SELECT array_agg({clave}) FROM corregidas) FROM m")
+    return (f"WITH m AS (INSERT INTO {tabla} AS t ({cols}) {origen} {conflicto} "
+            f"RETURNING (xmax = 0) AS insertado) "
+            f"SELECT count(*) FILTER (WHERE insertado), count(*) FILTER (WHERE NOT insertado) FROM m")
+
+
+def migrar(cur):
+    """
+    Agrega las columnas de MIGRACIONES que falten. Se mira el catálogo antes: ALTER TABLE
+    toma un lock ACCESS EXCLUSIVE aunque la columna ya exista (ADD COLUMN IF NOT EXISTS), y
+    dentro de la carga lo mantendría hasta el commit, bloqueando a los lectores de la tabla.
+    """
+    for tabla, columnas in MIGRACIONES.items():
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (tabla,))
+        existentes = {c for (c,) in cur.fetchall()}
+        faltan = [(c, tipo) for c, tipo in columnas if c not in existentes]
+        if faltan:
+            cur.execute(f"ALTER TABLE {tabla} " + ", ".join(f"ADD COLUMN {c} {tipo}" for c, tipo in faltan))
+
+
+def esquema_existe(cur) -> bool:
+    cur.execute("SELECT to_regclass('hecho_ventas') IS NOT NULL")
+    return cur.fetchone()[0]
+
+
+def esquema_con_historia(cur) -> bool:
+    """Si las dimensiones ya tienen claves sustitutas (SCD tipo 2)."""
+    cur.execute("SELECT count(*) FROM information_schema.columns "
+                "WHERE table_name = 'dim_cliente' AND column_name = 'sk_cliente'")
+    return cur.fetchone()[0] > 0
+
+
+def anios_con_versiones(cur, corregidas: dict) -> set:
+    """Años de los hechos que apuntan a las versiones corregidas ({sk_*: [claves]})."""
+    filtros = {sk: claves for sk, claves in corregidas.items() if claves}
+    if not filtros:
+        return set()
+    cur.execute("SELECT array_agg(DISTINCT id_tiempo / 10000) FROM hecho_ventas WHERE "
+                + " OR ".join(f"{sk} = ANY(%s)" for sk in filtros), list(filtros.values()))
+    return set(cur.fetchone()[0] or [])
+
+
+# Ventas ya cargadas con otra fecha: se quedan como están (ver el encabezado)
+SQL_FECHA_CAMBIADA = """
+DELETE FROM stg_hecho_ventas s USING hecho_ventas h
+WHERE s.id_venta = h.id_venta AND s.id_tiempo <> h.id_tiempo"""
+
+
+def fusionar(engine, dfs: dict, dw_sql: str, restricciones_sql: str, lote: int = 200_000) -> tuple:
+    """
+    Staging + merge de todas las tablas en una transacción, y refresco de los agregados.
+    Retorna (estadísticas por tabla, estadísticas de los agregados, nueva versión de carga).
+    Si el DW no existe se crea con ``dw_sql`` y ``restricciones_sql`` (sin datos, las claves
+    no cuestan).
+    """
+    stats, tocados, corregidas = [], set(), {}
+    with engine.begin() as conn:
+        with conn.connection.cursor() as cur:
+            # Sin agregados previos (DW nuevo o anterior a ellos) se calculan completos
+            previos = esquema_existe(cur) and agregados_existen(cur)
+            if not esquema_existe(cur):
+                cur.execute(dw_sql)
+                crear_particiones(cur, anios(dfs))
+                cur.execute(restricciones_sql)
+            else:
+                if not esquema_con_historia(cur):
+                    # Cambia la clave primaria de las dimensiones: no hay upsert posible
+                    raise RuntimeError("El DW tiene el esquema sin historia de dimensiones (SCD): "
+                                       "ejecuta una vez load_dw.py --modo completo")
+                if not es_particionada(cur):
+                    raise RuntimeError("El DW tiene hecho_ventas sin particionar (diseño anterior): "
+                                       "ejecuta una vez load_dw.py --modo completo")
+                migrar(cur)
+                crear_particiones(cur, anios(dfs))
+            for tabla in ORDEN:
+                df = dfs[tabla]
+                inicio = time.perf_counter()
+                cur.execute(f"CREATE TEMP TABLE stg_{tabla} (LIKE {tabla}) ON COMMIT DROP")
+                copiar_lotes(cur, f"stg_{tabla}", df, lote)
+                if tabla == "hecho_ventas":
+                    cur.execute(SQL_FECHA_CAMBIADA)
+                cur.execute(sql_fusion(tabla, list(df.columns)))
+                insertadas, actualizadas, *extra = cur.fetchone()
+                if tabla == "hecho_ventas":
+                    tocados.update(extra[0] or [])
+                elif extra:
+                    corregidas[CLAVES[tabla]] = extra[0] or []
+                stats.append({"tabla": tabla, "staging": len(df), "insertadas": insertadas,
+                              "actualizadas": actualizadas,
+                              "segundos": time.perf_counter() - inicio})
+            # Con los hechos ya fusionados: también los que llegaron apuntando a esas versiones
+            tocados |= anios_con_versiones(cur, corregidas)
+            agregados = refrescar_agregados(cur, sorted(tocados) if previos else None)
+            version = incrementar_version(cur)
+    return stats, agregados, version
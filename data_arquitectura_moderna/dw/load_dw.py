@@ -1,11 +1,25 @@
+import argparse
 import os
+import sys
+import time
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from pathlib import Path
 
 BASE = Path(__file__).resolve().parents[1]
-curated = BASE / "datalake" / "datos_curados"
+sys.path.insert(0, str(BASE / "etl"))
+from almacen import leer_tabla, guardada_como, DATALAKE  # noqa: E402
+from copia import copiar_tabla, copiar_en_paralelo  # noqa: E402
+from incremental import fusionar  # noqa: E402
+from agregados import refrescar_agregados  # noqa: E402
+from particiones import anios, crear_particiones  # noqa: E402
+from version_carga import incrementar_version  # noqa: E402
+from integridad import depurar  # noqa: E402
+from metricas import instrumentar, etapa_actual  # noqa: E402
+
+curated = DATALAKE / "datos_curados"
 dw_sql = (BASE / "dw" / "esquema.sql").read_text(encoding="utf-8")
+restricciones_sql = (BASE / "dw" / "restricciones.sql").read_text(encoding="utf-8")
 
 PGHOST = os.getenv("PGHOST","localhost")
 PGPORT = os.getenv("PGPORT","5432")
@@ -14,19 +28,121 @@ PGPASSWORD = os.getenv("PGPASSWORD","admin")
 PGDATABASE = os.getenv("PGDATABASE","ventas_olap")
 
 url = f"postgresql+psycopg2://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{PGDATABASE}"
-engine = create_engine(url, future=True)
-
-with engine.begin() as conn:
-    conn.execute(text(dw_sql))
-
-dfs = {
-    "dim_cliente": pd.read_csv(curated / "dim_cliente.csv"),
-    "dim_producto":  pd.read_csv(curated / "dim_producto.csv"),
-    "dim_tiempo":     pd.read_csv(curated / "dim_tiempo.csv", parse_dates=["fecha"]),
-    "hecho_ventas":   pd.read_csv(curated / "hecho_ventas.csv")
-}
-for table, df in dfs.items():
-    df.to_sql(table, engine, if_exists="append", index=False)
-    print(f"Cargado: {table} ({len(df)} filas)")
-
-print("Carga al DW completada ✅")
+
+def leer_curados(desde=None) -> dict:
+    """
+    ``desde`` (fecha) limita los hechos a id_tiempo >= desde; en Parquet además se podan las
+    particiones anio (el CSV no tiene esa columna).
+    """
+    filtros = None
+    if desde is not None:
+        desde = pd.Timestamp(desde)
+        id_desde = desde.year * 10000 + desde.month * 100 + desde.day
+        filtros = [("id_tiempo", ">=", id_desde)]
+        if not guardada_como(curated, "hecho_ventas", "csv"):
+            filtros.insert(0, ("anio", ">=", desde.year))
+    return {
+        "dim_cliente": leer_tabla(curated, "dim_cliente"),
+        "dim_producto":  leer_tabla(curated, "dim_producto"),
+        "dim_tiempo":     leer_tabla(curated, "dim_tiempo", parse_dates=["fecha"]),
+        "hecho_ventas":   leer_tabla(curated, "hecho_ventas", filtros=filtros)
+    }
+
+DIMENSIONES = ["dim_cliente", "dim_producto", "dim_tiempo"]
+
+def reportar(stats: dict):
+    etapa_actual().filas(entrada=stats["filas"], salida=stats["filas"])
+    etapa_actual().detalle.setdefault("filas_por_tabla", {})[stats["tabla"]] = stats["filas"]
+    print(f"Cargado: {stats['tabla']} ({stats['filas']} filas, {stats['segundos']:.2f}s, "
+          f"{stats['filas_s']:,.0f} filas/s)")
+
+def reportar_agregados(agregados: list):
+    for st in agregados:
+        anios = ("todos los años" if st["anios"] is None
+                 else f"años {', '.join(map(str, st['anios']))}" if st["anios"] else "ningún año")
+        print(f"Agregado: {st['tabla']} ({anios}: {st['filas']} filas, {st['segundos']:.2f}s)")
+    etapa_actual().anotar("agregados", {st["tabla"]: st["anios"] for st in agregados})
+
+@instrumentar("load_dw")
+def cargar(dfs: dict = None, metodo: str = "copy", lote: int = 200_000):
+    """
+    Recrea el esquema y carga las tablas (en memoria si se entregan, si no desde la zona curada).
+    metodo "copy": COPY FROM STDIN por lotes, dimensiones en paralelo y luego hechos.
+    metodo "to_sql": INSERTs de pandas, como antes (útil para comparar).
+    Las tablas se cargan sin claves ni índices; dw/restricciones.sql los crea al final y
+    luego se recalculan los agregados (dw/agregados.py). Antes de tocar la base, los hechos
+    que romperían una clave o un NOT NULL van a la cuarentena (etl/integridad.py).
+    """
+    engine = create_engine(url, future=True, pool_size=len(DIMENSIONES) + 1)
+
+    dfs = depurar(dfs if dfs is not None else leer_curados())
+    with engine.begin() as conn, conn.connection.cursor() as cur:
+        cur.execute(dw_sql)
+        crear_particiones(cur, anios(dfs))
+
+    # Hechos en orden de fecha: cada partición queda ordenada y su índice BRIN es preciso
+    tablas = {**dfs, "hecho_ventas": dfs["hecho_ventas"].sort_values("id_tiempo", kind="stable")}
+    if metodo == "copy":
+        # Dimensiones a la vez (cada una en su conexión) y luego hechos
+        for stats in copiar_en_paralelo(engine, {t: tablas[t] for t in DIMENSIONES}, lote):
+            reportar(stats)
+        reportar(copiar_tabla(engine, "hecho_ventas", tablas["hecho_ventas"], lote))
+    else:
+        for table in DIMENSIONES + ["hecho_ventas"]:
+            df = tablas[table]
+            inicio = time.perf_counter()
+            df.to_sql(table, engine, if_exists="append", index=False)
+            seg = time.perf_counter() - inicio
+            reportar({"tabla": table, "filas": len(df), "segundos": seg,
+                      "filas_s": len(df) / seg if seg > 0 else float("inf")})
+
+    # Claves, FKs e índices una sola vez sobre los datos cargados, y los agregados; recién
+    # entonces la cache de dw/consultas.py deja de valer
+    inicio = time.perf_counter()
+    with engine.begin() as conn, conn.connection.cursor() as cur:
+        cur.execute(restricciones_sql)
+        segundos = time.perf_counter() - inicio
+        agregados = refrescar_agregados(cur)
+        version = incrementar_version(cur)
+    etapa_actual().anotar("restricciones_segundos", round(segundos, 3))
+    print(f"Claves, FKs e índices creados ({segundos:.2f}s)")
+    reportar_agregados(agregados)
+    engine.dispose()
+    print(f"Carga al DW completada ✅ (versión de carga {version})")
+
+@instrumentar("load_dw")
+def cargar_incremental(dfs: dict = None, lote: int = 200_000, desde=None):
+    """
+    Upsert sin recrear el esquema: staging + ON CONFLICT en una sola transacción
+    (ver dw/incremental.py). Con ``desde`` solo se leen los hechos a partir de esa fecha.
+    Los hechos sin integridad referencial van a la cuarentena, como en la carga completa.
+    """
+    engine = create_engine(url, future=True)
+    dfs = depurar(dfs if dfs is not None else leer_curados(desde))
+    stats, agregados, version = fusionar(engine, dfs, dw_sql, restricciones_sql, lote)
+    for st in stats:
+        etapa_actual().filas(entrada=st["staging"], salida=st["insertadas"] + st["actualizadas"])
+        etapa_actual().detalle.setdefault("filas_por_tabla", {})[st["tabla"]] = st["staging"]
+        print(f"Fusionado: {st['tabla']} (staging {st['staging']} | nuevas {st['insertadas']} | "
+              f"actualizadas {st['actualizadas']} | {st['segundos']:.2f}s)")
+    reportar_agregados(agregados)
+    engine.dispose()
+    print(f"Carga incremental al DW completada ✅ (versión de carga {version})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modo", choices=["completo", "incremental"], default="completo",
+                        help="completo: recrea el esquema; incremental: upsert en una transacción")
+    parser.add_argument("--metodo", choices=["copy", "to_sql"], default="copy",
+                        help="Solo modo completo")
+    parser.add_argument("--lote", type=int, default=200_000, help="Filas por lote de COPY")
+    parser.add_argument("--desde", default=None,
+                        help="Modo incremental: cargar solo hechos desde esta fecha (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+    if args.modo == "incremental":
+        cargar_incremental(lote=args.lote, desde=args.desde)
+    else:
+        cargar(metodo=args.metodo, lote=args.lote)
+
+if __name__ == "__main__":
+    main()
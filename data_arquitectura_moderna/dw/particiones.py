@@ -0,0 +1,33 @@
+"""
+Particiones de hecho_ventas
+---------------------------
+hecho_ventas está particionada por rango de id_tiempo (yyyymmdd), una partición por año:
+hecho_ventas_2024 guarda [20240000, 20250000), así un filtro "id_tiempo BETWEEN 20240000 AND
+20249999" (docs/queries.sql) lee solo esa partición. No hay partición por defecto: load_dw.py
+crea las de los años que va a cargar antes de insertar (completo e incremental), así una
+fecha fuera de rango falla en vez de quedar en una partición que impide crear la del año.
+"""
+
+
+def anios(dfs: dict) -> list:
+    """Años de los hechos a cargar y del calendario de dim_tiempo."""
+    hechos = dfs["hecho_ventas"]["id_tiempo"].dropna().astype("int64") // 10000
+    calendario = dfs["dim_tiempo"]["anio"].dropna().astype("int64")
+    return sorted(int(a) for a in set(hechos.unique()) | set(calendario.unique()))
+
+
+def sql_particion(anio: int) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS hecho_ventas_{anio} PARTITION OF hecho_ventas "
+            f"FOR VALUES FROM ({anio * 10000}) TO ({(anio + 1) * 10000})")
+
+
+def crear_particiones(cur, anios_: list):
+    """Crea las particiones anuales que falten (no hace commit)."""
+    for anio in anios_:
+        cur.execute(sql_particion(anio))
+
+
+def es_particionada(cur) -> bool:
+    """Si hecho_ventas ya tiene el diseño particionado (un DW anterior es una tabla simple)."""
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'hecho_ventas'::regclass")
+    return cur.fetchone()[0]
@@ -0,0 +1,31 @@
+-- Claves, FKs e índices del DW. load_dw.py los crea después de la carga masiva de
+-- dw/esquema.sql; en modo incremental ya existen y el merge los usa.
+
+-- Dimensiones
+ALTER TABLE dim_cliente ADD PRIMARY KEY (sk_cliente);
+CREATE UNIQUE INDEX dim_cliente_actual ON dim_cliente (id_cliente) WHERE es_actual;
+
+ALTER TABLE dim_producto ADD PRIMARY KEY (sk_producto);
+CREATE UNIQUE INDEX dim_producto_actual ON dim_producto (id_producto) WHERE es_actual;
+
+ALTER TABLE dim_tiempo ADD PRIMARY KEY (id_tiempo);
+
+-- Hechos: en una tabla particionada la clave primaria debe incluir la clave de partición
+-- (la unicidad de id_venta sola la garantizan la limpieza y el merge de dw/incremental.py)
+ALTER TABLE hecho_ventas ADD PRIMARY KEY (id_venta, id_tiempo);
+ALTER TABLE hecho_ventas ADD FOREIGN KEY (sk_cliente)  REFERENCES dim_cliente (sk_cliente);
+ALTER TABLE hecho_ventas ADD FOREIGN KEY (sk_producto) REFERENCES dim_producto (sk_producto);
+ALTER TABLE hecho_ventas ADD FOREIGN KEY (id_tiempo)   REFERENCES dim_tiempo (id_tiempo);
+
+-- Índices para docs/queries.sql (se crean en cada partición):
+-- BRIN en id_tiempo: rangos de fecha dentro de un año; mínimo tamaño porque load_dw.py
+-- carga los hechos ordenados por fecha
+CREATE INDEX hecho_ventas_tiempo_brin ON hecho_ventas USING brin (id_tiempo);
+-- B-tree por clave de producto y de cliente, con fecha y total: ventas por categoría y top
+-- clientes se resuelven con index-only scans, y borrar/actualizar una dimensión no
+-- recorre todos los hechos para validar la FK
+CREATE INDEX hecho_ventas_producto ON hecho_ventas (sk_producto, id_tiempo) INCLUDE (total);
+CREATE INDEX hecho_ventas_cliente ON hecho_ventas (sk_cliente, id_tiempo) INCLUDE (total);
+
+-- Estadísticas frescas para el planificador después de la carga
+ANALYZE dim_cliente, dim_producto, dim_tiempo, hecho_ventas;
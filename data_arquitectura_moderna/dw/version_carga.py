@@ -0,0 +1,45 @@
+"""
+Versión de carga del DW
+-----------------------
+Una fila en dw_carga con un contador que load_dw.py incrementa al final de cada carga
+(completa o incremental; en la incremental, dentro de la misma transacción que el merge).
+dw/consultas.py la usa en la clave de su cache: un resultado guardado vale mientras la
+versión no cambie.
+
+La versión se informa como "<contador>@<fecha de la carga>": si el DW se recrea desde cero
+el contador vuelve a empezar, pero la fecha no se repite. Recrear el esquema
+(dw/esquema.sql) no borra dw_carga.
+"""
+
+SQL_TABLA = """
+CREATE TABLE IF NOT EXISTS dw_carga (
+  unica    BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (unica),
+  version  BIGINT NOT NULL,
+  cargado  TIMESTAMPTZ NOT NULL
+)"""
+
+SQL_INCREMENTAR = """
+INSERT INTO dw_carga (version, cargado) VALUES (1, clock_timestamp())
+ON CONFLICT (unica) DO UPDATE SET version = dw_carga.version + 1, cargado = clock_timestamp()
+RETURNING version, cargado"""
+
+
+def _texto(version, cargado) -> str:
+    return f"{version}@{cargado.isoformat()}"
+
+
+def incrementar_version(cur) -> str:
+    """Nueva versión de carga (usa el cursor dado; el commit es de quien llama)."""
+    cur.execute(SQL_TABLA)
+    cur.execute(SQL_INCREMENTAR)
+    return _texto(*cur.fetchone())
+
+
+def leer_version(cur):
+    """Versión de carga actual, o None si el DW nunca registró una (cargado antes de dw_carga)."""
+    cur.execute("SELECT to_regclass('dw_carga') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return None
+    cur.execute("SELECT version, cargado FROM dw_carga")
+    fila = cur.fetchone()
+    return _texto(*fila) if fila else None
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Capa de almacenamiento de las zonas del datalake y del datamart
+---------------------------------------------------------------
+Las tablas se guardan en Parquet (tipado y comprimido), así la siguiente etapa no vuelve
+a parsear fechas ni a inferir tipos, y las columnas Int64 no pasan por texto. Los montos
+se guardan como decimal exacto cuando se puede (ver tipos.py) y vuelven como float64.
+
+- DATALAKE / DATAMART: raíces de datos de todas las etapas (ETL_DATALAKE / ETL_DATAMART)
+- guardar_tabla(df, carpeta, nombre, particiones=None, formato="parquet")
+    * sin particiones: carpeta/nombre.parquet
+    * con particiones: carpeta/nombre/anio=2023/mes=1/*.parquet (estilo hive); sin filas,
+      un archivo vacío con el esquema (y las columnas de partición) en carpeta/nombre/
+    * formato "csv" o "ambos" escribe además/en cambio carpeta/nombre.csv; "parquet" borra
+      el CSV anterior (leer_tabla no debe caer a una versión vieja)
+- reemplazar_particiones(df, carpeta, nombre, particiones): reescribe solo las particiones
+  presentes en df y deja las demás (carga incremental de hechos)
+- leer_tabla(carpeta, nombre, columnas=None, filtros=None)
+    * lee Parquet si existe, si no cae al CSV
+    * columnas: solo lee esas columnas
+    * filtros: estilo pyarrow, p.ej. [("anio", "=", 2023), ("mes", "in", [1, 2])];
+      sobre una tabla particionada se descartan carpetas completas sin abrirlas. El CSV no
+      guarda anio/mes: si un filtro las usa se derivan de id_tiempo (DERIVADAS)
+
+pyarrow se importa solo al usar Parquet, de modo que el modo CSV funciona sin él.
+Los bytes leídos y escritos se suman a la etapa en curso (metricas.py); al leer con
+filtros solo cuentan los archivos de las particiones que sobreviven a la poda.
+"""
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from metricas import etapa_actual
+from tipos import a_arrow, desde_arrow, decimales_exactos, entero_minimo
+
+BASE = Path(__file__).resolve().parents[1]
+# Raíces de datos de todas las etapas; ETL_DATALAKE / ETL_DATAMART apuntan a otras (p.ej. las
+# de bench/bench_etapas.py, que trabaja en una copia aparte del proyecto)
+DATALAKE = Path(os.getenv("ETL_DATALAKE", BASE / "datalake"))
+DATAMART = Path(os.getenv("ETL_DATAMART", BASE / "datamart"))
+
+FORMATOS = ("parquet", "csv", "ambos")
+COMPRESION = "zstd"
+# Columnas de partición que se derivan de id_tiempo (yyyymmdd); el CSV no las guarda
+DERIVADAS = {"anio": lambda df: df["id_tiempo"] // 10000,
+             "mes": lambda df: df["id_tiempo"] // 100 % 100}
+
+
+def _borrar(ruta: Path):
+    if ruta.is_dir():
+        shutil.rmtree(ruta)
+    elif ruta.exists():
+        ruta.unlink()
+
+
+def guardar_tabla(df: pd.DataFrame, carpeta, nombre: str, particiones=None,
+                  formato: str = "parquet", **csv_kwargs):
+    """Escribe la tabla en la zona indicada, reemplazando la versión anterior."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato} (opciones: {', '.join(FORMATOS)})")
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    particiones = list(particiones or [])
+
+    # Parquet de una corrida anterior taparía al CSV nuevo en leer_tabla, y un CSV anterior
+    # quedaría como respaldo desactualizado si el Parquet llegara a faltar
+    viejas = [carpeta / nombre, carpeta / f"{nombre}.parquet"]
+    if formato == "parquet":
+        viejas.append(carpeta / f"{nombre}.csv")
+    for ruta in viejas:
+        _borrar(ruta)
+
+    if formato in ("parquet", "ambos"):
+        import pyarrow.parquet as pq
+
+        if particiones:
+            escribir_particiones(df, carpeta / nombre, particiones)
+        else:
+            pq.write_table(a_arrow(df), carpeta / f"{nombre}.parquet", compression=COMPRESION)
+
+    ruta_csv = carpeta / f"{nombre}.csv"
+    if formato in ("csv", "ambos"):
+        # El CSV mantiene el esquema original: sin las columnas de partición
+        df.drop(columns=particiones).to_csv(ruta_csv, index=False, **csv_kwargs)
+    etapa_actual().escrito(carpeta / nombre, carpeta / f"{nombre}.parquet", ruta_csv)
+
+
+def escribir_particiones(df: pd.DataFrame, raiz: Path, particiones: list, decimales: dict = None):
+    """
+    Un archivo por partición (raiz/anio=2023/mes=1/part-0.parquet). Se escribe con
+    write_table en vez de write_to_dataset: nombres estables, sin el pool de hilos del
+    escritor de datasets, y cada partición se puede reescribir por separado (``decimales``
+    fija entonces el esquema de las ya escritas).
+
+    Sin filas no hay carpetas: raiz/part-0.parquet guarda el esquema completo, con las
+    columnas de partición marcadas en los metadatos para que leer_tabla las trate como tales.
+    """
+    import pyarrow.parquet as pq
+
+    # Montos en decimal solo si toda la tabla lo permite: un esquema para todas las particiones
+    if decimales is None:
+        decimales = decimales_exactos(df)
+    vacia = raiz / "part-0.parquet"
+    if df.empty:
+        raiz.mkdir(parents=True, exist_ok=True)
+        tabla = a_arrow(df, decimales)
+        metadatos = {**(tabla.schema.metadata or {}), b"particiones": ",".join(particiones).encode()}
+        pq.write_table(tabla.replace_schema_metadata(metadatos), vacia, compression=COMPRESION)
+        return
+    if vacia.exists():
+        vacia.unlink()
+    for valores, grupo in df.groupby(particiones, sort=True, observed=True):
+        valores = valores if isinstance(valores, tuple) else (valores,)
+        ruta = raiz.joinpath(*(f"{c}={v}" for c, v in zip(particiones, valores)))
+        ruta.mkdir(parents=True, exist_ok=True)
+        tabla = a_arrow(grupo.drop(columns=particiones), decimales)
+        pq.write_table(tabla, ruta / "part-0.parquet", compression=COMPRESION)
+
+
+def _ajustar_a_esquema(df: pd.DataFrame, esquema, particiones: list):
+    """
+    ``df`` con los enteros en el tipo que ya tiene la tabla (las particiones deben coincidir
+    en esquema), o None si alguna columna no cabe o no coincide.
+    """
+    import pyarrow as pa
+
+    columnas = [c for c in esquema.names if c not in particiones]
+    if sorted(columnas) != sorted(c for c in df.columns if c not in particiones):
+        return None
+    df = df.copy(deep=False)
+    for c in columnas:
+        tipo = esquema.field(c).type
+        if pa.types.is_decimal(tipo):
+            continue
+        if pa.types.is_integer(tipo):
+            necesario = entero_minimo(df[c])
+            if necesario is None or np.iinfo(necesario.lower()).bits > tipo.bit_width:
+                return None
+            nullable = df[c].hasnans or pd.api.types.is_extension_array_dtype(df[c])
+            df[c] = df[c].astype(f"{'I' if nullable else 'i'}nt{tipo.bit_width}")
+        elif pa.Schema.from_pandas(df[[c]].head(0), preserve_index=False).field(c).type != tipo:
+            return None
+    return df
+
+
+def reemplazar_particiones(df: pd.DataFrame, carpeta, nombre: str, particiones: list) -> bool:
+    """
+    Reescribe las particiones de ``df`` en la tabla particionada carpeta/nombre, sin tocar
+    las demás. Retorna False sin escribir si la tabla no es un dataset Parquet particionado
+    o si df no cabe en su esquema (un entero más ancho, un monto que ya no es decimal
+    exacto): quien llama debe reescribir la tabla completa con guardar_tabla.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    raiz = Path(carpeta) / nombre
+    if not raiz.is_dir():
+        return False
+    esquema = ds.dataset(raiz, format="parquet", partitioning="hive").schema
+    decimales = {c: esquema.field(c).type.scale for c in esquema.names
+                 if pa.types.is_decimal(esquema.field(c).type)}
+    exactas = decimales_exactos(df)
+    if any(exactas.get(c) != escala for c, escala in decimales.items()):
+        return False
+    df = _ajustar_a_esquema(df, esquema, particiones)
+    if df is None:
+        return False
+    if not df.empty:
+        escribir_particiones(df, raiz, particiones, decimales)
+        etapa_actual().escrito(raiz)
+    return True
+
+
+def guardada_como(carpeta, nombre: str, formato: str) -> bool:
+    """Si la tabla ya está guardada en ``formato`` (guardar en CSV borra el Parquet)."""
+    carpeta = Path(carpeta)
+    parquet = (carpeta / nombre).is_dir() or (carpeta / f"{nombre}.parquet").exists()
+    csv = (carpeta / f"{nombre}.csv").exists()
+    return {"parquet": parquet, "csv": csv and not parquet, "ambos": parquet and csv}[formato]
+
+
+def existe_tabla(carpeta, nombre: str) -> bool:
+    carpeta = Path(carpeta)
+    return any(r.exists() for r in (carpeta / nombre, carpeta / f"{nombre}.parquet",
+                                    carpeta / f"{nombre}.csv"))
+
+
+def leer_tabla(carpeta, nombre: str, columnas=None, filtros=None, parse_dates=None) -> pd.DataFrame:
+    """
+    Lee una tabla de la zona. Las columnas de partición solo se devuelven si se piden en
+    ``columnas``; por defecto la tabla vuelve con el mismo esquema con que se escribió el CSV.
+    ``parse_dates`` solo se usa al caer al CSV (Parquet ya guarda las fechas tipadas).
+    """
+    carpeta = Path(carpeta)
+    dir_part = carpeta / nombre
+    archivo = carpeta / f"{nombre}.parquet"
+
+    if dir_part.is_dir() or archivo.exists():
+        import pyarrow.dataset as ds
+
+        if dir_part.is_dir():
+            dataset = ds.dataset(dir_part, format="parquet", partitioning="hive")
+            marcadas = (dataset.schema.metadata or {}).get(b"particiones")
+            part = marcadas.decode().split(",") if marcadas else dataset.partitioning.schema.names
+        else:
+            dataset = ds.dataset(archivo, format="parquet")
+            part = []
+        if columnas is None:
+            columnas = [c for c in dataset.schema.names if c not in part]
+        filtro = _expresion(filtros)
+        etapa_actual().leido(*(f.path for f in dataset.get_fragments(filter=filtro)))
+        return desde_arrow(dataset.to_table(columns=list(columnas), filter=filtro))
+
+    ruta_csv = carpeta / f"{nombre}.csv"
+    if not ruta_csv.exists():
+        raise FileNotFoundError(f"No existe la tabla {nombre} en {carpeta}")
+    if parse_dates and columnas is not None:
+        parse_dates = [c for c in parse_dates if c in columnas]
+    etapa_actual().leido(ruta_csv)
+    # Columnas de partición filtradas: se agregan desde id_tiempo y se quitan al final
+    en_csv = pd.read_csv(ruta_csv, nrows=0).columns
+    derivar = [c for c in dict.fromkeys(f[0] for f in filtros or []) if c not in en_csv]
+    faltan = [c for c in derivar if c not in DERIVADAS or "id_tiempo" not in en_csv]
+    if faltan:
+        raise ValueError(f"{ruta_csv} no tiene las columnas de los filtros: {', '.join(faltan)}")
+    leer = columnas
+    if derivar and columnas is not None and "id_tiempo" not in columnas:
+        leer = list(columnas) + ["id_tiempo"]
+    df = pd.read_csv(ruta_csv, usecols=leer, parse_dates=parse_dates)
+    if filtros:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        df = df.assign(**{c: DERIVADAS[c](df) for c in derivar})
+        df = ds.dataset(pa.Table.from_pandas(df, preserve_index=False)) \
+               .to_table(filter=_expresion(filtros)).to_pandas()
+        df = df.drop(columns=[c for c in df.columns if c not in (columnas or en_csv)])
+    return df
+
+
+def _expresion(filtros):
+    if not filtros:
+        return None
+    import pyarrow.parquet as pq
+    return pq.filters_to_expression(filtros)
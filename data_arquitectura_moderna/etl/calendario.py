@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dimensión calendario (dim_tiempo)
+---------------------------------
+En vez de armar dim_tiempo con las fechas distintas de ventas y formatear cada fecha como
+texto para volver a leerla como entero, se genera un calendario de años completos de una
+vez, vectorizado:
+
+- id_tiempo = anio * 10000 + mes * 100 + dia (yyyymmdd con aritmética entera, sin strftime);
+  la misma función da el id_tiempo de los hechos
+- anio, mes, dia, trimestre, anio_iso/semana_iso (semana ISO 8601), dia_semana
+  (1 = lunes ... 7 = domingo) y fin_de_mes
+
+El calendario se guarda en la zona curada como dim_tiempo y se reutiliza: solo se extiende
+(con los años que faltan) cuando llegan fechas fuera de su rango. Una dim_tiempo antigua,
+sin las columnas del calendario, se regenera.
+
+Uso:
+  dim_tiempo = asegurar_calendario(curated, ventas["fecha"], formato="parquet")
+  ventas["id_tiempo"] = clave_tiempo(ventas["fecha"])
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import guardar_tabla, leer_tabla, existe_tabla, guardada_como
+
+COLUMNAS = ["id_tiempo", "fecha", "anio", "mes", "dia", "trimestre",
+            "anio_iso", "semana_iso", "dia_semana", "fin_de_mes"]
+
+
+def _yyyymmdd(dias: pd.DatetimeIndex) -> np.ndarray:
+    return (dias.year * 10000 + dias.month * 100 + dias.day).to_numpy(dtype=np.int32)
+
+
+def clave_tiempo(fechas) -> pd.Series:
+    """
+    yyyymmdd como entero para cada fecha (NaT -> nulo). Las fechas de los hechos caen en
+    pocos días distintos: la aritmética se hace una vez por día del rango y cada fila toma
+    su clave por posición (día - primer día).
+    """
+    f = pd.Series(fechas, copy=False)
+    dias = f.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    validas = ~np.isnat(dias)
+    n = dias.view(np.int64)
+    primero, ultimo = (int(n[validas].min()), int(n[validas].max())) if validas.any() else (0, -1)
+    if ultimo - primero > 1_000_000:
+        # Rango absurdo (más de 2.700 años): directo, sin tabla
+        clave = f.dt.year * 10000 + f.dt.month * 100 + f.dt.day
+        return clave.astype("Int32" if clave.hasnans else "int32")
+    tabla = _yyyymmdd(pd.date_range(np.datetime64(primero, "D"), periods=ultimo - primero + 1, freq="D"))
+    clave = np.zeros(len(n), dtype=np.int32)
+    clave[validas] = tabla[n[validas] - primero]
+    if validas.all():
+        return pd.Series(clave, index=f.index, name=f.name)
+    return pd.Series(pd.arrays.IntegerArray(clave, ~validas), index=f.index, name=f.name)
+
+
+def generar(inicio, fin) -> pd.DataFrame:
+    """Calendario diario de ``inicio`` a ``fin`` (ambos incluidos)."""
+    dias = pd.date_range(pd.Timestamp(inicio).normalize(), pd.Timestamp(fin).normalize(), freq="D")
+    iso = dias.isocalendar()
+    cal = pd.DataFrame({
+        "id_tiempo": _yyyymmdd(dias),
+        "fecha": dias,
+        "anio": dias.year,
+        "mes": dias.month,
+        "dia": dias.day,
+        "trimestre": dias.quarter,
+        "anio_iso": iso["year"].to_numpy(),
+        "semana_iso": iso["week"].to_numpy(),
+        "dia_semana": dias.dayofweek + 1,
+        "fin_de_mes": dias.is_month_end,
+    })
+    enteros = [c for c in COLUMNAS if c not in ("fecha", "fin_de_mes")]
+    return cal.astype({c: "int32" for c in enteros})
+
+
+def leer_calendario(carpeta) -> pd.DataFrame:
+    """dim_tiempo persistida si existe y ya es un calendario completo; si no, None."""
+    if not existe_tabla(carpeta, "dim_tiempo"):
+        return None
+    cal = leer_tabla(carpeta, "dim_tiempo", parse_dates=["fecha"])
+    if list(cal.columns) != COLUMNAS or len(cal) == 0:
+        return None
+    return cal.sort_values("fecha", ignore_index=True)
+
+
+def asegurar_calendario(carpeta, fechas, formato: str = "parquet") -> pd.DataFrame:
+    """
+    Calendario que cubre los años completos de ``fechas``. Reutiliza el guardado en
+    ``carpeta``, lo extiende solo con los años nuevos y lo guarda únicamente si cambió.
+    """
+    carpeta = Path(carpeta)
+    validas = pd.Series(fechas, copy=False).dropna()
+    actual = leer_calendario(carpeta)
+    if len(validas) == 0:
+        # Sin fechas válidas: el calendario guardado, o uno vacío (fin antes que inicio)
+        return actual if actual is not None else generar("2000-01-01", "1999-12-31")
+    inicio = pd.Timestamp(validas.min().year, 1, 1)
+    fin = pd.Timestamp(validas.max().year, 12, 31)
+
+    if actual is None:
+        cal, nuevos = generar(inicio, fin), None
+    else:
+        desde, hasta = actual["fecha"].iloc[0], actual["fecha"].iloc[-1]
+        antes = generar(inicio, desde - pd.Timedelta(days=1)) if inicio < desde else None
+        despues = generar(hasta + pd.Timedelta(days=1), fin) if fin > hasta else None
+        extensiones = [p for p in (antes, despues) if p is not None]
+        if not extensiones and guardada_como(carpeta, "dim_tiempo", formato):
+            print(f"dim_tiempo: calendario al día ({desde.date()} a {hasta.date()})")
+            return actual
+        cal = pd.concat([p for p in (antes, actual, despues) if p is not None], ignore_index=True)
+        nuevos = sum(len(p) for p in extensiones)
+
+    guardar_tabla(cal, carpeta, "dim_tiempo", formato=formato)
+    detalle = "nuevo" if nuevos is None else f"+{nuevos} días"
+    print(f"dim_tiempo: calendario {cal['fecha'].iloc[0].date()} a {cal['fecha'].iloc[-1].date()} "
+          f"({len(cal)} días, {detalle})")
+    return cal
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Joins de estrella por índice posicional (sin DataFrame.merge)
+-------------------------------------------------------------
+Las claves de las dimensiones son enteros pequeños y densos (id_producto, id_cliente,
+id_tiempo como yyyymmdd), así que cada dimensión se indexa una vez con un arreglo
+``posicion[clave - minimo] -> fila``. Resolver un atributo para millones de hechos es
+entonces una resta, una lectura del arreglo y un ``take`` sobre la columna de la
+dimensión: sin tabla hash por llamada y sin copiar las columnas de hechos que no se piden.
+
+Si el rango de claves es demasiado disperso para un arreglo denso se usa un índice
+ordenado (searchsorted), con el mismo resultado.
+
+Casos explícitos:
+- claves de hecho sin match (o nulas): faltantes="nulo" (atributos nulos, como un left
+  merge), "descartar" (se quitan esas filas, como un inner) o "error" (ValueError)
+- claves duplicadas en la dimensión: duplicados="error" por defecto ("primero"/"ultimo"
+  para quedarse con una fila); un merge multiplicaría los hechos sin avisar
+
+Uso:
+  estrella = Estrella({"dim_producto": IndiceDimension(dim_producto, "id_producto"),
+                       "dim_tiempo": IndiceDimension(dim_tiempo, "id_tiempo")})
+  df = estrella.unir(hechos, ["total", "cantidad"],
+                     {"categoria": ("dim_producto", "categoria"), "anio": ("dim_tiempo", "anio")})
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+FALTANTES = ("nulo", "descartar", "error")
+
+
+def claves_enteras(claves) -> tuple:
+    """(claves como int64, máscara de nulos) para Series/arreglos con o sin nulos."""
+    s = pd.Series(claves, copy=False)
+    nulos = s.isna().to_numpy()
+    if nulos.any():
+        s = s.fillna(0)
+    return s.to_numpy(dtype=np.int64), nulos
+
+
+class IndiceDimension:
+    def __init__(self, df: pd.DataFrame, clave: str, duplicados: str = "error"):
+        if duplicados not in ("error", "primero", "ultimo"):
+            raise ValueError("duplicados debe ser 'error', 'primero' o 'ultimo'")
+        self.df, self.clave = df, clave
+        claves, nulos = claves_enteras(df[clave])
+        filas = np.flatnonzero(~nulos)
+        claves = claves[filas]
+
+        unicas, primera = np.unique(claves, return_index=True)
+        if len(unicas) < len(claves):
+            if duplicados == "error":
+                repetidas = pd.Series(claves).loc[lambda s: s.duplicated()].unique()[:5]
+                raise ValueError(f"{clave} tiene claves duplicadas en la dimensión "
+                                 f"(ej: {list(repetidas)}); usa duplicados='primero' o 'ultimo'")
+            if duplicados == "ultimo":
+                primera = len(claves) - 1 - np.unique(claves[::-1], return_index=True)[1]
+        filas = filas[primera]
+
+        self.minimo = int(unicas[0]) if len(unicas) else 0
+        rango = int(unicas[-1]) - self.minimo + 1 if len(unicas) else 0
+        if rango <= max(4 * len(unicas), 1 << 20):
+            self.posicion = np.full(rango, -1, dtype=np.int64)
+            self.posicion[unicas - self.minimo] = filas
+            self.ordenadas = None
+        else:
+            self.posicion, self.ordenadas, self.filas = None, unicas, filas
+
+    @property
+    def denso(self) -> bool:
+        return self.posicion is not None
+
+    def posiciones(self, claves) -> np.ndarray:
+        """Fila de la dimensión para cada clave de hecho; -1 si no hay match o es nula."""
+        k, nulos = claves_enteras(claves)
+        pos = np.full(len(k), -1, dtype=np.int64)
+        if self.denso:
+            rel = k - self.minimo
+            ok = ~nulos & (rel >= 0) & (rel < len(self.posicion))
+            pos[ok] = self.posicion[rel[ok]]
+        elif len(self.ordenadas):
+            i = np.searchsorted(self.ordenadas, k)
+            i[i == len(self.ordenadas)] = 0
+            ok = ~nulos & (self.ordenadas[i] == k)
+            pos[ok] = self.filas[i[ok]]
+        return pos
+
+    def tomar(self, pos: np.ndarray, columna: str):
+        """Valores de ``columna`` en las filas ``pos``; -1 da nulo (con el tipo que usaría merge)."""
+        s = self.df[columna]
+        valores = s.array if pd.api.types.is_extension_array_dtype(s.dtype) else s.to_numpy()
+        return take(valores, pos, allow_fill=True)
+
+
+class Estrella:
+    def __init__(self, dimensiones: dict, claves_hecho: dict = None):
+        """
+        dimensiones: nombre -> IndiceDimension. claves_hecho: nombre -> columna de la tabla
+        de hechos que apunta a esa dimensión (por defecto, la misma clave de la dimensión).
+        """
+        self.dimensiones = dimensiones
+        self.claves_hecho = {n: (claves_hecho or {}).get(n, d.clave) for n, d in dimensiones.items()}
+
+    def unir(self, hechos: pd.DataFrame, columnas: list, atributos: dict,
+             faltantes: str = "nulo") -> pd.DataFrame:
+        """
+        Retorna solo ``columnas`` de hechos más ``atributos`` (nombre_salida -> (dimensión,
+        columna)), en el orden de los hechos y con índice 0..n-1.
+        """
+        if faltantes not in FALTANTES:
+            raise ValueError(f"faltantes debe ser uno de {FALTANTES}")
+        usadas = list(dict.fromkeys(dim for dim, _ in atributos.values()))
+        posiciones = {}
+        for dim in usadas:
+            clave = self.claves_hecho[dim]
+            pos = self.dimensiones[dim].posiciones(hechos[clave])
+            sin_match = pos < 0
+            if sin_match.any() and faltantes == "error":
+                ejemplos = pd.unique(hechos[clave].to_numpy()[sin_match])[:5]
+                raise ValueError(f"{int(sin_match.sum())} filas con {clave} sin match en {dim} "
+                                 f"(ej: {list(ejemplos)})")
+            posiciones[dim] = pos
+
+        conservar = None
+        if faltantes == "descartar" and posiciones:
+            conservar = np.logical_and.reduce([p >= 0 for p in posiciones.values()])
+            posiciones = {d: p[conservar] for d, p in posiciones.items()}
+
+        salida = {}
+        for c in columnas:
+            valores = hechos[c].array
+            salida[c] = valores[conservar] if conservar is not None else valores
+        for nombre, (dim, col) in atributos.items():
+            salida[nombre] = self.dimensiones[dim].tomar(posiciones[dim], col)
+        return pd.DataFrame(salida, copy=False)
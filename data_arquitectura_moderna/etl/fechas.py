@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parseo vectorizado de fechas en múltiples formatos
+--------------------------------------------------
+Reemplaza el ``df["fecha"].apply(limpiar_fecha)`` fila a fila (que bench/bench_fechas.py
+conserva como referencia) por un motor por lotes:
+
+- Trabaja sobre los valores distintos de la columna (las fechas se repiten mucho)
+- Normaliza separadores de toda la columna de una vez ("\\", "." y "-" -> "/")
+- Prueba cada formato candidato en una sola llamada sobre lo que queda sin parsear
+- Solo cae a la inferencia con dayfirst para los valores que ningún formato reconoce
+- Recuerda, por origen de los datos, qué formatos funcionaron (cache en JSON); la clave
+  es el nombre del archivo sin la fecha, así las particiones diarias comparten una entrada
+
+El resultado es idéntico al de ``limpiar_fecha`` del benchmark.
+"""
+import json
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Mismo orden que limpiar_fecha. Tras normalizar separadores los formatos con "-" ya no
+# pueden calzar, y los que quedan son mutuamente excluyentes (%Y exige 4 dígitos, %y 2),
+# por lo que reordenarlos según la cache no cambia el resultado, solo el costo.
+FORMATOS_FECHA = ("%Y/%m/%d", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y")
+MARCADORES_VACIO = ("", "NA", "N/A", "--", "None", "null")
+INFERENCIA = "inferencia_dayfirst"
+NO_PARSEABLE = "no_parseable"
+SUFIJO_FECHA = re.compile(r"_\d{4}-?\d{2}-?\d{2}$")
+
+
+def normalizar_fechas(s: pd.Series) -> pd.Series:
+    """strip, marcadores de vacío -> NaN y separadores unificados a '/' (vectorizado)."""
+    s = s.astype(str).str.strip()
+    s = s.mask(s.isin(MARCADORES_VACIO))
+    return s.str.replace(r"[\\.\-]", "/", regex=True)
+
+
+def _inferir(s: str):
+    # Igual que el último recurso de limpiar_fecha: escalar, con dayfirst
+    return pd.to_datetime(s, errors="coerce", dayfirst=True)
+
+
+def parsear_fechas(s: pd.Series, formatos=FORMATOS_FECHA):
+    """
+    Parsea una columna de fechas en texto. Retorna (serie datetime64, conteo por formato),
+    donde el conteo indica cuántas filas resolvió cada formato, la inferencia y cuántas
+    quedaron como NaT.
+    """
+    conteo = {fmt: 0 for fmt in formatos}
+    conteo[INFERENCIA] = 0
+    conteo[NO_PARSEABLE] = 0
+    if s.empty:
+        return pd.Series(index=s.index, dtype=s.dtype), conteo
+
+    # Valores distintos: se parsea cada uno una sola vez y luego se reexpande por código
+    if s.dtype != object:
+        s = s.astype(object).where(s.notna())
+    codigos, unicos = pd.factorize(s, use_na_sentinel=True)
+    filas_por_valor = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+    conteo[NO_PARSEABLE] += int((codigos < 0).sum())
+
+    texto = normalizar_fechas(pd.Series(unicos, dtype=object))
+    parseado = np.full(len(texto), np.datetime64("NaT"), dtype="datetime64[ns]")
+    pendiente = texto.notna().to_numpy()
+
+    for fmt in formatos:
+        if not pendiente.any():
+            break
+        idx = np.flatnonzero(pendiente)
+        p = pd.to_datetime(texto.iloc[idx], format=fmt, errors="coerce").to_numpy()
+        ok = ~np.isnat(p)
+        parseado[idx[ok]] = p[ok]
+        pendiente[idx[ok]] = False
+        conteo[fmt] += int(filas_por_valor[idx[ok]].sum())
+
+    # Inferencia solo para lo que no calzó con ningún formato
+    for i in np.flatnonzero(pendiente):
+        v = _inferir(texto.iat[i])
+        if pd.notna(v):
+            parseado[i] = v.to_datetime64()
+            conteo[INFERENCIA] += int(filas_por_valor[i])
+
+    conteo[NO_PARSEABLE] += int(filas_por_valor[np.isnat(parseado)].sum())
+    # El código -1 (nulo) apunta al NaT agregado al final
+    fechas = np.append(parseado, np.datetime64("NaT"))[codigos]
+    resultado = pd.Series(fechas, index=s.index, dtype="datetime64[ns]")
+    return resultado, conteo
+
+
+# ---------- Cache de formatos por origen (nombre sin fecha) ----------
+def leer_cache_formatos(ruta_cache: Path) -> dict:
+    ruta_cache = Path(ruta_cache)
+    if not ruta_cache.exists():
+        return {}
+    try:
+        return json.loads(ruta_cache.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def clave_origen(origen) -> str:
+    """ventas_2024-01-15.csv y ventas_20240116.csv -> "ventas"; ventas_pos.csv -> "ventas_pos"."""
+    return SUFIJO_FECHA.sub("", Path(origen).stem)
+
+
+def orden_formatos(cache: dict, origen, formatos=FORMATOS_FECHA) -> tuple:
+    """Formatos que ya funcionaron para este origen primero, luego el resto en el orden base."""
+    previos = [f for f in cache.get(clave_origen(origen), {}).get("formatos", []) if f in formatos]
+    return tuple(previos) + tuple(f for f in formatos if f not in previos)
+
+
+def anotar_formatos(cache: dict, origen, conteo: dict):
+    usados = sorted((f for f in conteo if f in FORMATOS_FECHA and conteo[f] > 0),
+                    key=lambda f: -conteo[f])
+    cache[clave_origen(origen)] = {"formatos": usados, "conteo": conteo}
+
+
+def actualizar_cache_formatos(ruta_cache: Path, cache: dict, origen, conteo: dict):
+    anotar_formatos(cache, origen, conteo)
+    guardar_cache_formatos(ruta_cache, cache)
+
+
+def guardar_cache_formatos(ruta_cache: Path, cache: dict):
+    ruta_cache = Path(ruta_cache)
+    ruta_cache.parent.mkdir(parents=True, exist_ok=True)
+    ruta_cache.write_text(json.dumps(cache, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def limpiar_fechas(s: pd.Series, origen=None, ruta_cache=None):
+    """
+    Punto de entrada para los limpiadores: usa la cache de formatos de ``origen`` si se
+    indica ``ruta_cache`` y la actualiza con el resultado. Retorna (serie, conteo).
+    """
+    if ruta_cache is None or origen is None:
+        return parsear_fechas(s)
+    cache = leer_cache_formatos(ruta_cache)
+    fechas, conteo = parsear_fechas(s, orden_formatos(cache, origen))
+    actualizar_cache_formatos(ruta_cache, cache, origen, conteo)
+    return fechas, conteo
+
+
+def imprimir_conteo_formatos(conteo: dict):
+    print("Filas por formato de fecha:")
+    for fmt, n in conteo.items():
+        if n:
+            print(f" - {fmt}: {n}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Limpieza en paralelo de muchos archivos de origen (fragmentos)
+--------------------------------------------------------------
+- resolver_entradas: --in acepta archivos, carpetas (todos los *.csv debajo) y globs
+  ("datalake/datos_crudos/ventas/**/*.csv"); el orden de los archivos es el orden en que se
+  dan los patrones y, dentro de cada uno, el orden de las rutas (con nombres por fecha,
+  el cronológico)
+- limpiar_fragmentos: limpia cada archivo en un pool de procesos y une el resultado en
+  un solo CSV, con deduplicación global "mantener la primera" en el orden de los archivos
+
+Tres fases, así el trabajo pesado (parsear y limpiar, formatear el CSV) es paralelo y el
+proceso principal solo maneja claves enteras y copia bytes:
+
+  1. cada worker limpia un archivo con la función del script (limpiar_archivo), deduplica
+     dentro del archivo y deja sus lotes limpios en archivos temporales (pickle: conserva
+     los tipos compactos); retorna las claves que sobrevivieron, en orden
+  2. el proceso principal recorre esas claves en el orden de los archivos con una sola
+     ClavesVistas (lotes.py): la fila se conserva si su clave no apareció antes; si se da
+     el índice persistente de etl/indice_claves.py, las claves conservadas se registran ahí
+  3. cada worker escribe su parte como CSV sin encabezado aplicando esa máscara, y el
+     proceso principal concatena las partes detrás del encabezado
+
+Lo que cada worker informa a las métricas (reglas, bytes leídos) se suma a la etapa.
+"""
+import glob
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from lotes import ClavesVistas
+from metricas import etapa_actual, parcial
+
+COMODINES = set("*?[")
+
+
+def resolver_entradas(patrones) -> list:
+    """Archivos de ``patrones`` (archivo, carpeta o glob; uno o varios), sin repetir."""
+    if isinstance(patrones, (str, Path)):
+        patrones = [patrones]
+    entradas = []
+    for patron in map(str, patrones):
+        ruta = Path(patron)
+        if ruta.is_dir():
+            encontrados = sorted(p for p in ruta.rglob("*.csv") if p.is_file())
+        elif COMODINES & set(patron):
+            encontrados = sorted(Path(p) for p in glob.glob(patron, recursive=True) if Path(p).is_file())
+        else:
+            encontrados = [ruta]
+        if not encontrados:
+            raise FileNotFoundError(f"No hay archivos CSV en {patron}")
+        entradas.extend(encontrados)
+    unicas, vistos = [], set()
+    for p in entradas:
+        if p.resolve() not in vistos:
+            vistos.add(p.resolve())
+            unicas.append(p)
+    return unicas
+
+
+def _limpiar(limpiar, indice: int, ruta: Path, args, clave: str, temporal: Path) -> dict:
+    """Fase 1 (worker): limpia un archivo y guarda sus lotes deduplicados localmente."""
+    with parcial(str(ruta)) as registro:
+        resumen, partes, filas = {}, [], 0
+        vistos = ClavesVistas()
+        for j, df in enumerate(limpiar(ruta, args, resumen)):
+            filas += len(df)
+            claves = None
+            if clave in df.columns:
+                df = df[vistos.primeras(df[clave])]
+                claves = df[clave].reset_index(drop=True)
+            parte = temporal / f"{indice:06d}-{j:06d}.pkl"
+            df.to_pickle(parte)
+            partes.append({"ruta": parte, "claves": claves, "columnas": list(df.columns)})
+    return {"resumen": resumen, "registro": registro, "filas": filas, "partes": partes}
+
+
+def _escribir(parte: Path, mascara, destino: Path, csv_kwargs: dict) -> tuple:
+    """Fase 3 (worker): la parte filtrada como CSV sin encabezado. Retorna (filas, no nulos, registro)."""
+    with parcial(str(parte)) as registro:
+        df = pd.read_pickle(parte)
+        parte.unlink()
+        if mascara is not None:
+            df = df[mascara]
+        df.to_csv(destino, index=False, header=False, **csv_kwargs)
+    return len(df), df.notna().sum().to_dict(), registro
+
+
+def limpiar_fragmentos(limpiar, entradas: list, args, clave: str, out: Path,
+                       workers: int = None, indice=None, **csv_kwargs) -> dict:
+    """
+    Limpia ``entradas`` con ``limpiar(ruta, args, resumen)`` (generador de lotes limpios
+    que acumula en ``resumen`` lo que el script reporta) y escribe ``out``. ``indice``
+    (IndiceClaves) registra las claves conservadas, sin descartar las ya conocidas; guardarlo
+    queda a cargo de quien llama. Retorna
+    {"resumenes": uno por archivo, "filas": filas limpias antes de deduplicar,
+     "conservadas": filas escritas, "no_nulos": {columna: valores no nulos escritos}}.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(entradas)))
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    temporal = Path(tempfile.mkdtemp(prefix=f".{out.stem}_", dir=out.parent))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    mapear = pool.map if pool is not None else map
+    try:
+        resultados = list(mapear(_limpiar, [limpiar] * len(entradas), range(len(entradas)),
+                                 entradas, [args] * len(entradas), [clave] * len(entradas),
+                                 [temporal] * len(entradas)))
+        partes = [p for r in resultados for p in r["partes"]]
+        columnas = partes[0]["columnas"] if partes else []
+        for r, ruta in zip(resultados, entradas):
+            etapa_actual().sumar(r["registro"])
+            if any(p["columnas"] != columnas for p in r["partes"]):
+                raise ValueError(f"{ruta}: columnas distintas a las de {entradas[0]} "
+                                 f"({r['partes'][0]['columnas']} vs {columnas})")
+
+        # Fase 2: deduplicación global en el orden de los archivos
+        vistos = ClavesVistas()
+        mascaras = []
+        for p in partes:
+            mascara = None if p["claves"] is None else vistos.primeras(p["claves"]).to_numpy()
+            if mascara is not None and indice is not None:
+                indice.aceptar(p["claves"][mascara], filtrar=False)
+            mascaras.append(None if mascara is None or mascara.all() else mascara)
+
+        destinos = [p["ruta"].with_suffix(".csv") for p in partes]
+        escritas = list(mapear(_escribir, [p["ruta"] for p in partes], mascaras, destinos,
+                               [csv_kwargs] * len(partes)))
+
+        no_nulos = {}
+        with open(out, "wb") as f:
+            f.write(pd.DataFrame(columns=columnas).to_csv(index=False, **csv_kwargs).encode("utf-8"))
+            for destino, (_, conteo, registro) in zip(destinos, escritas):
+                etapa_actual().sumar(registro)
+                with open(destino, "rb") as parte:
+                    shutil.copyfileobj(parte, f, 1 << 20)
+                for c, n in conteo.items():
+                    no_nulos[c] = no_nulos.get(c, 0) + int(n)
+        etapa_actual().escrito(out)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    return {"resumenes": [r["resumen"] for r in resultados],
+            "filas": sum(r["filas"] for r in resultados),
+            "conservadas": sum(n for n, _, _ in escritas), "no_nulos": no_nulos}
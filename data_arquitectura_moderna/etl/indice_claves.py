@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Índice persistente de claves aceptadas (deduplicación entre corridas)
+---------------------------------------------------------------------
+Uso:
+  python etl/indice_claves.py [--carpeta datalake/indices] [--claves id_venta id_cliente id_producto]
+                              [--reconstruir] [--compactar]
+
+Las limpiezas deduplican dentro de la corrida (ClavesVistas, lotes.py). Cuando las ventas
+llegan por día, un extracto reenviado o solapado traería de nuevo ventas ya cargadas: al
+fusionar los hechos nuevos con la zona curada (transformacion.py --fusionar) se descartan
+las id_venta que ya están en hecho_ventas (regla id_venta_ya_cargada), y el índice se
+actualiza recién después de reescribir las particiones, así que refleja lo que hay en la
+zona curada. Con --indice-claves, limpia_clientes.py / limpia_productos.py registran sus
+claves e informan cuántas ya eran conocidas, sin descartarlas (un cliente o producto
+reenviado puede traer cambios, que scd.py convierte en versiones).
+
+Cada clave se guarda en <carpeta>/<clave>/ como segmentos .npy de int64 ordenados y sin
+repetir, más manifiesto.json con la lista de segmentos vigentes:
+
+- los segmentos se abren con memoria mapeada: filtrar un lote no carga la historia; se
+  descartan por rango (las claves nuevas suelen quedar sobre el máximo) y el resto se
+  resuelve con searchsorted, que solo lee las páginas que toca
+- cada corrida agrega un segmento con sus claves nuevas, y los segmentos se fusionan con la
+  misma regla que las corridas de ClavesVistas (cuando el último alcanza al anterior), así
+  que hay a lo más ~log2(n) segmentos
+- las claves de la corrida quedan pendientes en memoria hasta guardar(), que los scripts
+  llaman después de escribir su salida; manifiesto.json se reemplaza de forma atómica, así
+  que una corrida que falla no deja claves a medias
+- --compactar fusiona todo en un segmento y borra archivos huérfanos; --reconstruir rehace
+  el índice desde la zona curada (hecho_ventas, dim_cliente, dim_producto), p.ej. si se
+  editó la zona curada a mano
+
+Un solo escritor a la vez (la etapa que fusiona o limpia cada tabla). Los nulos no se indexan.
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import DATALAKE
+from lotes import ClavesVistas
+
+INDICES = DATALAKE / "indices"
+# clave -> tabla de la zona curada desde donde se reconstruye
+FUENTES = {"id_venta": "hecho_ventas", "id_cliente": "dim_cliente", "id_producto": "dim_producto"}
+
+
+class IndiceClaves:
+    def __init__(self, carpeta, clave: str):
+        self.carpeta = Path(carpeta) / clave
+        self.clave = clave
+        self.pendientes = ClavesVistas()
+        self.conocidas = 0
+        self._abrir()
+
+    def _abrir(self):
+        manifiesto = self.carpeta / "manifiesto.json"
+        datos = json.loads(manifiesto.read_text(encoding="utf-8")) if manifiesto.exists() else {}
+        self.nombres = datos.get("segmentos", [])
+        self.siguiente = datos.get("siguiente", 1)
+        self.segmentos = [np.load(self.carpeta / n, mmap_mode="r") for n in self.nombres]
+
+    @property
+    def existe(self) -> bool:
+        return (self.carpeta / "manifiesto.json").exists()
+
+    def __len__(self):
+        return sum(len(s) for s in self.segmentos) + len(self.pendientes)
+
+    def contiene(self, claves: np.ndarray) -> np.ndarray:
+        """Máscara de claves (int64) ya aceptadas en corridas anteriores o pendientes."""
+        vistas = self.pendientes.contiene(claves)
+        for seg in self.segmentos:
+            if not len(seg):
+                continue
+            candidatas = np.flatnonzero(~vistas & (claves >= seg[0]) & (claves <= seg[-1]))
+            if len(candidatas):
+                # Ordenadas, las búsquedas recorren el segmento en orden (páginas contiguas)
+                candidatas = candidatas[np.argsort(claves[candidatas], kind="stable")]
+                k = claves[candidatas]
+                vistas[candidatas] = seg[np.searchsorted(seg, k)] == k
+        return vistas
+
+    def aceptar(self, s: pd.Series, filtrar: bool = True) -> pd.Series:
+        """
+        Máscara de filas a conservar: sin las claves ya aceptadas si ``filtrar`` (todas si
+        no). Deja pendientes las claves nuevas y suma las conocidas en ``conocidas``.
+        """
+        nulos = s.isna().to_numpy()
+        claves = s.to_numpy(dtype=np.int64, na_value=0)
+        conocidas = np.zeros(len(s), dtype=bool)
+        conocidas[~nulos] = self.contiene(claves[~nulos])
+        self.conocidas += int(conocidas.sum())
+        self.pendientes.agregar(claves[~conocidas & ~nulos])
+        return pd.Series(~conocidas if filtrar else np.ones(len(s), dtype=bool), index=s.index)
+
+    def _escribir_segmento(self, claves: np.ndarray) -> str:
+        nombre = f"seg_{self.siguiente:06d}.npy"
+        self.siguiente += 1
+        tmp = self.carpeta / f"{nombre}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(claves, dtype=np.int64))
+        os.replace(tmp, self.carpeta / nombre)
+        return nombre
+
+    def _publicar(self, nombres: list):
+        """Reemplaza el manifiesto (punto de commit) y borra los segmentos que ya no usa."""
+        tmp = self.carpeta / "manifiesto.json.tmp"
+        tmp.write_text(json.dumps({"clave": self.clave, "segmentos": nombres, "siguiente": self.siguiente}),
+                       encoding="utf-8")
+        self.segmentos = []  # soltar los mapeos antes de borrar (Windows)
+        os.replace(tmp, self.carpeta / "manifiesto.json")
+        self._abrir()
+        for ruta in self.carpeta.glob("seg_*"):
+            if ruta.name not in nombres:
+                try:
+                    ruta.unlink()
+                except OSError:
+                    pass  # sigue mapeado en otro proceso: lo borra la próxima compactación
+
+    def guardar(self) -> int:
+        """Persiste las claves pendientes como un segmento nuevo. Retorna cuántas eran."""
+        corridas = self.pendientes.corridas
+        nuevas = np.unique(np.concatenate(corridas)) if corridas else np.empty(0, dtype=np.int64)
+        self.pendientes = ClavesVistas()
+        if not len(nuevas):
+            return 0
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        nombres = self.nombres + [self._escribir_segmento(nuevas)]
+        tamanos = [len(s) for s in self.segmentos] + [len(nuevas)]
+        while len(nombres) > 1 and tamanos[-1] >= tamanos[-2]:
+            fusion = np.union1d(np.load(self.carpeta / nombres[-2], mmap_mode="r"),
+                                np.load(self.carpeta / nombres[-1], mmap_mode="r"))
+            nombres[-2:] = [self._escribir_segmento(fusion)]
+            tamanos[-2:] = [len(fusion)]
+        self._publicar(nombres)
+        return len(nuevas)
+
+    def compactar(self):
+        """Fusiona todos los segmentos en uno y borra los archivos huérfanos."""
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        todas = (np.unique(np.concatenate(self.segmentos)) if self.segmentos
+                 else np.empty(0, dtype=np.int64))
+        self._publicar([self._escribir_segmento(todas)] if len(todas) else [])
+
+    def reconstruir(self, claves):
+        """Reemplaza el índice por ``claves`` (se descartan nulos y pendientes)."""
+        s = pd.Series(claves).dropna()
+        self.pendientes = ClavesVistas()
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        todas = np.unique(s.to_numpy(dtype=np.int64))
+        self._publicar([self._escribir_segmento(todas)] if len(todas) else [])
+
+    def estado(self) -> dict:
+        con_datos = [s for s in self.segmentos if len(s)]
+        return {"clave": self.clave, "claves": len(self), "segmentos": [len(s) for s in self.segmentos],
+                "mb": sum(s.nbytes for s in self.segmentos) / 1e6,
+                "minimo": int(con_datos[0][0]) if con_datos else None,
+                "maximo": max(int(s[-1]) for s in con_datos) if con_datos else None}
+
+
+def abrir_indice(carpeta, clave: str):
+    """El índice de ``clave`` bajo ``carpeta``, o None si no se pidió (--indice-claves)."""
+    return IndiceClaves(carpeta, clave) if carpeta else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carpeta", default=str(INDICES))
+    parser.add_argument("--claves", nargs="+", default=list(FUENTES), choices=list(FUENTES))
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="Rehacer el índice desde la zona curada")
+    parser.add_argument("--compactar", action="store_true",
+                        help="Fusionar los segmentos en uno y borrar archivos huérfanos")
+    args = parser.parse_args(argv)
+
+    if args.reconstruir:
+        from almacen import leer_tabla
+    for clave in args.claves:
+        indice = IndiceClaves(args.carpeta, clave)
+        if args.reconstruir:
+            indice.reconstruir(leer_tabla(DATALAKE / "datos_curados", FUENTES[clave], columnas=[clave])[clave])
+        elif args.compactar:
+            indice.compactar()
+        e = indice.estado()
+        print(f"{clave}: {e['claves']:,} claves en {len(e['segmentos'])} segmentos ({e['mb']:.1f} MB, "
+              f"rango {e['minimo']}..{e['maximo']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,147 @@
+"""
+Ingesta incremental: datos_origen -> datalake/datos_crudos
+----------------------------------------------------------
+Uso:
+  python etl/ingesta.py [--forzar]
+
+- clientes.csv, productos.csv y ventas.csv se copian a datos_crudos/ como siempre.
+- Cada archivo diario de ventas (ventas_YYYY-MM-DD.csv o ventas_YYYYMMDD.csv) se aterriza en
+  una partición por fecha: datos_crudos/ventas/fecha=YYYY-MM-DD/<archivo>.
+- Otros archivos de ventas (ventas_<origen>.csv, p.ej. ventas_norte.csv) van a
+  datos_crudos/ventas/origen=<origen>/<archivo>. Todas las particiones se limpian juntas
+  con limpia_ventas.py --in datalake/datos_crudos/ventas (un worker por archivo).
+- Un manifiesto (datos_crudos/_manifest.json) guarda tamaño, mtime y sha256 de cada origen.
+  Si tamaño y mtime coinciden no se relee el archivo; si cambiaron se compara el hash y solo
+  se copia cuando el contenido es distinto. Así, con cientos de archivos diarios, cada corrida
+  paga solo por lo nuevo.
+- Lo aterrizado en la corrida queda en datos_crudos/_nuevas_particiones.json para que las
+  etapas siguientes procesen solo ese delta.
+"""
+import argparse
+import hashlib
+import json
+import re
 import shutil
+from datetime import datetime, timezone
 from pathlib import Path
 
+from almacen import DATALAKE
+from metricas import instrumentar, etapa_actual
+
 BASE = Path(__file__).resolve().parents[1]
 seed = BASE / "datos_origen"
-raw = BASE / "datalake" / "datos_crudos"
-raw.mkdir(parents=True, exist_ok=True)
-
-for name in ["clientes.csv", "productos.csv", "ventas.csv"]:
-    src = seed / name
-    dst = raw / name
-    if not src.exists():
-        raise FileNotFoundError(f"No existe {src}")
-    shutil.copy2(src, dst)
-    print(f"Ingestado: {src.name} -> {dst}")
-print("Ingesta completada ✅")
+raw = DATALAKE / "datos_crudos"
+manifest_path = raw / "_manifest.json"
+nuevas_path = raw / "_nuevas_particiones.json"
+
+BASE_FILES = ["clientes.csv", "productos.csv", "ventas.csv"]
+PATRON_DIARIO = re.compile(r"^ventas_(\d{4})-?(\d{2})-?(\d{2})\.csv$", re.IGNORECASE)
+PATRON_ORIGEN = re.compile(r"^ventas_([\w-]+)\.csv$", re.IGNORECASE)
+
+
+def sha256(path: Path, bloque: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def leer_manifest() -> dict:
+    if manifest_path.exists():
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    return {}
+
+
+def guardar_manifest(manifest: dict):
+    tmp = manifest_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(manifest_path)
+
+
+def destino_de(src: Path):
+    """Retorna (ruta destino, partición) para un archivo de origen, o (None, None) si no aplica."""
+    if src.name in BASE_FILES:
+        return raw / src.name, None
+    m = PATRON_DIARIO.match(src.name)
+    if m:
+        particion = f"fecha={m.group(1)}-{m.group(2)}-{m.group(3)}"
+        return raw / "ventas" / particion / src.name, f"ventas/{particion}"
+    m = PATRON_ORIGEN.match(src.name)
+    if m:
+        particion = f"origen={m.group(1).lower()}"
+        return raw / "ventas" / particion / src.name, f"ventas/{particion}"
+    return None, None
+
+
+def cambio(src: Path, entrada: dict, destino: Path, forzar: bool):
+    """Retorna (hay_que_copiar, hash) comparando contra la entrada del manifiesto."""
+    st = src.stat()
+    if not forzar and entrada and destino.exists() \
+            and entrada["size"] == st.st_size and entrada["mtime"] == st.st_mtime:
+        return False, entrada["sha256"]
+    digest = sha256(src)
+    if not forzar and entrada and destino.exists() and entrada["sha256"] == digest:
+        return False, digest
+    return True, digest
+
+
+@instrumentar("ingesta")
+def ingestar(forzar: bool = False) -> dict:
+    raw.mkdir(parents=True, exist_ok=True)
+    for name in BASE_FILES:
+        if not (seed / name).exists():
+            raise FileNotFoundError(f"No existe {seed / name}")
+
+    manifest = leer_manifest()
+    nuevos, omitidos = [], 0
+    for src in sorted(seed.glob("*.csv")):
+        dst, particion = destino_de(src)
+        if dst is None:
+            continue
+        clave = src.name
+        previo = manifest.get(clave, {})
+        copiar, digest = cambio(src, previo, dst, forzar)
+        st = src.stat()
+        if copiar:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
+            etapa_actual().leido(src)
+            etapa_actual().escrito(dst)
+            nuevos.append({"archivo": src.name, "destino": str(dst.relative_to(raw)),
+                           "particion": particion})
+            print(f"Ingestado: {src.name} -> {dst}")
+        else:
+            omitidos += 1
+        manifest[clave] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": digest,
+            "destino": str(dst.relative_to(raw)),
+            "ingestado": datetime.now(timezone.utc).isoformat(timespec="seconds") if copiar
+                         else previo.get("ingestado"),
+        }
+
+    guardar_manifest(manifest)
+    resumen = {
+        "archivos": nuevos,
+        "particiones": sorted({n["particion"] for n in nuevos if n["particion"]}),
+    }
+    nuevas_path.write_text(json.dumps(resumen, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Sin cambios (omitidos): {omitidos} | nuevos o modificados: {len(nuevos)}")
+    if resumen["particiones"]:
+        print("Particiones nuevas:", ", ".join(resumen["particiones"]))
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--forzar", action="store_true",
+                        help="Copiar todo aunque el manifiesto indique que no cambió")
+    args = parser.parse_args(argv)
+    ingestar(forzar=args.forzar)
+    print("Ingesta completada ✅")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Integridad referencial de los hechos antes de cargar el DW
+----------------------------------------------------------
+Uso:
+  python etl/integridad.py [--cuarentena datalake/cuarentena]
+
+Revisa cada hecho contra las claves de las dimensiones, en bloque y sin tocar la base:
+
+- columnas NOT NULL del DW (id_venta, id_cliente, id_producto, cantidad, total): <col>_nulo
+- claves naturales (id_cliente, id_producto) y de versión (sk_cliente, sk_producto) que no
+  están en su dimensión, y id_tiempo fuera del calendario: <col>_nulo / <col>_huerfano
+  (sk nulo con id existente = no hay versión vigente en la fecha de la venta)
+- id_venta repetido (se conserva la primera aparición): id_venta_duplicado
+
+La pertenencia se resuelve con los índices densos de etl/estrella.py (una resta y una
+lectura de arreglo por clave, sin merge). load_dw.py llama a depurar() con las tablas que
+va a cargar: los hechos con algún problema van a un CSV de cuarentena con el motivo (varios
+separados por ";") y solo se cargan los demás, así una clave huérfana no hace fallar una
+carga de millones de filas a mitad de camino. Sin argumentos, el script revisa la zona
+curada y deja la cuarentena sin cargar nada.
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen import leer_tabla, DATALAKE
+from estrella import IndiceDimension
+from metricas import instrumentar, etapa_actual, id_corrida
+
+CUARENTENA = DATALAKE / "cuarentena"
+
+NO_NULOS = ["id_venta", "id_cliente", "id_producto", "cantidad", "total"]
+# columna del hecho -> (dimensión, clave en la dimensión)
+REFERENCIAS = {
+    "id_cliente": ("dim_cliente", "id_cliente"),
+    "id_producto": ("dim_producto", "id_producto"),
+    "sk_cliente": ("dim_cliente", "sk_cliente"),
+    "sk_producto": ("dim_producto", "sk_producto"),
+    "id_tiempo": ("dim_tiempo", "id_tiempo"),
+}
+
+
+def revisar(hechos: pd.DataFrame, dimensiones: dict) -> dict:
+    """Máscara de filas con problema por motivo (solo los motivos que aparecen)."""
+    motivos = {}
+    for col in NO_NULOS:
+        if col in hechos.columns and col not in REFERENCIAS:
+            motivos[f"{col}_nulo"] = hechos[col].isna().to_numpy()
+    for col, (dim, clave) in REFERENCIAS.items():
+        if col not in hechos.columns:
+            continue
+        nulos = hechos[col].isna().to_numpy()
+        # Las claves naturales se repiten entre versiones (SCD): basta con que exista una
+        indice = IndiceDimension(dimensiones[dim], clave, duplicados="primero")
+        motivos[f"{col}_nulo"] = nulos
+        motivos[f"{col}_huerfano"] = (indice.posiciones(hechos[col]) < 0) & ~nulos
+    if "id_venta" in hechos.columns:
+        motivos["id_venta_duplicado"] = (hechos["id_venta"].duplicated(keep="first").to_numpy()
+                                         & hechos["id_venta"].notna().to_numpy())
+    return {m: mascara for m, mascara in motivos.items() if mascara.any()}
+
+
+def separar(hechos: pd.DataFrame, dimensiones: dict) -> tuple:
+    """(hechos limpios, cuarentena con columna motivo, filas por motivo)."""
+    motivos = revisar(hechos, dimensiones)
+    malos = np.zeros(len(hechos), dtype=bool)
+    for mascara in motivos.values():
+        malos |= mascara
+    if not malos.any():
+        return hechos, hechos.iloc[:0].assign(motivo=pd.Series(dtype=str)), {}
+    # Texto del motivo solo para las filas en cuarentena (pocas)
+    texto = np.full(int(malos.sum()), "", dtype=object)
+    for m, mascara in motivos.items():
+        en_malos = mascara[malos]
+        texto[en_malos] = np.where(texto[en_malos] == "", m, texto[en_malos] + ";" + m)
+    cuarentena = hechos[malos].assign(motivo=texto)
+    conteo = {m: int(mascara.sum()) for m, mascara in motivos.items()}
+    return hechos[~malos], cuarentena, conteo
+
+
+def guardar_cuarentena(cuarentena: pd.DataFrame, carpeta=CUARENTENA, nombre: str = "hecho_ventas") -> Path:
+    """Escribe la cuarentena de esta corrida (<nombre>_<id de corrida>.csv)."""
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    ruta = carpeta / f"{nombre}_{id_corrida()}.csv"
+    cuarentena.to_csv(ruta, index=False, date_format="%Y-%m-%d")
+    etapa_actual().escrito(ruta)
+    return ruta
+
+
+def depurar(dfs: dict, carpeta=CUARENTENA) -> dict:
+    """
+    Las tablas de ``dfs`` con hecho_ventas solo con filas íntegras; el resto va a la
+    cuarentena. Informa cada motivo como regla de la etapa (cuarentena_<motivo>).
+    """
+    limpios, cuarentena, conteo = separar(dfs["hecho_ventas"], dfs)
+    registro = etapa_actual()
+    for motivo, n in conteo.items():
+        registro.regla(f"cuarentena_{motivo}", n)
+    if len(cuarentena):
+        ruta = guardar_cuarentena(cuarentena, carpeta)
+        detalle = ", ".join(f"{m}: {n}" for m, n in conteo.items())
+        print(f"Integridad: {len(cuarentena)} de {len(dfs['hecho_ventas'])} hechos a cuarentena "
+              f"({detalle}) -> {ruta}")
+    else:
+        print(f"Integridad: {len(limpios)} hechos íntegros")
+    return {**dfs, "hecho_ventas": limpios}
+
+
+@instrumentar("integridad")
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cuarentena", default=str(CUARENTENA), help="Carpeta de la cuarentena")
+    args = parser.parse_args(argv)
+    curated = DATALAKE / "datos_curados"
+    dfs = {t: leer_tabla(curated, t) for t in ("dim_cliente", "dim_producto", "dim_tiempo", "hecho_ventas")}
+    limpios = depurar(dfs, args.cuarentena)["hecho_ventas"]
+    etapa_actual().filas(entrada=len(dfs["hecho_ventas"]), salida=len(limpios))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,32 +4,37 @@
 Limpieza de datos crudos: clientes.csv
 --------------------------------------
 Uso:
-  python etl\clean_clientes.py [--in ruta_csv] [--out ruta_csv] [--sep ,] [--enc utf-8]
+  python etl\clean_clientes.py [--in ruta_csv|carpeta|glob ...] [--out ruta_csv] [--sep ,] [--enc utf-8]
+                               [--chunksize N] [--workers N] [--indice-claves [carpeta]]
 
 Lee un CSV crudo (por defecto: datalake/datos_crudos/clientes.csv), normaliza tipos y texto,
 elimina duplicados por id_cliente y guarda en datalake/datos_procesados/clientes_limpio.csv
+
+Con --chunksize N el archivo se procesa en trozos de N filas que se agregan a la salida,
+manteniendo la memoria acotada; la deduplicación sigue siendo global (primera aparición).
+
+--in acepta varios archivos, carpetas o globs: cada archivo se limpia en un worker
+(--workers, por defecto uno por núcleo) y id_cliente se deduplica globalmente en el orden
+de los archivos (ver etl/fragmentos.py).
+
+Con --indice-claves (por defecto datalake/indices) se registran los id_cliente en el índice
+persistente de etl/indice_claves.py y se informan los ya conocidos en corridas anteriores.
 """
 import argparse
 import pandas as pd
 from pathlib import Path
 
+from fragmentos import resolver_entradas, limpiar_fragmentos
+from almacen import DATALAKE
+from indice_claves import INDICES, abrir_indice
+from lotes import leer_lotes, escribir_lote, ClavesVistas
+from metricas import Cronometro, reportar_rendimiento, instrumentar, etapa_actual
+from tipos import compactar, memoria_mb, reportar_memoria
+
 def norm_str(s: pd.Series) -> pd.Series:
     return s.astype(str).str.strip()
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--in", dest="inp", default="datalake/datos_crudos/clientes.csv")
-    parser.add_argument("--out", dest="out", default="datalake/datos_procesados/clientes_limpio.csv")
-    parser.add_argument("--sep", default=",")
-    parser.add_argument("--enc", default="utf-8")
-    args = parser.parse_args()
-
-    inp = Path(args.inp)
-    out = Path(args.out)
-    out.parent.mkdir(parents=True, exist_ok=True)
-
-    df = pd.read_csv(inp, sep=args.sep, encoding=args.enc)
-
+def limpiar_lote(df: pd.DataFrame) -> pd.DataFrame:
     # Columnas esperadas: id_cliente,nombre,edad,ubicacion,categoria
     # Normalizar headers (tolerar mayúsculas/espacios)
     ren = {c: c.strip().lower() for c in df.columns}
@@ -59,18 +64,82 @@ def main():
     # Reglas básicas
     # - Edad razonable 0..120
     mask_bad_age = df["edad"].notna() & ~df["edad"].between(0,120)
+    etapa_actual().regla("edad_fuera_de_rango", mask_bad_age.sum())
     df.loc[mask_bad_age, "edad"] = pd.NA
+    return df
 
-    # Deduplicar por id_cliente (mantener primera)
-    before = len(df)
-    df = df.drop_duplicates(subset=["id_cliente"], keep="first")
-    after = len(df)
+def limpiar_archivo(inp: Path, args, resumen: dict):
+    """Lotes limpios y compactos de un archivo, sin deduplicar (memoria en ``resumen``)."""
+    resumen.update(mem_antes=0.0, mem_despues=0.0)
+    for df in leer_lotes(inp, args.sep, args.enc, args.chunksize):
+        df = limpiar_lote(df)
+        # Tipos compactos (tipos.py): mismos valores, menos memoria por lote
+        resumen["mem_antes"] += memoria_mb(df)
+        df = compactar(df)
+        resumen["mem_despues"] += memoria_mb(df)
+        yield df
 
-    print(f"Filas originales: {before} | tras deduplicar por id_cliente: {after}")
-    print(f"Nulos en columnas clave -> id_cliente: {df['id_cliente'].isna().sum()}, nombre: {df['nombre'].isna().sum()}")
+@instrumentar("limpia_clientes")
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--in", dest="inp", nargs="+", default=[str(DATALAKE / "datos_crudos" / "clientes.csv")],
+                        help="Archivo(s), carpeta(s) o glob(s); varios archivos se limpian en paralelo")
+    parser.add_argument("--out", dest="out", default=str(DATALAKE / "datos_procesados" / "clientes_limpio.csv"))
+    parser.add_argument("--sep", default=",")
+    parser.add_argument("--enc", default="utf-8")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Procesar en trozos de N filas (modo streaming)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos para limpiar varios archivos (por defecto: uno por núcleo)")
+    parser.add_argument("--indice-claves", dest="indice_claves", nargs="?", const=str(INDICES),
+                        default=None, help="Registrar id_cliente e informar los ya conocidos (no se descartan)")
+    args = parser.parse_args(argv)
 
-    df.to_csv(out, index=False)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    crono = Cronometro()
+    entradas = resolver_entradas(args.inp)
+    indice = abrir_indice(args.indice_claves, "id_cliente")
+    if len(entradas) == 1:
+        resumen = {}
+        vistos = ClavesVistas()
+        before = after = nulos_id = nulos_nombre = 0
+        for i, df in enumerate(limpiar_archivo(entradas[0], args, resumen)):
+            # Deduplicar por id_cliente (mantener primera, también entre lotes)
+            before += len(df)
+            df = df[vistos.primeras(df["id_cliente"])]
+            if indice is not None:
+                indice.aceptar(df["id_cliente"], filtrar=False)
+            after += len(df)
+            nulos_id += int(df["id_cliente"].isna().sum())
+            nulos_nombre += int(df["nombre"].isna().sum())
+
+            escribir_lote(df, out, primero=(i == 0))
+        resumenes = [resumen]
+    else:
+        # Un archivo por worker; id_cliente se deduplica en el orden de los archivos
+        r = limpiar_fragmentos(limpiar_archivo, entradas, args, "id_cliente", out, args.workers,
+                               indice=indice)
+        resumenes, before, after = r["resumenes"], r["filas"], r["conservadas"]
+        nulos_id = after - r["no_nulos"].get("id_cliente", 0)
+        nulos_nombre = after - r["no_nulos"].get("nombre", 0)
+        print(f"Archivos limpiados: {len(entradas)}")
+    mem_antes = sum(r["mem_antes"] for r in resumenes)
+    mem_despues = sum(r["mem_despues"] for r in resumenes)
+
+    etapa_actual().filas(entrada=before, salida=after)
+    etapa_actual().regla("dedup_id_cliente", before - after)
+    if indice is not None:
+        # Un id_cliente ya conocido puede traer cambios (versión nueva en scd.py): no se descarta
+        etapa_actual().regla("id_cliente_ya_conocido", indice.conocidas)
+        nuevas = indice.guardar()
+        print(f"Índice de claves: {indice.conocidas} id_cliente ya conocidos | {nuevas} nuevos registrados")
+    print(f"Filas originales: {before} | tras deduplicar por id_cliente: {after}")
+    print(f"Nulos en columnas clave -> id_cliente: {nulos_id}, nombre: {nulos_nombre}")
     print('Guardado:', out.resolve())
+    reportar_memoria("clientes", mem_antes, mem_despues)
+    reportar_rendimiento(before, crono.segundos())
 
 if __name__ == "__main__":
     main()
@@ -4,61 +4,62 @@
 Limpieza de datos crudos: ventas.csv
 ------------------------------------
 Uso:
-  python etl\clean_ventas.py [--in ruta_csv] [--out ruta_csv] [--sep ,] [--enc utf-8]
+  python etl\clean_ventas.py [--in ruta_csv|carpeta|glob ...] [--out ruta_csv] [--sep ,] [--enc utf-8]
+                             [--chunksize N] [--formato-monto auto|coma|punto] [--workers N]
+                             [--nuevas [datalake/datos_crudos/_nuevas_particiones.json]]
 
 Lee un CSV crudo (por defecto: datalake/datos_crudos/ventas.csv), normaliza tipos y fecha,
 valida reglas básicas y guarda en datalake/datos_procesados/ventas_limpio.csv
+
+Con --chunksize N el archivo se procesa en trozos de N filas que se agregan a la salida,
+manteniendo la memoria acotada; la deduplicación sigue siendo global (primera aparición).
+
+El monto se interpreta con etl/montos.py: el formato numérico (decimal coma o punto) se
+detecta una vez por archivo y se informan los valores rechazados por motivo.
+
+--in acepta varios archivos, carpetas o globs (p.ej. "datalake/datos_crudos/ventas/**/*.csv"):
+cada archivo se limpia en un worker (--workers, por defecto uno por núcleo) y la salida es
+un solo CSV; id_venta se deduplica globalmente conservando la primera aparición en el orden
+de los archivos (ver etl/fragmentos.py).
+
+Con --nuevas se limpian solo los archivos de ventas que la última ingesta aterrizó
+(_nuevas_particiones.json, ver etl/ingesta.py). Si no hay ninguno, o --in viene sin
+archivos, la salida queda vacía (solo el encabezado).
+
+Las id_venta ya cargadas en corridas anteriores no se descartan aquí sino al fusionar los
+hechos con la zona curada (transformacion.py --fusionar, con etl/indice_claves.py).
 """
 import argparse
+import json
 import pandas as pd
 from pathlib import Path
 
-def parse_fecha_flexible(s: str):
-    # Probar varios formatos comunes; cae a inferencia con dayfirst
-    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y", "%Y/%m/%d"):
-        try:
-            return pd.to_datetime(s, format=fmt, errors="raise")
-        except Exception:
-            pass
-    return pd.to_datetime(s, errors="coerce", dayfirst=True)
-
-def limpiar_fecha(fecha):
-    import pandas as pd
-    if pd.isna(fecha):
-        return pd.NaT
-    s = str(fecha).strip()
-
-    # Vacíos y marcadores comunes
-    if s in ("", "NA", "N/A", "--", "None", "null"):
-        return pd.NaT
-
-    # Normalizar separadores a "/"
-    s = s.replace("\\", "/").replace(".", "/").replace("-", "/")
-
-    # Intentos con formatos más comunes
-    formatos = ("%Y/%m/%d", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y")
-    for fmt in formatos:
-        try:
-            return pd.to_datetime(s, format=fmt, errors="raise")
-        except Exception:
-            pass
-    return pd.to_datetime(s, errors="coerce", dayfirst=True)
-
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--in", dest="inp", default="datalake/datos_crudos/ventas.csv")
-    parser.add_argument("--out", dest="out", default="datalake/datos_procesados/ventas_limpio.csv")
-    parser.add_argument("--sep", default=",")
-    parser.add_argument("--enc", default="utf-8")
-    args = parser.parse_args()
-
-    inp = Path(args.inp)
-    out = Path(args.out)
-    out.parent.mkdir(parents=True, exist_ok=True)
-
-    df = pd.read_csv(inp, sep=args.sep, encoding=args.enc)
-
-    # Columnas esperadas: id_venta,id_producto,id_sucursal,fecha,cantidad,monto
+from fechas import (NO_PARSEABLE, parsear_fechas, leer_cache_formatos, orden_formatos,
+                    anotar_formatos, guardar_cache_formatos, imprimir_conteo_formatos)
+from almacen import DATALAKE
+from fragmentos import resolver_entradas, limpiar_fragmentos
+from lotes import leer_lotes, escribir_lote, ClavesVistas
+from metricas import Cronometro, reportar_rendimiento, instrumentar, etapa_actual
+from tipos import compactar, memoria_mb, reportar_memoria
+from montos import NormalizadorMontos, FORMATOS_MONTO
+
+COLUMNAS = ["id_venta","id_producto","id_sucursal","fecha","cantidad","monto"]
+
+def archivos_nuevos(resumen: dict, raw=DATALAKE / "datos_crudos") -> list:
+    """Archivos de ventas (ventas.csv y las particiones de ventas/) que aterrizó la ingesta."""
+    return [Path(raw) / a["destino"] for a in resumen["archivos"]
+            if Path(a["destino"]).parts[0] in ("ventas.csv", "ventas")]
+
+def limpiar_lote(df: pd.DataFrame, formatos_fecha, montos: NormalizadorMontos = None) -> tuple:
+    """
+    Limpia un lote (o el archivo completo). Retorna (df, conteo de formatos de fecha).
+    ``montos`` mantiene el formato de monto y los rechazos entre lotes.
+    """
+    conteo_formatos = {}
+    if montos is None:
+        montos = NormalizadorMontos()
+
+    # Columnas esperadas: COLUMNAS
     ren = {c: c.strip().lower() for c in df.columns}
     df = df.rename(columns=ren)
 
@@ -68,49 +69,166 @@ def main():
             df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
 
     if "monto" in df.columns:
-        # Quitar simbolos de moneda y miles
-        df["monto"] = df["monto"].astype(str).str.replace(r"[\$\.,](?=\d{3}(\D|$))", "", regex=True)\
-                                      .str.replace(",", ".", regex=False)
-        df["monto"] = pd.to_numeric(df["monto"], errors="coerce")
+        # Formato numérico detectado una vez por archivo (montos.py), no valor por valor
+        df["monto"] = montos.normalizar(df["monto"])
 
     # Fecha
     if "fecha" in df.columns:
-    # 1) Aplicar limpieza robusta
-        df["fecha"] = df["fecha"].apply(limpiar_fecha)
+    # 1) Aplicar limpieza robusta (vectorizada, mismo resultado que el limpiar_fecha fila a fila)
+        df["fecha"], conteo_formatos = parsear_fechas(df["fecha"], formatos_fecha)
 
     # 2) Enforzar rango razonable
         lim_inf = pd.Timestamp("2000-01-01")
         lim_sup = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
         mask = df["fecha"].between(lim_inf, lim_sup)
+        etapa_actual().regla("fecha_fuera_de_rango", (~mask & df["fecha"].notna()).sum())
         df.loc[~mask, "fecha"] = pd.NaT
 
-    # 3) (opcional) diagnóstico rápido en consola
-        validez = (df["fecha"].notna().mean() * 100)
+    # Reglas de negocio: no negativos
+    if "cantidad" in df.columns:
+        negativas = (df["cantidad"] < 0).fillna(False)
+        etapa_actual().regla("cantidad_negativa", negativas.sum())
+        df.loc[negativas, "cantidad"] = pd.NA
+    if "monto" in df.columns:
+        negativos = df["monto"] < 0
+        montos.descartar(negativos, "negativo")
+        df.loc[negativos, "monto"] = pd.NA
+    return df, conteo_formatos
+
+def ruta_cache_formatos(args) -> Path:
+    if args.cache_formatos:
+        return Path(args.cache_formatos)
+    return Path(args.out).parent / ".formatos_fecha.json"
+
+def limpiar_archivo(inp: Path, args, resumen: dict):
+    """
+    Lotes limpios y compactos de un archivo, todavía sin deduplicar. Deja en ``resumen`` lo
+    que main reporta (formatos de fecha, montos, fechas válidas, memoria); corre en un
+    worker cuando hay varios archivos (fragmentos.py).
+    """
+    formatos_fecha = orden_formatos(leer_cache_formatos(ruta_cache_formatos(args)), inp)
+    montos = NormalizadorMontos(args.formato_monto)
+    resumen.update(montos=montos, conteo_formatos={}, tiene_fecha=False, fechas_ok=0,
+                   mem_antes=0.0, mem_despues=0.0)
+    # monto se lee como texto: la inferencia de read_csv tomaría "1.234" por 1,234. El
+    # encabezado se normaliza después (limpiar_lote), así que se busca como viene ("Monto")
+    encabezado = pd.read_csv(inp, sep=args.sep, encoding=args.enc, nrows=0).columns
+    como_texto = {c: str for c in encabezado if c.strip().lower() == "monto"}
+    for df in leer_lotes(inp, args.sep, args.enc, args.chunksize, dtype=como_texto):
+        df, conteo = limpiar_lote(df, formatos_fecha, montos)
+        # Tipos compactos (tipos.py): mismos valores, menos memoria por lote
+        resumen["mem_antes"] += memoria_mb(df)
+        df = compactar(df)
+        resumen["mem_despues"] += memoria_mb(df)
+        for k, v in conteo.items():
+            resumen["conteo_formatos"][k] = resumen["conteo_formatos"].get(k, 0) + v
+        if "fecha" in df.columns:
+            resumen["tiene_fecha"] = True
+            resumen["fechas_ok"] += int(df["fecha"].notna().sum())
+        yield df
+
+@instrumentar("limpia_ventas")
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--in", dest="inp", nargs="*", default=[str(DATALAKE / "datos_crudos" / "ventas.csv")],
+                        help="Archivo(s), carpeta(s) o glob(s); varios archivos se limpian en paralelo")
+    parser.add_argument("--out", dest="out", default=str(DATALAKE / "datos_procesados" / "ventas_limpio.csv"))
+    parser.add_argument("--sep", default=",")
+    parser.add_argument("--enc", default="utf-8")
+    parser.add_argument("--cache-formatos", dest="cache_formatos", default=None,
+                        help="JSON con los formatos de fecha detectados por archivo (por defecto junto a --out)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Procesar en trozos de N filas (modo streaming)")
+    parser.add_argument("--formato-monto", dest="formato_monto", default="auto",
+                        choices=["auto"] + list(FORMATOS_MONTO),
+                        help="Separador decimal de monto: detectado (auto), coma (1.234,5) o punto (1,234.5)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos para limpiar varios archivos (por defecto: uno por núcleo)")
+    parser.add_argument("--nuevas", nargs="?", const=str(DATALAKE / "datos_crudos" / "_nuevas_particiones.json"),
+                        default=None, help="Limpiar solo lo que aterrizó la última ingesta (en vez de --in)")
+    args = parser.parse_args(argv)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if args.nuevas:
+        resumen_ingesta = json.loads(Path(args.nuevas).read_text(encoding="utf-8"))
+        entradas = archivos_nuevos(resumen_ingesta, Path(args.nuevas).parent)
+    else:
+        entradas = resolver_entradas(args.inp)
+
+    crono = Cronometro()
+    if not entradas:
+        print("Sin archivos de ventas nuevos: salida vacía")
+        escribir_lote(pd.DataFrame(columns=COLUMNAS), out, primero=True)
+        resumenes, before, after, fechas_ok_final = [], 0, 0, 0
+    elif len(entradas) == 1:
+        resumen = {}
+        vistos = ClavesVistas()
+        before = after = fechas_ok_final = 0
+        for i, df in enumerate(limpiar_archivo(entradas[0], args, resumen)):
+            # Unicidad id_venta (mantener primera, también entre lotes)
+            before += len(df)
+            if "id_venta" in df.columns:
+                df = df[vistos.primeras(df["id_venta"])]
+            after += len(df)
+            if "fecha" in df.columns:
+                fechas_ok_final += int(df["fecha"].notna().sum())
+            escribir_lote(df, out, primero=(i == 0), date_format="%Y-%m-%d")
+        resumenes = [resumen]
+    else:
+        # Un archivo por worker; id_venta se deduplica en el orden de los archivos
+        r = limpiar_fragmentos(limpiar_archivo, entradas, args, "id_venta", out, args.workers,
+                               date_format="%Y-%m-%d")
+        resumenes, before, after = r["resumenes"], r["filas"], r["conservadas"]
+        fechas_ok_final = r["no_nulos"].get("fecha", 0)
+        print(f"Archivos limpiados: {len(entradas)}")
+
+    ruta_cache = ruta_cache_formatos(args)
+    cache = leer_cache_formatos(ruta_cache)
+    montos = NormalizadorMontos(args.formato_monto)
+    conteo_formatos = {}
+    fechas_ok = 0
+    mem_antes = mem_despues = 0.0
+    for ruta, resumen in zip(entradas, resumenes):
+        if resumen["tiene_fecha"]:
+            anotar_formatos(cache, ruta, resumen["conteo_formatos"])
+        for k, v in resumen["conteo_formatos"].items():
+            conteo_formatos[k] = conteo_formatos.get(k, 0) + v
+        montos.sumar(resumen["montos"])
+        fechas_ok += resumen["fechas_ok"]
+        mem_antes += resumen["mem_antes"]
+        mem_despues += resumen["mem_despues"]
+    tiene_fecha = any(r["tiene_fecha"] for r in resumenes)
+
+    if tiene_fecha:
+        guardar_cache_formatos(ruta_cache, cache)
+        imprimir_conteo_formatos(conteo_formatos)
+
+    # (opcional) diagnóstico rápido en consola
+        validez = fechas_ok / before * 100 if before else float("nan")
         print(f"Validez fecha tras limpieza: {validez:.1f}%")
-        malos = df.loc[df["fecha"].isna(), "fecha"].shape[0]
+        malos = before - fechas_ok
         if malos:
-           top = (df.loc[df["fecha"].isna()].index.size)
            print(f"Fechas no parseables (NaT): {malos}")
 
+    if montos.filas:
+        montos.imprimir_reporte()
 
-    # Reglas de negocio: no negativos
-    if "cantidad" in df.columns:
-        df.loc[df["cantidad"] < 0, "cantidad"] = pd.NA
-    if "monto" in df.columns:
-        df.loc[df["monto"] < 0, "monto"] = pd.NA
-
-    # Unicidad id_venta
-    before = len(df)
-    if "id_venta" in df.columns:
-        df = df.drop_duplicates(subset=["id_venta"], keep="first")
-    after = len(df)
+    registro = etapa_actual()
+    registro.filas(entrada=before, salida=after)
+    registro.regla("dedup_id_venta", before - after)
+    registro.regla("fecha_no_parseable", conteo_formatos.get(NO_PARSEABLE, 0))
+    for motivo, n in montos.rechazos.items():
+        registro.regla(f"monto_{motivo}", n)
 
     print(f"Filas originales: {before} | tras deduplicar por id_venta: {after}")
-    if "fecha" in df.columns:
-        print(f"Validez fecha (no nulos): {(df['fecha'].notna().mean()*100):.0f}%")
+    if tiene_fecha:
+        validez_final = fechas_ok_final / after * 100 if after else float("nan")
+        print(f"Validez fecha (no nulos): {validez_final:.0f}%")
 
-    df.to_csv(out, index=False, date_format="%Y-%m-%d")
     print('Guardado:', out.resolve())
+    reportar_memoria("ventas", mem_antes, mem_despues)
+    reportar_rendimiento(before, crono.segundos())
 
 if __name__ == "__main__":
     main()
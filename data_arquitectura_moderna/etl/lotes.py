@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Utilidades para limpiar archivos por lotes (--chunksize)
+--------------------------------------------------------
+- leer_lotes: lee el CSV completo o en trozos con la misma interfaz
+- escribir_lote: el primer lote crea el archivo con encabezado, los siguientes agregan
+- ClavesVistas: deduplicación "mantener la primera" que funciona entre lotes
+
+Los bytes leídos y escritos se suman a la etapa en curso (metricas.py).
+"""
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from metricas import etapa_actual, tamano_bytes
+
+
+def leer_lotes(inp: Path, sep=",", enc="utf-8", chunksize=None, **kwargs):
+    """
+    Itera DataFrames: uno solo si chunksize es None, o trozos de chunksize filas.
+    ``kwargs`` pasa a read_csv (p.ej. dtype).
+    """
+    etapa_actual().leido(inp)
+    if not chunksize:
+        yield pd.read_csv(inp, sep=sep, encoding=enc, **kwargs)
+        return
+    with pd.read_csv(inp, sep=sep, encoding=enc, chunksize=chunksize, **kwargs) as lector:
+        yield from lector
+
+
+def escribir_lote(df: pd.DataFrame, out: Path, primero: bool, **kwargs):
+    previo = 0 if primero else tamano_bytes(out)
+    df.to_csv(out, index=False, mode="w" if primero else "a", header=primero, **kwargs)
+    etapa_actual().escrito(bytes_=tamano_bytes(out) - previo)
+
+
+class ClavesVistas:
+    """
+    Conjunto de claves enteras ya aceptadas, guardado como corridas ordenadas de int64
+    (8 bytes por clave, sin objetos Python). La pertenencia se resuelve con searchsorted
+    por corrida y las corridas se fusionan cuando la última alcanza a la anterior, así que
+    nunca hay más de ~log2(n) corridas.
+
+    Los nulos se tratan como un valor más, igual que drop_duplicates: solo se conserva
+    la primera fila con clave nula.
+    """
+
+    def __init__(self):
+        self.corridas = []
+        self.nulo_visto = False
+
+    def __len__(self):
+        return sum(len(c) for c in self.corridas) + int(self.nulo_visto)
+
+    def contiene(self, claves: np.ndarray) -> np.ndarray:
+        vistas = np.zeros(len(claves), dtype=bool)
+        for corrida in self.corridas:
+            pos = np.searchsorted(corrida, claves)
+            pos[pos == len(corrida)] = 0
+            vistas |= corrida[pos] == claves
+        return vistas
+
+    def agregar(self, claves: np.ndarray):
+        if len(claves) == 0:
+            return
+        self.corridas.append(np.unique(claves.astype(np.int64)))
+        while len(self.corridas) > 1 and len(self.corridas[-1]) >= len(self.corridas[-2]):
+            ultima = self.corridas.pop()
+            self.corridas[-1] = np.union1d(self.corridas[-1], ultima)
+
+    def primeras(self, s: pd.Series) -> pd.Series:
+        """
+        Máscara de filas a conservar: primera aparición de cada clave considerando este
+        lote y todos los anteriores. Registra las claves nuevas.
+        """
+        nulos = s.isna().to_numpy()
+        conservar = ~s.duplicated(keep="first").to_numpy()
+        if nulos.any() and self.nulo_visto:
+            conservar &= ~nulos
+        self.nulo_visto |= bool(nulos.any())
+
+        validas = ~nulos
+        claves = s.to_numpy(dtype=np.int64, na_value=0)
+        conservar[validas] &= ~self.contiene(claves[validas])
+        self.agregar(claves[conservar & validas])
+        return pd.Series(conservar, index=s.index)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Métricas de ejecución de los scripts del ETL
+--------------------------------------------
+- rss_pico_mb: memoria residente máxima del proceso (MB)
+- reportar_rendimiento: imprime filas, tiempo, throughput y RSS pico al final de un script
+- etapa / instrumentar: registro estructurado de cada etapa del ETL
+
+Cada etapa instrumentada (los main de limpia_*, transformar, crear_marts, cargar, ...)
+agrega una línea JSON a metricas/<id de corrida>.jsonl con tiempo de pared, tiempo de
+CPU, RSS pico de la etapa, filas de entrada y salida, filas afectadas por cada regla
+(deduplicación, edad fuera de rango, montos negativos, fechas no parseables, ...) y bytes
+leídos y escritos. almacen.py y lotes.py suman los bytes solos; los scripts agregan filas
+y reglas con etapa_actual().
+
+- ETL_RUN_ID: id de la corrida (pipeline.py lo fija para todas sus etapas; un script
+  suelto genera uno)
+- ETL_METRICAS: carpeta de los archivos de métricas (por defecto metricas/)
+- ETL_PERFILAR: nombres de etapa separados por coma (o "*"): esas etapas corren bajo
+  cProfile y dejan metricas/<id>_<etapa>.prof (pstats) y un resumen .txt
+
+En Linux el pico de memoria se reinicia al empezar cada etapa (/proc/self/clear_refs), así
+que es el de la etapa aunque el proceso haya corrido otras antes (workers de pipeline.py);
+si no se puede, se informa el pico del proceso ("rss_alcance": "proceso").
+
+Uso:
+  @instrumentar("limpia_ventas")
+  def main(argv=None):
+      ...
+      etapa_actual().regla("dedup_id_venta", antes - despues)
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import secrets
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows no tiene el módulo resource
+    resource = None
+
+
+def rss_pico_mb():
+    """RSS pico del proceso actual en MB, o None si la plataforma no lo expone."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB, macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+class Cronometro:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+
+    def segundos(self) -> float:
+        return time.perf_counter() - self.inicio
+
+
+def reportar_rendimiento(filas: int, segundos: float):
+    tasa = filas / segundos if segundos > 0 else float("inf")
+    print(f"Filas procesadas: {filas} en {segundos:.2f}s ({tasa:,.0f} filas/s)")
+    pico = rss_pico_mb()
+    if pico is not None:
+        print(f"RSS pico: {pico:.1f} MB")
+
+
+# ---------- Instrumentación por etapa ----------
+BASE = Path(__file__).resolve().parents[1]
+_ACTIVA = None
+
+
+def id_corrida() -> str:
+    """Id de la corrida (ETL_RUN_ID); la primera llamada lo crea si no viene dado."""
+    if not os.environ.get("ETL_RUN_ID"):
+        os.environ["ETL_RUN_ID"] = f"{datetime.now():%Y%m%dT%H%M%S}-{secrets.token_hex(3)}"
+    return os.environ["ETL_RUN_ID"]
+
+
+def carpeta_metricas() -> Path:
+    return Path(os.environ.get("ETL_METRICAS") or BASE / "metricas")
+
+
+def archivo_metricas(run_id: str = None) -> Path:
+    return carpeta_metricas() / f"{run_id or id_corrida()}.jsonl"
+
+
+def tamano_bytes(ruta) -> int:
+    """Tamaño de un archivo, o la suma de los archivos de una carpeta; 0 si no existe."""
+    ruta = Path(ruta)
+    if ruta.is_file():
+        return ruta.stat().st_size
+    if ruta.is_dir():
+        return sum(f.stat().st_size for f in ruta.rglob("*") if f.is_file())
+    return 0
+
+
+def _reiniciar_pico() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _pico_etapa_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class RegistroEtapa:
+    """Lo que una etapa informa de sí misma; etapa() agrega tiempos y memoria al cerrar."""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.filas_entrada = self.filas_salida = None
+        self.reglas = {}
+        self.bytes_leidos = self.bytes_escritos = 0
+        self.cpu_workers = 0.0
+        self.pid = os.getpid()
+        self.detalle = {}
+
+    def filas(self, entrada: int = None, salida: int = None):
+        """Suma filas de entrada/salida (se puede llamar una vez por lote)."""
+        if entrada is not None:
+            self.filas_entrada = (self.filas_entrada or 0) + int(entrada)
+        if salida is not None:
+            self.filas_salida = (self.filas_salida or 0) + int(salida)
+
+    def regla(self, nombre: str, filas: int):
+        """Filas descartadas o anuladas por una regla de limpieza."""
+        self.reglas[nombre] = self.reglas.get(nombre, 0) + int(filas)
+
+    def leido(self, *rutas, bytes_: int = 0):
+        self.bytes_leidos += bytes_ + sum(tamano_bytes(r) for r in rutas)
+
+    def escrito(self, *rutas, bytes_: int = 0):
+        self.bytes_escritos += bytes_ + sum(tamano_bytes(r) for r in rutas)
+
+    def anotar(self, clave: str, valor):
+        self.detalle[clave] = valor
+
+    def sumar(self, otro: "RegistroEtapa"):
+        """Agrega lo informado por una parte de la etapa que corrió en otro proceso."""
+        self.filas(otro.filas_entrada, otro.filas_salida)
+        for nombre, n in otro.reglas.items():
+            self.regla(nombre, n)
+        self.bytes_leidos += otro.bytes_leidos
+        self.bytes_escritos += otro.bytes_escritos
+        if otro.pid != os.getpid():  # el CPU de este proceso ya lo mide etapa()
+            self.cpu_workers += otro.cpu_workers
+
+
+def etapa_actual() -> RegistroEtapa:
+    """Registro de la etapa en curso; fuera de una etapa, uno descartable."""
+    return _ACTIVA if _ACTIVA is not None else RegistroEtapa("sin_etapa")
+
+
+def _perfilar(nombre: str) -> bool:
+    pedidas = {e.strip() for e in os.environ.get("ETL_PERFILAR", "").split(",") if e.strip()}
+    return "*" in pedidas or nombre in pedidas
+
+
+def _volcar_perfil(perfil: cProfile.Profile, nombre: str) -> Path:
+    base = carpeta_metricas() / f"{id_corrida()}_{nombre}"
+    base.parent.mkdir(parents=True, exist_ok=True)
+    perfil.dump_stats(base.with_suffix(".prof"))
+    texto = io.StringIO()
+    pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(40)
+    base.with_suffix(".txt").write_text(texto.getvalue(), encoding="utf-8")
+    return base.with_suffix(".prof")
+
+
+@contextmanager
+def etapa(nombre: str):
+    """
+    Mide el bloque como la etapa ``nombre`` y al salir agrega su línea al archivo de
+    métricas de la corrida. Una etapa abierta dentro de otra (p.ej. el wrapper de
+    pipeline.py y el main del script) comparte el registro de la externa.
+    """
+    global _ACTIVA
+    if _ACTIVA is not None:
+        yield _ACTIVA
+        return
+    registro = _ACTIVA = RegistroEtapa(nombre)
+    perfil = cProfile.Profile() if _perfilar(nombre) else None
+    alcance = "etapa" if _reiniciar_pico() else "proceso"
+    inicio, cpu = time.perf_counter(), time.process_time()
+    marca = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    estado = "ok"
+    try:
+        if perfil is not None:
+            perfil.enable()
+        yield registro
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            estado = f"error: SystemExit({e.code})"
+        raise
+    except BaseException as e:
+        estado = f"error: {type(e).__name__}"
+        raise
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            registro.anotar("perfil", str(_volcar_perfil(perfil, nombre)))
+        _ACTIVA = None
+        pico = _pico_etapa_mb() if alcance == "etapa" else rss_pico_mb()
+        linea = {
+            "run_id": id_corrida(), "etapa": nombre, "inicio": marca, "estado": estado,
+            "segundos": round(time.perf_counter() - inicio, 4),
+            "cpu_segundos": round(time.process_time() - cpu + registro.cpu_workers, 4),
+            "rss_pico_mb": round(pico, 1) if pico is not None else None, "rss_alcance": alcance,
+            "filas_entrada": registro.filas_entrada, "filas_salida": registro.filas_salida,
+            "reglas": registro.reglas,
+            "bytes_leidos": registro.bytes_leidos, "bytes_escritos": registro.bytes_escritos,
+            "pid": os.getpid(), **registro.detalle,
+        }
+        ruta = archivo_metricas()
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Una sola escritura por línea en modo append: etapas en paralelo no se mezclan
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write(json.dumps(linea, ensure_ascii=False, default=str) + "\n")
+
+
+@contextmanager
+def parcial(nombre: str):
+    """
+    Registro activo que no escribe línea: para la parte de una etapa que corre en un
+    worker (etl/fragmentos.py). El worker lo retorna y el proceso de la etapa lo suma con
+    etapa_actual().sumar(registro).
+    """
+    global _ACTIVA
+    previo, _ACTIVA = _ACTIVA, RegistroEtapa(nombre)
+    registro, cpu = _ACTIVA, time.process_time()
+    try:
+        yield registro
+    finally:
+        registro.cpu_workers += time.process_time() - cpu
+        _ACTIVA = previo
+
+
+def instrumentar(nombre: str):
+    """Decorador: la función corre como la etapa ``nombre`` (ver etapa())."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with etapa(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def leer_metricas(run_id: str = None) -> list:
+    """Líneas del archivo de métricas de una corrida (por defecto la actual)."""
+    ruta = archivo_metricas(run_id)
+    if not ruta.exists():
+        return []
+    return [json.loads(l) for l in ruta.read_text(encoding="utf-8").splitlines() if l.strip()]
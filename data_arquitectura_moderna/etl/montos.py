@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Normalización vectorizada de montos (moneda) en texto
+-----------------------------------------------------
+Reemplaza la cadena ``astype(str)`` + dos ``str.replace`` con regex + ``pd.to_numeric``
+de limpia_ventas.py, que decidía valor por valor si un "." o una "," eran separador de
+miles o decimal. Aquí el formato numérico se detecta una vez por archivo (o por lote) y
+toda la columna se interpreta con él:
+
+- formato: separador decimal "," y de miles "." (1.234.567,50 — el habitual en Chile)
+  o decimal "." y miles "," (1,234,567.50)
+- símbolos y códigos de moneda ($, US$, CLP, USD, €...) y espacios se descartan
+- signo adelante o atrás (-1.500, +1.500, 1.500-) y negativos contables entre paréntesis
+  ((1.500)); un solo signo por valor ("--5" se rechaza). Los negativos quedan como números
+  negativos, la regla de negocio decide qué hacer con ellos
+- notación científica sin separadores de miles (1e5, 2,5e3), como aceptaba pd.to_numeric
+- los separadores de miles deben agrupar de a 3 dígitos: "1.23,5" se rechaza en vez de
+  convertirse en 123,5
+
+Como fechas.py, se trabaja sobre los valores distintos de la columna y se reexpande por
+código. Los valores que no se pueden interpretar quedan como NaN y se cuentan por motivo
+(vacio, texto, separadores), con algunos ejemplos.
+
+Detección: cada valor con separadores vota por un separador decimal. Son votos firmes los
+valores con ambos separadores (el último es el decimal), con un separador repetido (es de
+miles) o con un separador seguido de 1, 2 o más de 3 dígitos (es decimal). "1.234" es
+ambiguo y vota débil por miles, como hacía la regex anterior.
+
+Uso:
+  normalizador = NormalizadorMontos()          # o NormalizadorMontos("coma")
+  df["monto"] = normalizador.normalizar(df["monto"])   # por lote; el formato se fija
+  normalizador.imprimir_reporte()
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from fechas import MARCADORES_VACIO
+
+FormatoMonto = namedtuple("FormatoMonto", ["decimal", "miles"])
+FORMATOS_MONTO = {
+    "coma": FormatoMonto(",", "."),
+    "punto": FormatoMonto(".", ","),
+}
+# Sin evidencia en los datos (solo enteros) el formato no cambia el resultado
+FORMATO_POR_DEFECTO = FORMATOS_MONTO["coma"]
+
+MOTIVOS = ("vacio", "texto", "separadores")
+# Además de los de fechas.py: "nan" es lo que deja astype(str) en un nulo
+VACIOS = MARCADORES_VACIO + ("nan", "NaN")
+EJEMPLOS_POR_MOTIVO = 3
+MIXTO = "distinto por archivo"
+MUESTRA_DETECCION = 20_000  # filas
+
+# Símbolos y espacios que se eliminan con str.translate (detección)
+_SIMBOLOS = str.maketrans("", "", "$€£¥ \t\u00a0\u202f")
+
+# Patrón completo de un monto (RE2 de pyarrow y re de Python aceptan la misma sintaxis;
+# los espacios no separables van literales porque cada motor los escapa distinto)
+_ESPACIO = "[\\s\u00a0\u202f]*"
+_MILES_ESPACIO = "[ \u00a0\u202f]"
+_CODIGOS = r"(?i:US\$|USD|CLP|EUR|ARS|MXN|PEN|COP|BRL)\.?"
+_MONEDA = rf"(?:[$€£¥]|{_CODIGOS})?"
+
+
+def patron_monto(formato: FormatoMonto) -> str:
+    """
+    Regex anclada con grupos nombrados: ini ("-", "+" o "("), signo, ent (con separadores
+    de miles en grupos de 3, o con espacios, o sin separar), dec, exp (exponente, solo sin
+    separadores de miles) y fin ("-" o ")").
+    """
+    d, m = re.escape(formato.decimal), re.escape(formato.miles)
+    entero = rf"\d{{1,3}}(?:{m}\d{{3}})+|\d{{1,3}}(?:{_MILES_ESPACIO}\d{{3}})+|\d+"
+    return (rf"^{_ESPACIO}(?P<ini>[-+(]?){_ESPACIO}{_MONEDA}{_ESPACIO}(?P<signo>[-+]?){_ESPACIO}"
+            rf"(?P<ent>{entero})(?:{d}(?P<dec>\d+))?(?:[eE](?P<exp>[-+]?\d+))?"
+            rf"{_ESPACIO}{_MONEDA}{_ESPACIO}(?P<fin>[-)]?){_ESPACIO}$")
+
+
+def _sin_simbolos(t: pd.Series) -> pd.Series:
+    return t.str.translate(_SIMBOLOS)
+
+
+def _signo(t: pd.Series):
+    """Quita paréntesis contables y signos; retorna (texto, máscara de negativos)."""
+    parentesis = t.str.startswith("(") & t.str.endswith(")")
+    t = t.mask(parentesis, t.str[1:-1])
+    menos = t.str.startswith("-") | t.str.endswith("-")
+    t = t.str.strip("+-")
+    return t, (parentesis ^ menos).to_numpy()
+
+
+def detectar_formato(s: pd.Series):
+    """
+    Formato numérico de una columna de montos en texto. Retorna (FormatoMonto o None, firme):
+    None si ningún valor trae separadores; ``firme`` indica si hubo votos no ambiguos.
+    """
+    if len(s) > MUESTRA_DETECCION:
+        # Muestra a paso fijo: cubre todo el lote sin permutarlo
+        s = s.iloc[::len(s) // MUESTRA_DETECCION]
+    unicos = pd.Series(pd.unique(s.dropna().astype(str)), dtype=object)
+    t, _ = _signo(_sin_simbolos(unicos.str.strip()))
+    puntos, comas = t.str.count(r"\."), t.str.count(",")
+    cola = t.str.extract(r"([.,])(\d+)$")
+    ultimo, digitos = cola[0], cola[1].str.len()
+
+    ambos = (puntos > 0) & (comas > 0)
+    solo_punto = (puntos > 0) & (comas == 0)
+    solo_coma = (comas > 0) & (puntos == 0)
+    # Votos por "el decimal es coma"
+    firmes_coma = (ambos & (ultimo == ",")) | (solo_punto & (puntos > 1)) | \
+        (solo_coma & (comas == 1) & (digitos != 3))
+    firmes_punto = (ambos & (ultimo == ".")) | (solo_coma & (comas > 1)) | \
+        (solo_punto & (puntos == 1) & (digitos != 3))
+    debiles_coma = solo_punto & (puntos == 1) & (digitos == 3)
+    debiles_punto = solo_coma & (comas == 1) & (digitos == 3)
+
+    for coma, punto, firme in ((firmes_coma.sum(), firmes_punto.sum(), True),
+                               (debiles_coma.sum(), debiles_punto.sum(), False)):
+        if coma or punto:
+            return FORMATOS_MONTO["coma" if coma >= punto else "punto"], firme
+    return None, False
+
+
+def _interpretar_arrow(textos: np.ndarray, patron: str) -> tuple:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    partes = pc.extract_regex(pa.array(textos, type=pa.string()), patron)
+    calza = pc.is_valid(partes)
+    ent = pc.if_else(calza, pc.replace_substring_regex(partes.field("ent"), r"\D", ""), "0")
+    dec = partes.field("dec")
+    dec = pc.if_else(pc.and_(calza, pc.greater(pc.utf8_length(dec), 0)), dec, "0")
+    exp = partes.field("exp")
+    exp = pc.if_else(pc.and_(calza, pc.greater(pc.utf8_length(exp), 0)), exp, "0")
+    numero = pc.binary_join_element_wise(pc.binary_join_element_wise(ent, dec, "."), exp, "e")
+    valores = pc.cast(numero, pa.float64()).to_numpy()
+    grupos = [pc.if_else(calza, partes.field(g), "").to_numpy(zero_copy_only=False)
+              for g in ("ini", "signo", "ent", "exp", "fin")]
+    return valores, calza.to_numpy(zero_copy_only=False), *grupos
+
+
+def _interpretar_pandas(textos: np.ndarray, patron: str) -> tuple:
+    # re.ASCII: \d y \s como en RE2
+    partes = pd.Series(textos, dtype=object).str.extract(patron, flags=re.ASCII)
+    calza = partes["ent"].notna().to_numpy()
+    numero = (partes["ent"].str.replace(r"\D", "", regex=True) + "." + partes["dec"].fillna("0")
+              + "e" + partes["exp"].fillna("0"))
+    valores = pd.to_numeric(numero, errors="coerce").to_numpy(dtype=np.float64)
+    grupos = [partes[g].fillna("").to_numpy(dtype=object) for g in ("ini", "signo", "ent", "exp", "fin")]
+    return valores, calza, *grupos
+
+
+def parsear_montos(s: pd.Series, formato: FormatoMonto = FORMATO_POR_DEFECTO):
+    """
+    Convierte una columna de montos a float64 con ``formato``. Retorna (serie, rechazos,
+    ejemplos): filas rechazadas por motivo y hasta EJEMPLOS_POR_MOTIVO valores de cada uno.
+    Una columna ya numérica se devuelve como float64 (solo los nulos cuentan como vacíos).
+
+    Cada valor distinto se interpreta con una sola regex (patron_monto): con pyarrow en su
+    motor RE2 vectorizado; sin pyarrow, con str.extract de pandas (mismo resultado).
+    """
+    rechazos = dict.fromkeys(MOTIVOS, 0)
+    ejemplos = {m: [] for m in MOTIVOS}
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        valores = s.astype("float64")
+        rechazos["vacio"] = int(valores.isna().sum())
+        return valores, rechazos, ejemplos
+
+    if s.dtype != object:
+        s = s.astype(object).where(s.notna())
+    codigos, unicos = pd.factorize(s, use_na_sentinel=True)
+    filas_por_valor = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+    rechazos["vacio"] += int((codigos < 0).sum())
+    textos = pd.Series(unicos, dtype=object).astype(str).to_numpy(dtype=object)
+
+    try:
+        interpretar = _interpretar_arrow
+        import pyarrow  # noqa: F401
+    except ImportError:
+        interpretar = _interpretar_pandas
+    valores, calza, ini, signo, ent, exp, fin = interpretar(textos, patron_monto(formato))
+    parentesis = (ini == "(") & (fin == ")")
+    # Un paréntesis sin su par no es un negativo contable
+    calza &= parentesis | ((ini != "(") & (fin != ")"))
+    # Un solo signo por valor: "--5", "+5-" o "(-5)" se rechazan
+    signos = parentesis.astype(int) + np.isin(ini, ("-", "+")) + (signo != "") + (fin == "-")
+    calza &= signos <= 1
+    # Exponente solo sobre un entero sin separadores de miles
+    calza &= (exp == "") | np.char.isdigit(ent.astype(str))
+    negativo = parentesis | (ini == "-") | (signo == "-") | (fin == "-")
+    valores = np.where(calza & np.isfinite(valores), np.where(negativo, -valores, valores), np.nan)
+
+    # Motivo de cada valor rechazado: vacío, separadores (número mal separado) o texto
+    rechazados = np.flatnonzero(np.isnan(valores))
+    if len(rechazados):
+        t = pd.Series(textos[rechazados], dtype=object).str.strip()
+        vacio = t.isin(VACIOS).to_numpy()
+        # Sin símbolos ni códigos de moneda: "USD 1,234.50" con el formato equivocado es de separadores
+        numerico = _sin_simbolos(t.str.replace(_CODIGOS, "", regex=True)).str.strip("()+-").str.fullmatch(r"[\d.,]*\d[\d.,]*").to_numpy(dtype=bool)
+        motivos = np.where(vacio, "vacio", np.where(numerico, "separadores", "texto"))
+        for mot in MOTIVOS:
+            idx = rechazados[motivos == mot]
+            rechazos[mot] += int(filas_por_valor[idx].sum())
+            ejemplos[mot] = textos[idx[:EJEMPLOS_POR_MOTIVO]].tolist()
+
+    # El código -1 (nulo) apunta al NaN agregado al final
+    resultado = np.append(valores, np.nan)[codigos]
+    return pd.Series(resultado, index=s.index, name=s.name), rechazos, ejemplos
+
+
+class NormalizadorMontos:
+    """
+    Normaliza montos lote a lote con un solo formato por archivo: el formato indicado, o
+    el detectado en el primer lote con evidencia firme (mientras no la haya, cada lote usa
+    su propia detección). Acumula los rechazos de todos los lotes.
+    """
+
+    def __init__(self, formato=None):
+        if isinstance(formato, str):
+            formato = None if formato == "auto" else FORMATOS_MONTO[formato]
+        self.formato = formato
+        self.fijo = formato is not None
+        self.origen = "indicado" if self.fijo else "por defecto"
+        self.rechazos = dict.fromkeys(MOTIVOS, 0)
+        self.ejemplos = {m: [] for m in MOTIVOS}
+        self.filas = 0
+
+    def normalizar(self, s: pd.Series) -> pd.Series:
+        formato = self.formato
+        if not self.fijo and not pd.api.types.is_numeric_dtype(s):
+            detectado, firme = detectar_formato(s)
+            if detectado is not None:
+                formato, self.fijo = detectado, firme
+                self.formato = detectado
+                self.origen = "detectado" if firme else "detectado, ambiguo"
+        valores, rechazos, ejemplos = parsear_montos(s, formato or FORMATO_POR_DEFECTO)
+        self.filas += len(s)
+        for m in MOTIVOS:
+            self.rechazos[m] += rechazos[m]
+            nuevos = [e for e in ejemplos[m] if e not in self.ejemplos[m]]
+            self.ejemplos[m].extend(nuevos[:EJEMPLOS_POR_MOTIVO - len(self.ejemplos[m])])
+        return valores
+
+    def sumar(self, otro: "NormalizadorMontos"):
+        """Agrega lo de otro normalizador (el de otro archivo, limpiado por separado)."""
+        if self.filas == 0:
+            self.formato, self.fijo, self.origen = otro.formato, otro.fijo, otro.origen
+        elif otro.filas and otro.formato != self.formato:
+            self.origen = MIXTO
+        self.filas += otro.filas
+        for m, n in otro.rechazos.items():
+            self.rechazos[m] = self.rechazos.get(m, 0) + n
+            previos = self.ejemplos.setdefault(m, [])
+            nuevos = [e for e in otro.ejemplos.get(m, []) if e not in previos]
+            previos.extend(nuevos[:EJEMPLOS_POR_MOTIVO - len(previos)])
+
+    def descartar(self, mascara, motivo: str):
+        """Cuenta filas anuladas después por una regla de negocio (p.ej. montos negativos)."""
+        self.rechazos[motivo] = self.rechazos.get(motivo, 0) + int(np.asarray(mascara).sum())
+
+    def imprimir_reporte(self):
+        formato = self.formato or FORMATO_POR_DEFECTO
+        if self.origen == MIXTO:
+            print(f"Formato de monto: {MIXTO} (detectado en cada archivo)")
+        else:
+            print(f"Formato de monto: decimal '{formato.decimal}', miles '{formato.miles}' ({self.origen})")
+        total = sum(self.rechazos.values())
+        print(f"Montos rechazados: {total} de {self.filas}")
+        for m in self.rechazos:
+            if self.rechazos[m]:
+                ejemplos = ", ".join(repr(e) for e in self.ejemplos.get(m, []))
+                print(f" - {m}: {self.rechazos[m]}" + (f" (p.ej. {ejemplos})" if ejemplos else ""))
@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Motor de perfilado de calidad (una pasada, por trozos)
+------------------------------------------------------
+Reúne lo que hacían por separado diagnostico_clientes/productos/ventas.py. Cada tabla se
+describe con una especificación (columnas a revisar, tipo de regla, mensajes del reporte) y
+el archivo se lee una sola vez, en trozos: por cada trozo se actualizan completitud, validez,
+duplicados por columna, duplicados de filas completas y cheques de negocio.
+
+La memoria queda acotada: de cada columna solo se guarda el hash (8 bytes) de sus valores
+distintos, no la columna. Los duplicados se calculan sobre el texto tal como viene en el
+archivo (se lee con dtype=str).
+
+Modo aproximado (aproximado=True / --aproximado): los conjuntos de distintos se reemplazan
+por HyperLogLog y se agregan cuantiles (SketchCuantiles) de edad, cantidad y monto; ver
+sketches.py para las cotas de error. La memoria pasa a ser constante (16 KB por columna).
+Todas las métricas son mergeables, así que con workers > 1 los trozos se perfilan en
+paralelo y los parciales se fusionan.
+
+Salidas: las mismas diagnostico_calidad_<tabla>.csv/.md de siempre.
+"""
+import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from lotes import ClavesVistas
+from metricas import etapa_actual
+from sketches import HyperLogLog, SketchCuantiles
+
+COLUMNAS_REPORTE = ["Campo", "Completitud (%)", "Validez (%)", "Duplicados"]
+CUANTILES = [("min", 0), ("p25", 0.25), ("p50", 0.5), ("p75", 0.75), ("p99", 0.99), ("max", 1)]
+
+# ---------- Especificaciones por tabla ----------
+# columnas: (candidatos en orden de preferencia, regla). Se usa el primer candidato presente
+# (sin distinguir mayúsculas). problemas: índice de la columna -> (dimensión, impacto).
+# cuantiles: columnas numéricas cuya distribución se resume en el modo aproximado.
+ESPECIFICACIONES = {
+    "clientes": {
+        "columnas": [
+            (["nombre", "name", "full_name"], "no_vacio"),
+            (["id_cliente", "cliente_id", "id", "idCliente"], "no_vacio"),  # unicidad ~ "duplicados"
+        ],
+        "todas_si_no_hay": True,
+        "cuantiles": ["edad"],
+        "vista_previa": True,
+        "filas_duplicadas": False,
+        "titulo_consola": "\nResumen de calidad de datos:",
+        "titulo_md": "## Resumen de calidad de datos\n\n",
+        "etiquetas": ("Dimensión de calidad más comprometida", "Posibles consecuencias"),
+        "problemas": {
+            1: ("Unicidad/Integridad", "Confusión de clientes, duplicidad en reportes y errores de facturación."),
+            0: ("Completitud/Consistencia", "Dificultad para personalizar comunicaciones y segmentar correctamente."),
+        },
+        "por_defecto": ("Calidad del Dato", "Impacto general en reportes y toma de decisiones."),
+    },
+    "productos": {
+        "columnas": [
+            (["id_producto"], "numerico"),
+            (["nombre_producto"], "no_vacio"),
+            (["categoria"], "no_vacio"),
+            (["proveedor"], "no_vacio"),
+        ],
+        "filas_duplicadas": True,
+        "titulo_consola": "\nDiagnóstico productos.csv",
+        "titulo_md": "## Diagnóstico productos.csv\n\n",
+        "etiquetas": ("Dimensión afectada", "Impacto potencial"),
+        "problemas": {
+            0: ("Integridad/Unicidad de claves", "IDs inválidos o duplicados afectan joins y el DW."),
+            2: ("Consistencia semántica", "Categorías mal definidas dañan segmentaciones y reportes."),
+        },
+        "por_defecto": ("Completitud/Consistencia", "Campos vacíos degradan la calidad de análisis."),
+    },
+    "ventas": {
+        "columnas": [
+            (["id_venta"], "numerico"),
+            (["id_producto"], "numerico"),
+            (["id_sucursal"], "numerico"),  # si fuera texto, cambiar a "no_vacio"
+            (["fecha"], "fecha"),
+            (["cantidad"], "numerico"),
+            (["monto"], "numerico"),
+        ],
+        "vista_previa": True,
+        "filas_duplicadas": True,
+        "negativos": {"cantidad": "cantidad_negativa", "monto": "monto_negativo"},
+        "cuantiles": ["cantidad", "monto"],
+        "titulo_consola": "\nDiagnóstico ventas.csv",
+        "titulo_md": "## Diagnóstico ventas.csv\n\n",
+        "etiquetas": ("Dimensión afectada", "Impacto potencial"),
+        "problemas": {
+            0: ("Integridad/Unicidad de claves", "Ventas duplicadas o inválidas distorsionan todas las métrricas."),
+            3: ("Consistencia temporal", "Fechas inválidas rompen series de tiempo y agregaciones."),
+            4: ("Exactitud de medidas", "Valores inválidos afectan KPIs (ingresos, unidades)."),
+            5: ("Exactitud de medidas", "Valores inválidos afectan KPIs (ingresos, unidades)."),
+        },
+        "por_defecto": ("Completitud/Consistencia", "Campos vacíos degradan la calidad del análisis."),
+    },
+}
+
+
+# ---------- Reglas de validez ----------
+# Cada regla recibe los valores distintos de la columna en el trozo y retorna una máscara;
+# así to_numeric/regex corren sobre los únicos y no sobre todas las filas.
+def es_no_vacio(u: pd.Series) -> np.ndarray:
+    return (u.astype(str).str.strip().ne("") & u.notna()).to_numpy()
+
+def es_numerico(u: pd.Series) -> np.ndarray:
+    return pd.to_numeric(u, errors="coerce").notna().to_numpy()
+
+def es_fecha(u: pd.Series) -> np.ndarray:
+    # Fecha válida = texto en formato ISO 'YYYY-MM-DD' (lo que ya consideraba el diagnóstico)
+    return u.astype(str).str.fullmatch(r"\d{4}-\d{2}-\d{2}").to_numpy(dtype=bool)
+
+REGLAS = {"no_vacio": es_no_vacio, "numerico": es_numerico, "fecha": es_fecha}
+
+HASH_NULO = np.int64(0x2545F4914F6CDD1D)
+
+
+class ValoresTrozo:
+    """Una columna de un trozo factorizada: valores distintos, conteo de cada uno y su hash."""
+
+    def __init__(self, s: pd.Series):
+        codigos, unicos = pd.factorize(s)
+        self.codigos = codigos
+        self.unicos = pd.Series(unicos, dtype=object)
+        self.conteos = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+        self.nulos = len(s) - int(self.conteos.sum())
+        self.hashes = pd.util.hash_array(self.unicos.to_numpy()).view(np.int64)
+
+    def contar(self, mascara: np.ndarray) -> int:
+        """Filas del trozo cuyo valor cumple la máscara (calculada sobre los únicos)."""
+        return int(self.conteos[mascara].sum())
+
+    def hash_filas(self) -> np.ndarray:
+        return np.append(self.hashes, HASH_NULO)[self.codigos]
+
+
+class ConjuntoExacto:
+    """Valores distintos exactos: hashes de 64 bits en corridas ordenadas (ClavesVistas)."""
+
+    def __init__(self):
+        self.vistos = ClavesVistas()
+
+    def agregar(self, hashes: np.ndarray, hay_nulo: bool = False):
+        self.vistos.agregar(hashes[~self.vistos.contiene(hashes)])
+        self.vistos.nulo_visto |= hay_nulo
+
+    def fusionar(self, otro: "ConjuntoExacto"):
+        for corrida in otro.vistos.corridas:
+            self.agregar(corrida, otro.vistos.nulo_visto)
+
+    def estimar(self) -> int:
+        return len(self.vistos)
+
+
+class ConjuntoAproximado:
+    """Valores distintos estimados con HyperLogLog (memoria constante, ±0,8%)."""
+
+    def __init__(self):
+        self.hll = HyperLogLog()
+        self.nulo_visto = False
+
+    def agregar(self, hashes: np.ndarray, hay_nulo: bool = False):
+        self.hll.agregar_hashes(hashes)
+        self.nulo_visto |= hay_nulo
+
+    def fusionar(self, otro: "ConjuntoAproximado"):
+        self.hll.fusionar(otro.hll)
+        self.nulo_visto |= otro.nulo_visto
+
+    def estimar(self) -> int:
+        return round(self.hll.estimar()) + int(self.nulo_visto)
+
+
+def combinar_hashes(columnas: list) -> np.ndarray:
+    """Hash por fila a partir de los hashes de cada columna (aritmética uint64 con desborde)."""
+    acumulado = np.zeros(len(columnas[0]), dtype=np.uint64)
+    for h in columnas:
+        acumulado = acumulado * np.uint64(1_000_003) ^ h.view(np.uint64)
+    return acumulado.view(np.int64)
+
+
+class PerfilColumna:
+    def __init__(self, nombre: str, regla: str, aproximado: bool = False):
+        self.nombre, self.regla = nombre, regla
+        self.filas = self.no_nulos = self.validos = 0
+        self.distintos = ConjuntoAproximado() if aproximado else ConjuntoExacto()
+
+    def actualizar(self, v: ValoresTrozo):
+        self.filas += len(v.codigos)
+        self.no_nulos += len(v.codigos) - v.nulos
+        self.validos += v.contar(REGLAS.get(self.regla, es_no_vacio)(v.unicos))
+        self.distintos.agregar(v.hashes, v.nulos > 0)
+
+    def fusionar(self, otro: "PerfilColumna"):
+        self.filas += otro.filas
+        self.no_nulos += otro.no_nulos
+        self.validos += otro.validos
+        self.distintos.fusionar(otro.distintos)
+
+    def fila_reporte(self) -> dict:
+        comp = self.no_nulos / self.filas * 100 if self.filas else float("nan")
+        val = self.validos / self.filas * 100 if self.filas else float("nan")
+        return {"Campo": self.nombre, "Completitud (%)": pct(comp),
+                "Validez (%)": pct(val), "Duplicados": self.filas - self.distintos.estimar()}
+
+
+def pct(x):
+    return f"{x:.0f}%"
+
+
+def detectar_columna(columnas, posibles):
+    lower_map = {c.lower(): c for c in columnas}
+    for p in posibles:
+        if p.lower() in lower_map:
+            return lower_map[p.lower()]
+    return None
+
+
+def planificar(columnas, spec: dict) -> dict:
+    """Qué medir según el encabezado del archivo: columnas a perfilar y su rol en el reporte."""
+    perfiles, roles = [], {}
+    for idx, (candidatos, regla) in enumerate(spec["columnas"]):
+        col = detectar_columna(columnas, candidatos)
+        if col is not None:
+            roles[col] = idx
+            perfiles.append((col, regla))
+    if not perfiles and spec.get("todas_si_no_hay"):
+        perfiles = [(c, "no_vacio") for c in columnas]
+    return {"columnas": list(columnas), "perfiles": perfiles, "roles": roles,
+            "negativos": [c for c in spec.get("negativos", {}) if c in columnas],
+            "cuantiles": [c for c in spec.get("cuantiles", []) if c in columnas],
+            "filas_duplicadas": bool(spec.get("filas_duplicadas"))}
+
+
+class Perfil:
+    """
+    Métricas acumuladas de una tabla. Se alimenta trozo a trozo (acumular) y dos perfiles
+    parciales se combinan con fusionar, así que el trabajo se puede repartir entre procesos.
+    """
+
+    def __init__(self, plan: dict, aproximado: bool = False):
+        self.plan, self.aproximado = plan, aproximado
+        self.columnas = [PerfilColumna(c, regla, aproximado) for c, regla in plan["perfiles"]]
+        self.negativos = dict.fromkeys(plan["negativos"], 0)
+        self.cuantiles = {c: SketchCuantiles() for c in plan["cuantiles"]} if aproximado else {}
+        self.filas = 0
+        self.filas_distintas = None
+        if plan["filas_duplicadas"]:
+            self.filas_distintas = ConjuntoAproximado() if aproximado else ConjuntoExacto()
+
+    def acumular(self, df: pd.DataFrame):
+        # Cada columna se factoriza una sola vez por trozo y todas las métricas la reutilizan
+        necesarias = df.columns if self.filas_distintas is not None else \
+            {p.nombre for p in self.columnas} | set(self.negativos) | set(self.cuantiles)
+        valores = {c: ValoresTrozo(df[c]) for c in necesarias}
+        for p in self.columnas:
+            p.actualizar(valores[p.nombre])
+        for c in set(self.negativos) | set(self.cuantiles):
+            v = valores[c]
+            numeros = pd.to_numeric(v.unicos, errors="coerce").to_numpy(dtype=np.float64)
+            if c in self.negativos:
+                self.negativos[c] += v.contar(numeros < 0)
+            if c in self.cuantiles:
+                self.cuantiles[c].agregar(numeros, v.conteos)
+        self.filas += len(df)
+        if self.filas_distintas is not None and len(df):
+            self.filas_distintas.agregar(combinar_hashes([valores[c].hash_filas() for c in df.columns]))
+
+    def fusionar(self, otro: "Perfil"):
+        for propia, ajena in zip(self.columnas, otro.columnas):
+            propia.fusionar(ajena)
+        for c, n in otro.negativos.items():
+            self.negativos[c] += n
+        for c, sketch in otro.cuantiles.items():
+            self.cuantiles[c].fusionar(sketch)
+        self.filas += otro.filas
+        if self.filas_distintas is not None:
+            self.filas_distintas.fusionar(otro.filas_distintas)
+
+    def tabla_cuantiles(self) -> pd.DataFrame:
+        filas = []
+        for c, sketch in self.cuantiles.items():
+            fila = {"Campo": c, "n": sketch.n}
+            for nombre, q in CUANTILES:
+                fila[nombre] = round(sketch.cuantil(q), 2)
+            filas.append(fila)
+        return pd.DataFrame(filas)
+
+
+def rangos_de_lineas(csv_path: Path, chunksize: int) -> list:
+    """
+    Parte el cuerpo del CSV (sin encabezado) en rangos de bytes que empiezan y terminan en
+    un salto de línea, de ~chunksize filas cada uno. Supone que no hay saltos de línea
+    dentro de campos entre comillas (los extractos crudos del proyecto no los tienen).
+    """
+    tamano = csv_path.stat().st_size
+    with open(csv_path, "rb") as f:
+        f.readline()
+        inicio = f.tell()
+        muestra = f.read(1 << 20)
+        lineas = max(muestra.count(b"\n"), 1)
+        bloque = max(len(muestra) // lineas * chunksize, 1 << 16)
+        rangos = []
+        while inicio < tamano:
+            f.seek(min(inicio + bloque, tamano))
+            f.readline()
+            fin = min(f.tell(), tamano)
+            rangos.append((inicio, fin))
+            inicio = fin
+    return rangos
+
+
+def _perfilar_rango(csv_path: Path, inicio: int, fin: int, plan: dict, aproximado: bool) -> Perfil:
+    with open(csv_path, "rb") as f:
+        # Con el encabezado delante el parser lee el rango igual que la lectura por trozos
+        encabezado = f.readline()
+        f.seek(inicio)
+        datos = encabezado + f.read(fin - inicio)
+    df = pd.read_csv(io.BytesIO(datos), dtype=str)
+    parcial = Perfil(plan, aproximado)
+    parcial.acumular(df)
+    return parcial
+
+
+def perfilar(csv_path: Path, spec: dict, chunksize: int = 500_000,
+             aproximado: bool = False, workers: int = 1) -> dict:
+    """
+    Lee el archivo una vez, por trozos, y acumula todas las métricas de la especificación.
+    Con workers > 1 el archivo se parte en rangos de bytes; cada proceso del pool lee y
+    perfila sus rangos y los perfiles parciales se fusionan en el principal.
+    """
+    plan = planificar(pd.read_csv(csv_path, nrows=0).columns, spec)
+    total = Perfil(plan, aproximado)
+    # Vista previa con los tipos que infiere pandas (como antes), no como texto
+    vista_previa = pd.read_csv(csv_path, nrows=9) if spec.get("vista_previa") else None
+
+    if workers <= 1:
+        with pd.read_csv(csv_path, dtype=str, chunksize=chunksize) as lector:
+            for df in lector:
+                total.acumular(df)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(_perfilar_rango, csv_path, inicio, fin, plan, aproximado)
+                       for inicio, fin in rangos_de_lineas(csv_path, chunksize)]
+            for f in as_completed(futuros):
+                total.fusionar(f.result())
+
+    tabla = pd.DataFrame([p.fila_reporte() for p in total.columnas], columns=COLUMNAS_REPORTE)
+    problemas = {spec["negativos"][c]: n for c, n in total.negativos.items() if n}
+    filas_dup = total.filas - total.filas_distintas.estimar() \
+        if total.filas_distintas is not None else None
+    return {"tabla": tabla, "roles": plan["roles"], "filas": total.filas,
+            "vista_previa": vista_previa, "filas_duplicadas": filas_dup, "problemas": problemas,
+            "aproximado": aproximado, "cuantiles": total.tabla_cuantiles()}
+
+
+# ---------- Reporte ----------
+NOTA_APROXIMADO = ("Modo aproximado: duplicados estimados con HyperLogLog "
+                   "(error estándar ±0.81% sobre la cantidad de valores distintos).")
+
+
+def a_numerico(tabla: pd.DataFrame) -> pd.DataFrame:
+    df_csv = tabla.copy()
+    for col in ["Completitud (%)", "Validez (%)"]:
+        df_csv[col] = df_csv[col].str.replace("%", "", regex=False).astype(float)
+    return df_csv
+
+
+def reportar(nombre: str, perfil: dict, spec: dict, carpeta: str):
+    tabla, filas_dup, problemas = perfil["tabla"], perfil["filas_duplicadas"], perfil["problemas"]
+
+    if spec.get("vista_previa") and perfil["vista_previa"] is not None:
+        # Primeras 9 filas para tener una vista inicial del contenido
+        print("Dataframe")
+        print(perfil["vista_previa"])
+
+    print(spec["titulo_consola"])
+    if not tabla.empty:
+        print(tabla.to_string(index=False))
+    else:
+        print("No se encontraron columnas esperadas.")
+
+    if problemas:
+        print("\nCheques de negocio:")
+        for k, v in problemas.items():
+            print(f" - {k}: {v} filas")
+    if filas_dup is not None:
+        print(f"\nDuplicados de filas completas: {filas_dup}")
+    if perfil["aproximado"]:
+        print(f"\n{NOTA_APROXIMADO}")
+        if not perfil["cuantiles"].empty:
+            print("\nCuantiles aproximados (error relativo ≤ 1%):")
+            print(perfil["cuantiles"].to_string(index=False))
+
+    # Guardar CSV (numérico) y Markdown
+    base = f"{carpeta}/diagnostico_calidad_{nombre}"
+    if not tabla.empty:
+        a_numerico(tabla).to_csv(base + ".csv", index=False)
+        try:
+            with open(base + ".md", "w", encoding="utf-8") as f:
+                f.write(spec["titulo_md"])
+                f.write(tabla.to_markdown(index=False))
+                if filas_dup is not None:
+                    f.write(f"\n\nDuplicados de filas completas: {filas_dup}\n")
+                else:
+                    f.write("\n")
+                if problemas:
+                    f.write("\n### Cheques de negocio\n")
+                    for k, v in problemas.items():
+                        f.write(f"- {k}: {v} filas\n")
+                if perfil["aproximado"]:
+                    f.write(f"\n{NOTA_APROXIMADO}\n")
+                    if not perfil["cuantiles"].empty:
+                        f.write("\n### Cuantiles aproximados (error relativo ≤ 1%)\n\n")
+                        f.write(perfil["cuantiles"].to_markdown(index=False))
+                        f.write("\n")
+        except Exception as e:
+            print(f"(Aviso) No se pudo escribir Markdown: {e}")
+
+    # Señal rápida de problemas: campo con menor validez
+    if not tabla.empty:
+        t = a_numerico(tabla)
+        peor = t.sort_values("Validez (%)").iloc[0]["Campo"]
+        dim, imp = spec["problemas"].get(perfil["roles"].get(peor), spec["por_defecto"])
+        print(f"\nCampo con más problemas: {peor}")
+        print(f"{spec['etiquetas'][0]}: {dim}")
+        print(f"{spec['etiquetas'][1]}: {imp}")
+
+
+def diagnosticar(nombre: str, csv_path, carpeta: str = "reportes_datos_crudos",
+                 chunksize: int = 500_000, aproximado: bool = False, workers: int = 1) -> dict:
+    """Perfila csv_path con la especificación de la tabla nombre y escribe sus reportes."""
+    spec = ESPECIFICACIONES[nombre]
+    perfil = perfilar(Path(csv_path), spec, chunksize, aproximado, workers)
+    Path(carpeta).mkdir(parents=True, exist_ok=True)
+    reportar(nombre, perfil, spec, carpeta)
+    base = Path(carpeta) / f"diagnostico_calidad_{nombre}"
+    registro = etapa_actual()
+    registro.filas(entrada=perfil["filas"])
+    registro.leido(csv_path)
+    registro.escrito(base.with_suffix(".csv"), base.with_suffix(".md"))
+    return perfil
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dimensiones lentamente cambiantes (SCD tipo 2): dim_cliente y dim_producto
+--------------------------------------------------------------------------
+Cada versión de un cliente o producto es una fila con su propia clave sustituta
+(sk_cliente / sk_producto), el período en que estuvo vigente y una marca de versión actual:
+
+  sk_cliente | id_cliente | atributos... | valido_desde | valido_hasta | es_actual
+
+- valido_desde/valido_hasta son inclusivos; valido_hasta nulo = versión vigente
+- la primera versión de cada clave natural vale desde 1900-01-01, así las ventas históricas
+  (o que llegan antes que la dimensión) encuentran versión
+- un cambio con fecha efectiva F cierra la versión vigente en F - 1 día y abre una nueva
+  desde F; si la versión vigente se abrió el mismo día F, se corrige en su lugar
+- las claves que no vienen en la carga se conservan tal cual (la carga puede ser parcial)
+
+La detección de cambios es una huella (hash de 64 bits) por fila de los atributos,
+calculada de forma vectorizada para la carga y para las versiones vigentes: solo las filas
+nuevas o con huella distinta generan trabajo.
+
+Uso:
+  dim_cliente, cambios = CLIENTE.actualizar(leer_dimension(curated, CLIENTE), entrante, fecha)
+  hechos["sk_cliente"] = CLIENTE.claves_vigentes(dim_cliente, hechos["id_cliente"], hechos["fecha"])
+"""
+import numpy as np
+import pandas as pd
+
+from almacen import leer_tabla, existe_tabla
+from estrella import IndiceDimension, claves_enteras
+
+DESDE_INICIAL = pd.Timestamp("1900-01-01")
+COLUMNAS_VIGENCIA = ["valido_desde", "valido_hasta", "es_actual"]
+
+# Días desde DESDE_INICIAL como enteros; DIA_MAXIMO (año ~11.000) hace de "sin fin"
+DIA_MAXIMO = (1 << 22) - 1
+
+
+def huellas(df: pd.DataFrame, columnas: list) -> np.ndarray:
+    """
+    Hash de 64 bits por fila de ``columnas``. Los valores se llevan a una forma canónica
+    (números como float64, texto como objeto, nulos como None) para que la huella no
+    dependa del tipo con que se leyó la tabla (Int8 vs float64, category vs object).
+    """
+    canonico = {}
+    for c in columnas:
+        s = df[c]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            canonico[c] = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            canonico[c] = s.astype(object).where(s.notna(), None).to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(canonico, copy=False), index=False).to_numpy()
+
+
+def _dias(fechas, nulo: int) -> np.ndarray:
+    """Días desde DESDE_INICIAL (acotados a [0, DIA_MAXIMO]); NaT -> ``nulo``."""
+    d = pd.Series(fechas, copy=False).to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    nat = np.isnat(d)
+    rel = d.view(np.int64) - DESDE_INICIAL.to_datetime64().astype("datetime64[D]").view(np.int64)
+    rel = np.clip(rel, 0, DIA_MAXIMO)
+    rel[nat] = nulo
+    return rel
+
+
+class DimensionSCD:
+    def __init__(self, nombre: str, clave: str, sustituta: str, atributos: list):
+        self.nombre, self.clave, self.sustituta = nombre, clave, sustituta
+        self.atributos = list(atributos)
+
+    @property
+    def columnas(self) -> list:
+        return [self.sustituta, self.clave] + self.atributos + COLUMNAS_VIGENCIA
+
+    def _versiones(self, df: pd.DataFrame, primera_sk: int, desde) -> pd.DataFrame:
+        n = len(df)
+        v = df[[self.clave] + self.atributos].reset_index(drop=True)
+        v.insert(0, self.sustituta, np.arange(primera_sk, primera_sk + n, dtype=np.int64))
+        v["valido_desde"] = pd.Timestamp(desde)
+        v["valido_hasta"] = pd.NaT
+        v["es_actual"] = True
+        return v
+
+    def actualizar(self, actual: pd.DataFrame, entrante: pd.DataFrame, efectiva) -> tuple:
+        """
+        Aplica la carga ``entrante`` (una fila por clave natural; si se repite, vale la
+        primera) sobre la dimensión ``actual`` (None si no hay historia) con fecha efectiva
+        ``efectiva``. Retorna (dimensión completa, conteo de nuevas/cambiadas/sin cambio).
+        """
+        efectiva = pd.Timestamp(efectiva).normalize()
+        entrante = (entrante.dropna(subset=[self.clave])
+                            .drop_duplicates(subset=[self.clave], keep="first"))
+        if actual is None or len(actual) == 0:
+            dim = self._versiones(entrante, 1, DESDE_INICIAL)
+            return dim, {"nuevas": len(dim), "cambiadas": 0, "sin_cambio": 0}
+
+        filas_vigentes = np.flatnonzero(actual["es_actual"].to_numpy(dtype=bool))
+        vigentes = actual.iloc[filas_vigentes]
+        pos = IndiceDimension(vigentes, self.clave).posiciones(entrante[self.clave])
+        nuevas = pos < 0
+        existentes = np.flatnonzero(~nuevas)
+        distintas = huellas(entrante.iloc[existentes], self.atributos) != \
+            huellas(vigentes.iloc[pos[existentes]], self.atributos)
+        cambiadas = existentes[distintas]
+
+        # Versiones vigentes que cambian: se cierran, o se corrigen si se abrieron hoy mismo
+        reemplazadas = filas_vigentes[pos[cambiadas]]
+        desde_previo = actual["valido_desde"].to_numpy(dtype="datetime64[ns]")[reemplazadas]
+        if (desde_previo > efectiva.to_datetime64()).any():
+            raise ValueError(f"{self.nombre}: la fecha efectiva {efectiva.date()} es anterior a "
+                             "versiones vigentes; las versiones solo avanzan en el tiempo")
+        mismo_dia = desde_previo == efectiva.to_datetime64()
+        corregidas = reemplazadas[mismo_dia]
+        cerradas = reemplazadas[~mismo_dia]
+
+        dim = actual.drop(index=actual.index[corregidas])
+        if len(cerradas):
+            dim = dim.copy()
+            etiquetas = actual.index[cerradas]
+            dim.loc[etiquetas, "valido_hasta"] = efectiva - pd.Timedelta(days=1)
+            dim.loc[etiquetas, "es_actual"] = False
+
+        siguiente = int(actual[self.sustituta].max()) + 1
+        nuevas_v = self._versiones(entrante.iloc[np.flatnonzero(nuevas)], siguiente, DESDE_INICIAL)
+        siguiente += len(nuevas_v)
+        cambio_v = self._versiones(entrante.iloc[cambiadas[~mismo_dia]], siguiente, efectiva)
+        # La corrección del mismo día conserva la clave sustituta y el inicio de la versión
+        correccion_v = entrante.iloc[cambiadas[mismo_dia]][[self.clave] + self.atributos] \
+            .reset_index(drop=True)
+        correccion_v.insert(0, self.sustituta, actual[self.sustituta].to_numpy()[corregidas])
+        for c in COLUMNAS_VIGENCIA:
+            correccion_v[c] = actual[c].to_numpy()[corregidas]
+
+        partes = [p for p in (dim, correccion_v, nuevas_v, cambio_v) if len(p)]
+        dim = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0].reset_index(drop=True)
+        dim = dim.sort_values(self.sustituta, ignore_index=True)[self.columnas]
+        return dim, {"nuevas": len(nuevas_v), "cambiadas": len(cambiadas),
+                     "sin_cambio": len(existentes) - len(cambiadas)}
+
+    def claves_vigentes(self, dim: pd.DataFrame, claves, fechas) -> pd.Series:
+        """
+        Clave sustituta de la versión vigente en cada fecha (join "as of" vectorizado). Las
+        versiones se ordenan por (clave natural, valido_desde); cada hecho encuentra la
+        primera versión de su clave por índice posicional (etl/estrella.py) y avanza mientras
+        la siguiente versión haya empezado hasta su fecha: una pasada por cada versión extra,
+        solo sobre los hechos de claves con historia. Sin fecha -> versión actual; sin
+        versión -> nulo.
+        """
+        indice = pd.Series(claves, copy=False).index
+        if len(dim) == 0:
+            return pd.Series(pd.array([pd.NA] * len(indice), dtype="Int64"), index=indice,
+                             name=self.sustituta)
+        k_dim, _ = claves_enteras(dim[self.clave])
+        desde = _dias(dim["valido_desde"], nulo=0)
+        hasta = _dias(dim["valido_hasta"], nulo=DIA_MAXIMO)
+        orden = np.lexsort((desde, k_dim))
+        desde, hasta = desde[orden], hasta[orden]
+        unicas, primera, versiones = np.unique(k_dim[orden], return_index=True, return_counts=True)
+
+        pos = IndiceDimension(pd.DataFrame({self.clave: unicas}), self.clave).posiciones(claves)
+        dias = _dias(fechas, nulo=DIA_MAXIMO)
+        ok = pos >= 0
+        primera = np.where(ok, primera[pos], 0)
+        fila = primera.copy()
+        con_historia = np.flatnonzero(ok & (versiones[pos] > 1))
+        j = 1
+        while len(con_historia):
+            candidata = primera[con_historia] + j
+            avanza = dias[con_historia] >= desde[candidata]
+            fila[con_historia[avanza]] = candidata[avanza]
+            j += 1
+            con_historia = con_historia[avanza & (versiones[pos[con_historia]] > j)]
+
+        ok &= (dias >= desde[fila]) & (dias <= hasta[fila])
+        sk = dim[self.sustituta].to_numpy(dtype=np.int64)[orden][fila]
+        return pd.Series(pd.arrays.IntegerArray(np.where(ok, sk, 0), ~ok), index=indice,
+                         name=self.sustituta)
+
+CLIENTE = DimensionSCD("dim_cliente", "id_cliente", "sk_cliente",
+                       ["nombre_cliente", "edad", "ubicacion", "categoria"])
+PRODUCTO = DimensionSCD("dim_producto", "id_producto", "sk_producto",
+                        ["nombre_producto", "categoria", "proveedor"])
+
+
+def leer_dimension(carpeta, dimension: DimensionSCD) -> pd.DataFrame:
+    """Historia guardada en la zona curada; None si no existe o es anterior a SCD2."""
+    if not existe_tabla(carpeta, dimension.nombre):
+        return None
+    dim = leer_tabla(carpeta, dimension.nombre)
+    if list(dim.columns) != dimension.columnas:
+        return None
+    # Desde CSV las fechas llegan como texto (Parquet ya las trae tipadas)
+    for c in ("valido_desde", "valido_hasta"):
+        dim[c] = pd.to_datetime(dim[c])
+    return dim
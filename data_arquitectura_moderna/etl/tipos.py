@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Política de tipos compactos del ETL
+-----------------------------------
+Los mismos valores en menos memoria (y en archivos más chicos), aplicada igual por los
+scripts de limpieza, transformacion.py y crear_datamart.py:
+
+- CATEGORICAS: texto de baja cardinalidad (ubicación, categoría, proveedor, nombre de
+  producto) pasa a category: un código entero por fila y cada texto una sola vez
+- ENTERAS: ids, cantidad y edad bajan al entero con signo más chico que contiene su rango
+  (int8/16/32/64); si la columna admite nulos se usa la versión nullable (Int8, ...)
+- DECIMALES: monto/total siguen como float64 en memoria (las sumas no cambian), pero en
+  Parquet se guardan como decimal128(18, 2), es decir, centavos exactos. Solo se hace si
+  todos los valores tienen a lo más 2 decimales; si no, la columna se guarda como float64
+  para no redondear nada
+
+Las conversiones decimal <-> float se hacen vía centavos enteros y no con el cast de
+pyarrow (que no siempre devuelve el float más cercano): leer lo que se escribió devuelve
+exactamente los mismos float64.
+
+Uso:
+  antes = memoria_mb(df)
+  df = compactar(df)
+  reportar_memoria("ventas", antes, memoria_mb(df))
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORICAS = ("ubicacion", "categoria", "proveedor", "nombre_producto")
+ENTERAS = ("id_venta", "id_cliente", "id_producto", "id_sucursal", "id_tiempo", "sk_cliente",
+           "sk_producto", "cantidad", "edad")
+DECIMALES = {"monto": 2, "total": 2}
+PRECISION = 18
+
+
+def entero_minimo(s: pd.Series):
+    """Tipo entero más chico que contiene los valores de ``s``; None si no son enteros."""
+    if pd.api.types.is_bool_dtype(s) or not pd.api.types.is_numeric_dtype(s):
+        return None
+    validos = s.dropna()
+    if pd.api.types.is_float_dtype(s) and len(validos) and not (validos % 1 == 0).all():
+        return None
+    minimo, maximo = (int(validos.min()), int(validos.max())) if len(validos) else (0, 0)
+    for bits in (8, 16, 32, 64):
+        info = np.iinfo(f"int{bits}")
+        if info.min <= minimo and maximo <= info.max:
+            # Nullable si hay nulos o si ya lo era (todos los lotes con el mismo tipo)
+            nullable = s.hasnans or pd.api.types.is_extension_array_dtype(s)
+            return f"Int{bits}" if nullable else f"int{bits}"
+    return None
+
+
+def compactar(df: pd.DataFrame) -> pd.DataFrame:
+    """Aplica la política a las columnas presentes; el resto queda igual. No modifica ``df``."""
+    df = df.copy(deep=False)
+    for c in df.columns:
+        s = df[c]
+        if c in CATEGORICAS:
+            if pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+                df[c] = s.astype("category")
+        elif c in ENTERAS:
+            tipo = entero_minimo(s)
+            if tipo is not None and tipo != s.dtype:
+                df[c] = s.astype(tipo)
+    return df
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True, index=False).sum() / 1e6
+
+
+def reportar_memoria(nombre: str, antes_mb: float, despues_mb: float):
+    cambio = (despues_mb / antes_mb - 1) * 100 if antes_mb else 0.0
+    print(f"Memoria {nombre}: {antes_mb:,.1f} MB -> {despues_mb:,.1f} MB ({cambio:+.0f}%)")
+
+
+def compactar_reportando(nombre: str, df: pd.DataFrame) -> pd.DataFrame:
+    """compactar + reportar_memoria de la tabla."""
+    antes = memoria_mb(df)
+    df = compactar(df)
+    reportar_memoria(nombre, antes, memoria_mb(df))
+    return df
+
+
+def decimales_exactos(df: pd.DataFrame) -> dict:
+    """Columnas de DECIMALES que se pueden guardar en decimal sin perder nada -> escala."""
+    exactas = {}
+    for c, escala in DECIMALES.items():
+        if c not in df.columns or not pd.api.types.is_float_dtype(df[c]):
+            continue
+        x = df[c].to_numpy(dtype=np.float64, na_value=np.nan)
+        x = x[~np.isnan(x)]
+        factor = 10.0 ** escala
+        centavos = np.rint(x * factor)
+        if (np.abs(centavos) < 10.0 ** PRECISION).all() and (centavos / factor == x).all():
+            exactas[c] = escala
+    return exactas
+
+
+def _a_decimal(s: pd.Series, escala: int):
+    """float64 -> decimal128(PRECISION, escala) construido desde los centavos (sin redondeos)."""
+    import pyarrow as pa
+
+    x = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    nulos = np.isnan(x)
+    centavos = np.rint(np.where(nulos, 0, x) * 10.0 ** escala).astype(np.int64)
+    # decimal128 = entero de 128 bits little-endian: parte baja + extensión de signo
+    datos = np.empty((len(x), 2), dtype=np.int64)
+    datos[:, 0] = centavos
+    datos[:, 1] = centavos >> 63
+    validez = pa.array(~nulos).buffers()[1] if nulos.any() else None
+    return pa.Array.from_buffers(pa.decimal128(PRECISION, escala), len(x),
+                                 [validez, pa.py_buffer(datos)], null_count=int(nulos.sum()))
+
+
+def _desde_decimal(columna) -> np.ndarray:
+    """decimal128 (ChunkedArray) -> float64 exacto: centavos / 10**escala; nulos a NaN."""
+    escala = columna.type.scale
+    partes = []
+    for trozo in columna.chunks:
+        datos = np.frombuffer(trozo.buffers()[1], dtype=np.int64)
+        centavos = datos[2 * trozo.offset:2 * (trozo.offset + len(trozo)):2]
+        valores = centavos / 10.0 ** escala
+        if trozo.null_count:
+            valores[trozo.is_null().to_numpy(zero_copy_only=False)] = np.nan
+        partes.append(valores)
+    return np.concatenate(partes) if partes else np.empty(0, dtype=np.float64)
+
+
+def a_arrow(df: pd.DataFrame, decimales: dict = None):
+    """
+    Tabla pyarrow para escribir en Parquet, con las columnas de ``decimales`` (por defecto
+    decimales_exactos(df)) como decimal128. Al escribir particiones se calcula una vez para
+    toda la tabla, así todos los archivos comparten el esquema.
+    """
+    import pyarrow as pa
+
+    if decimales is None:
+        decimales = decimales_exactos(df)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    for c, escala in decimales.items():
+        if c in tabla.column_names:
+            i = tabla.column_names.index(c)
+            tabla = tabla.set_column(i, tabla.field(i).with_type(pa.decimal128(PRECISION, escala)),
+                                     _a_decimal(df[c], escala))
+    return tabla
+
+
+def desde_arrow(tabla) -> pd.DataFrame:
+    """DataFrame desde una tabla pyarrow, con las columnas decimales de vuelta a float64."""
+    import pyarrow as pa
+
+    for i, campo in enumerate(tabla.schema):
+        if pa.types.is_decimal128(campo.type):
+            tabla = tabla.set_column(i, pa.field(campo.name, pa.float64()),
+                                     pa.array(_desde_decimal(tabla.column(i)), from_pandas=True))
+    return tabla.to_pandas()
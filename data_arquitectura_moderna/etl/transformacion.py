@@ -1,56 +1,177 @@
+import argparse
 import pandas as pd
-from pathlib import Path
-
-BASE = Path(__file__).resolve().parents[1]
-raw = BASE / "datalake" / "datos_crudos"
-processed = BASE / "datalake" / "datos_procesados"
-curated = BASE / "datalake" / "datos_curados"
-
-processed.mkdir(parents=True, exist_ok=True)
-curated.mkdir(parents=True, exist_ok=True)
-
-clientes = pd.read_csv(processed / "clientes_limpio.csv")
-productos  = pd.read_csv(processed / "productos_limpio.csv")
-ventas   = pd.read_csv(processed / "ventas_limpio.csv", parse_dates=["fecha"])
-
-clientes["nombre_cliente"] = clientes["nombre"].str.strip()
-productos["nombre_producto"] = productos["nombre_producto"].str.strip()
-# Renombrar columnas
-clientes.rename(columns={'nombre': 'nombre_cliente'}, inplace=False)
-ventas.rename(columns={'id_sucursal': 'id_cliente'}, inplace=True)
-ventas.rename(columns={'monto': 'total'}, inplace=True)
-
-quality_report = pd.DataFrame({
-    "rows": [len(ventas)],
-    "null_cliente": [int(ventas["id_cliente"].isna().sum())],
-    "null_producto":  [int(ventas["id_producto"].isna().sum())],
-    "total_mismatch":[int(ventas["total"].sum())]
-})
-processed.mkdir(parents=True, exist_ok=True)
-quality_report.to_csv(processed / "quality_report.csv", index=False)
-
-# Dimensiones
-dim_cliente= clientes[["id_cliente","nombre_cliente","edad","ubicacion","categoria"]].drop_duplicates()
-dim_producto = productos[["id_producto","nombre_producto","categoria","proveedor"]].drop_duplicates()
-
-dim_tiempo = ventas[["fecha"]].drop_duplicates()
-dim_tiempo["anio"]  = dim_tiempo["fecha"].dt.year
-dim_tiempo["mes"] = dim_tiempo["fecha"].dt.month
-dim_tiempo["dia"]   = dim_tiempo["fecha"].dt.day
-dim_tiempo = dim_tiempo.sort_values("fecha").reset_index(drop=True)
-dim_tiempo["id_tiempo"] = (dim_tiempo["fecha"].dt.strftime("%Y%m%d")).astype(int)
-dim_tiempo = dim_tiempo[["id_tiempo","fecha","anio","mes","dia"]]
-
-ventas["id_tiempo"] = ventas["fecha"].dt.strftime("%Y%m%d").astype(int)
-# Hechos ventas
-hecho_ventas = ventas[[
-    "id_venta","id_cliente","id_producto","id_tiempo","cantidad","total"
-]].copy()
-
-dim_cliente.to_csv(curated / "dim_cliente.csv", index=False)
-dim_producto.to_csv(curated / "dim_producto.csv", index=False)
-dim_tiempo.to_csv(curated / "dim_tiempo.csv", index=False)
-hecho_ventas.to_csv(curated / "hecho_ventas.csv", index=False)
-
-print("Transformaciones listas ✅")
-print(f"Curated: {curated}")
+
+from almacen import (guardar_tabla, leer_tabla, guardada_como, existe_tabla, reemplazar_particiones,
+                     FORMATOS, DATALAKE)
+from metricas import instrumentar, etapa_actual
+from tipos import compactar, compactar_reportando
+from lotes import escribir_lote
+from calendario import asegurar_calendario, clave_tiempo
+from scd import CLIENTE, PRODUCTO, leer_dimension
+from indice_claves import IndiceClaves, INDICES
+
+raw = DATALAKE / "datos_crudos"
+processed = DATALAKE / "datos_procesados"
+curated = DATALAKE / "datos_curados"
+COLUMNAS_HECHO = ["id_venta","id_cliente","id_producto","sk_cliente","sk_producto","id_tiempo","cantidad","total"]
+
+def actualizar_dimension(dimension, entrante: pd.DataFrame, efectiva, formato: str):
+    """
+    SCD tipo 2 (etl/scd.py) contra la historia guardada. Retorna (dimensión, si hay que
+    guardarla): sin cambios y ya guardada en ``formato`` no se reescribe.
+    """
+    actual = leer_dimension(curated, dimension)
+    dim, cambios = dimension.actualizar(actual, entrante, efectiva)
+    print(f"{dimension.nombre}: {cambios['nuevas']} nuevas, {cambios['cambiadas']} con cambios, "
+          f"{cambios['sin_cambio']} sin cambio ({len(dim)} versiones)")
+    guardar = (actual is None or cambios["nuevas"] or cambios["cambiadas"]
+               or not guardada_como(curated, dimension.nombre, formato))
+    return dim, guardar
+
+def con_particiones(hechos: pd.DataFrame) -> pd.DataFrame:
+    """Hechos con anio/mes (derivados de id_tiempo yyyymmdd) para particionar."""
+    return hechos.assign(anio=hechos["id_tiempo"] // 10000, mes=hechos["id_tiempo"] // 100 % 100)
+
+def fusionar_hechos(nuevos: pd.DataFrame, formato: str) -> pd.DataFrame:
+    """
+    Agrega ``nuevos`` a hecho_ventas sin reemplazar la historia: descarta las id_venta ya
+    cargadas (índice persistente de etl/indice_claves.py, que se arma desde la zona curada
+    la primera vez) y reescribe solo las particiones anio/mes que reciben hechos (con
+    "ambos", los nuevos se agregan al final del CSV); en CSV, o si los hechos no caben en el
+    esquema guardado, reescribe la tabla completa. El índice se actualiza después de
+    escribir. Retorna los hechos completos de los meses tocados.
+    """
+    indice = IndiceClaves(INDICES, "id_venta")
+    if not indice.existe:
+        previas = (leer_tabla(curated, "hecho_ventas", columnas=["id_venta"])["id_venta"]
+                   if existe_tabla(curated, "hecho_ventas") else [])
+        indice.reconstruir(previas)
+    nuevos = nuevos[indice.aceptar(nuevos["id_venta"]).to_numpy()]
+    etapa_actual().regla("id_venta_ya_cargada", indice.conocidas)
+
+    meses = sorted((nuevos["id_tiempo"].dropna() // 100).astype(int).unique())
+    anios = sorted({m // 100 for m in meses})
+    if not meses and guardada_como(curated, "hecho_ventas", formato):
+        hechos = nuevos
+    elif meses and formato != "csv" and guardada_como(curated, "hecho_ventas", formato):
+        previas = leer_tabla(curated, "hecho_ventas", columnas=COLUMNAS_HECHO, filtros=[("anio", "in", anios)])
+        previas = previas[(previas["id_tiempo"] // 100).isin(meses)]
+        hechos = compactar(pd.concat([previas, nuevos], ignore_index=True))
+        if not reemplazar_particiones(con_particiones(hechos), curated, "hecho_ventas", ["anio","mes"]):
+            hechos = None
+        elif formato == "ambos":
+            escribir_lote(nuevos[COLUMNAS_HECHO], curated / "hecho_ventas.csv", primero=False)
+    else:
+        hechos = None
+    if hechos is None:
+        previas = (leer_tabla(curated, "hecho_ventas", columnas=COLUMNAS_HECHO)
+                   if existe_tabla(curated, "hecho_ventas") else nuevos.iloc[:0])
+        todas = compactar(pd.concat([previas, nuevos], ignore_index=True))
+        guardar_tabla(con_particiones(todas), curated, "hecho_ventas", particiones=["anio","mes"], formato=formato)
+        hechos = todas[(todas["id_tiempo"] // 100).isin(meses)].reset_index(drop=True)
+    nuevas = indice.guardar()
+    print(f"hecho_ventas: {indice.conocidas} ventas ya cargadas descartadas, {nuevas} nuevas "
+          f"en {len(meses)} meses")
+    return hechos
+
+@instrumentar("transformacion")
+def transformar(formato: str = "parquet", fecha_efectiva=None, fusionar: bool = False) -> dict:
+    """
+    Construye dimensiones y hechos, los guarda en la zona curada y los retorna por nombre.
+    ``fecha_efectiva`` (por defecto hoy) es desde cuándo valen los cambios de clientes y
+    productos de esta carga. Con ``fusionar`` los hechos de la carga se agregan a los ya
+    curados (fusionar_hechos) y hecho_ventas trae solo los meses tocados; si no, la carga
+    reemplaza hecho_ventas.
+    """
+    efectiva = pd.Timestamp(fecha_efectiva or pd.Timestamp.today()).normalize()
+    processed.mkdir(parents=True, exist_ok=True)
+    curated.mkdir(parents=True, exist_ok=True)
+
+    clientes = leer_tabla(processed, "clientes_limpio")
+    productos  = leer_tabla(processed, "productos_limpio")
+    ventas   = leer_tabla(processed, "ventas_limpio", parse_dates=["fecha"])
+    # Tipos compactos desde la lectura (tipos.py): categorías, enteros mínimos
+    clientes = compactar_reportando("clientes_limpio", clientes)
+    productos = compactar_reportando("productos_limpio", productos)
+    ventas = compactar_reportando("ventas_limpio", ventas)
+
+    clientes["nombre_cliente"] = clientes["nombre"].str.strip()
+    productos["nombre_producto"] = productos["nombre_producto"].str.strip()
+    # Renombrar columnas
+    clientes.rename(columns={'nombre': 'nombre_cliente'}, inplace=False)
+    ventas.rename(columns={'id_sucursal': 'id_cliente'}, inplace=True)
+    ventas.rename(columns={'monto': 'total'}, inplace=True)
+
+    quality_report = pd.DataFrame({
+        "rows": [len(ventas)],
+        "null_cliente": [int(ventas["id_cliente"].isna().sum())],
+        "null_producto":  [int(ventas["id_producto"].isna().sum())],
+        "total_mismatch":[int(ventas["total"].sum())]
+    })
+    processed.mkdir(parents=True, exist_ok=True)
+    quality_report.to_csv(processed / "quality_report.csv", index=False)
+
+    # Dimensiones con historia (SCD tipo 2): solo las filas nuevas o cambiadas generan versiones
+    dim_cliente, guardar_cliente = actualizar_dimension(
+        CLIENTE, clientes[["id_cliente","nombre_cliente","edad","ubicacion","categoria"]], efectiva, formato)
+    dim_producto, guardar_producto = actualizar_dimension(
+        PRODUCTO, productos[["id_producto","nombre_producto","categoria","proveedor"]], efectiva, formato)
+
+    # Calendario persistido (etl/calendario.py): se extiende solo si llegan años nuevos
+    dim_tiempo = asegurar_calendario(curated, ventas["fecha"], formato)
+
+    ventas["id_tiempo"] = clave_tiempo(ventas["fecha"])
+    # Cada venta apunta a la versión de cliente/producto vigente en su fecha
+    ventas["sk_cliente"] = CLIENTE.claves_vigentes(dim_cliente, ventas["id_cliente"], ventas["fecha"])
+    ventas["sk_producto"] = PRODUCTO.claves_vigentes(dim_producto, ventas["id_producto"], ventas["fecha"])
+    # Hechos ventas
+    hecho_ventas = ventas[COLUMNAS_HECHO].copy()
+
+    # Las tablas curadas salen con la misma política (en Parquet, total como decimal exacto)
+    dim_cliente = compactar_reportando("dim_cliente", dim_cliente)
+    dim_producto = compactar_reportando("dim_producto", dim_producto)
+    dim_tiempo = compactar_reportando("dim_tiempo", dim_tiempo)
+    hecho_ventas = compactar_reportando("hecho_ventas", hecho_ventas)
+
+    if guardar_cliente:
+        guardar_tabla(dim_cliente, curated, "dim_cliente", formato=formato)
+    if guardar_producto:
+        guardar_tabla(dim_producto, curated, "dim_producto", formato=formato)
+    registro = etapa_actual()
+    registro.filas(entrada=len(ventas), salida=len(hecho_ventas))
+    registro.regla("hecho_sin_sk_cliente", hecho_ventas["sk_cliente"].isna().sum())
+    registro.regla("hecho_sin_sk_producto", hecho_ventas["sk_producto"].isna().sum())
+    registro.regla("hecho_sin_fecha", hecho_ventas["id_tiempo"].isna().sum())
+
+    # Hechos particionados por anio/mes
+    if fusionar:
+        hecho_ventas = fusionar_hechos(hecho_ventas, formato)
+    else:
+        guardar_tabla(con_particiones(hecho_ventas), curated, "hecho_ventas", particiones=["anio","mes"],
+                      formato=formato)
+        indice = IndiceClaves(INDICES, "id_venta")
+        if indice.existe:
+            # La carga reemplazó los hechos: el índice vuelve a reflejar la zona curada
+            indice.reconstruir(hecho_ventas["id_venta"])
+    registro.anotar("filas_dimensiones", {"dim_cliente": len(dim_cliente),
+                                          "dim_producto": len(dim_producto),
+                                          "dim_tiempo": len(dim_tiempo)})
+
+    print("Transformaciones listas ✅")
+    print(f"Curated: {curated}")
+    return {"dim_cliente": dim_cliente, "dim_producto": dim_producto,
+            "dim_tiempo": dim_tiempo, "hecho_ventas": hecho_ventas}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formato", choices=FORMATOS, default="ambos",
+                        help="Formato de la zona curada (por defecto Parquet más los CSV entregables)")
+    parser.add_argument("--fecha-efectiva", dest="fecha_efectiva", default=None,
+                        help="YYYY-MM-DD desde la que valen los cambios de clientes/productos (por defecto hoy)")
+    parser.add_argument("--fusionar", action="store_true",
+                        help="Agregar los hechos a los ya curados (sin repetir id_venta) en vez de reemplazarlos")
+    args = parser.parse_args(argv)
+    transformar(args.formato, args.fecha_efectiva, args.fusionar)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Orquestador del pipeline completo (reemplaza la lógica de run_proyecto.bat)
+---------------------------------------------------------------------------
+Uso:
+  python pipeline.py [--workers N] [--sin-dw] [--incremental] [--formato parquet|csv|ambos]
+                     [--perfilar ETAPA [ETAPA ...]]
+
+Las etapas se declaran como un DAG y se ejecutan dentro de un único árbol de procesos:
+un pool de workers de larga vida (pandas/matplotlib se importan una vez por worker, no
+una vez por etapa) donde las etapas independientes corren en paralelo:
+
+  ingesta -> diagnostico_* (crudo)
+          -> limpia_* -> diagnostico_* (procesado)
+                      -> transformacion -> load_dw
+                                        -> crear_datamart -> visualiza
+
+limpia_ventas recibe ventas.csv y las particiones de datos_crudos/ventas/ (archivos
+diarios y por origen, ver etl/ingesta.py), que se limpian en paralelo.
+
+Con --incremental se procesa solo lo que aterrizó la ingesta de esta corrida: limpia_ventas
+recibe su resumen en memoria y limpia solo esos archivos (todo, si aún no hay hechos
+curados), transformacion los fusiona con los hechos curados sin repetir id_venta,
+load_dw hace upsert y crear_datamart refresca solo las particiones anio/mes tocadas
+(releyéndolas de la zona curada: la salida de transformacion trae solo esos meses).
+
+La salida de transformacion se entrega en memoria a load_dw y crear_datamart, y la de
+crear_datamart a visualiza; la zona procesada sigue pasando por disco porque es el
+contrato del datalake (y la leen también los diagnósticos).
+
+--formato es el de la zona curada y los Data Marts (transformacion y crear_datamart). Por
+defecto "ambos": las etapas leen Parquet y los CSV versionados del proyecto (tablas curadas
+y marts) se mantienen al día; "parquet" no escribe ni conserva los CSV.
+
+Al final se reporta el tiempo de cada etapa y el tiempo total del pipeline.
+La salida de los diagnósticos se agrega a run_log.txt, como hacía el .bat; como solo
+generan reportes, si uno falla el error queda en run_log.txt y el resto sigue.
+
+Cada corrida tiene un id (ETL_RUN_ID) y cada etapa agrega su línea a
+metricas/<id>.jsonl: tiempo de pared y de CPU, RSS pico, filas de entrada y salida,
+filas por regla de limpieza y bytes leídos/escritos (ver etl/metricas.py). Con
+--perfilar las etapas indicadas corren bajo cProfile (metricas/<id>_<etapa>.prof).
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent
+for _carpeta in ("etl", "scripts", "dw"):
+    sys.path.insert(0, str(BASE / _carpeta))
+from metricas import etapa, id_corrida, archivo_metricas, leer_metricas  # noqa: E402
+
+CARPETAS = ["datalake/datos_crudos", "datalake/datos_procesados", "datalake/datos_curados",
+            "datamart", "reportes_datos_crudos", "reportes_datos_procesados", "viz"]
+TABLAS = ["clientes", "productos", "ventas"]
+RUN_LOG = BASE / "run_log.txt"
+
+
+# ---------- Etapas (funciones de nivel módulo para poder enviarlas al pool) ----------
+def _ingesta():
+    return importlib.import_module("ingesta").ingestar()
+
+def _diagnostico(tabla, csv, carpeta):
+    importlib.import_module(f"diagnostico_{tabla}").main([csv, carpeta])
+
+def _limpieza(tabla, ingesta=None):
+    argv = []
+    limpia = importlib.import_module(f"limpia_{tabla}")
+    if tabla == "ventas":
+        almacen = importlib.import_module("almacen")
+        crudos = almacen.DATALAKE / "datos_crudos"
+        if ingesta is not None and almacen.existe_tabla(almacen.DATALAKE / "datos_curados", "hecho_ventas"):
+            # Incremental: solo los archivos de ventas nuevos o modificados en esta ingesta
+            argv = ["--in", *map(str, limpia.archivos_nuevos(ingesta))]
+        else:
+            # ventas.csv más las particiones diarias y por origen que aterrizó la ingesta
+            argv = ["--in", str(crudos / "ventas.csv")]
+            if (crudos / "ventas").is_dir():
+                argv.append(str(crudos / "ventas"))
+    limpia.main(argv)
+
+def _transformacion(fusionar=False, formato="parquet"):
+    return importlib.import_module("transformacion").transformar(formato, fusionar=fusionar)
+
+def _load_dw(incremental=False, transformacion=None):
+    load_dw = importlib.import_module("load_dw")
+    if incremental:
+        load_dw.cargar_incremental(transformacion)
+    else:
+        load_dw.cargar(transformacion)
+
+def _crear_datamart(incremental=False, formato="parquet", transformacion=None):
+    crear_datamart = importlib.import_module("crear_datamart")
+    if incremental:
+        return crear_datamart.refrescar_marts(formato)
+    return crear_datamart.crear_marts(formato, tablas=transformacion)
+
+def _visualiza(crear_datamart=None):
+    importlib.import_module("visualiza").graficar(crear_datamart)
+
+
+@dataclass
+class Etapa:
+    nombre: str
+    funcion: object
+    args: tuple = ()
+    depende: list = field(default_factory=list)
+    recibe: list = field(default_factory=list)   # dependencias cuya salida llega en memoria
+    a_log: bool = False                          # salida a run_log.txt en vez de consola
+    opcional: bool = False                       # si falla se informa y el pipeline sigue
+
+
+def construir_dag(con_dw: bool = True, incremental: bool = False, formato: str = "parquet") -> list:
+    etapas = [Etapa("ingesta", _ingesta)]
+    for t in TABLAS:
+        etapas.append(Etapa(f"diagnostico_crudo_{t}", _diagnostico,
+                            (t, f"datalake/datos_crudos/{t}.csv", "reportes_datos_crudos"),
+                            depende=["ingesta"], a_log=True, opcional=True))
+        etapas.append(Etapa(f"limpia_{t}", _limpieza, (t,), depende=["ingesta"],
+                            recibe=["ingesta"] if incremental and t == "ventas" else []))
+        etapas.append(Etapa(f"diagnostico_procesado_{t}", _diagnostico,
+                            (t, f"datalake/datos_procesados/{t}_limpio.csv", "reportes_datos_procesados"),
+                            depende=[f"limpia_{t}"], a_log=True, opcional=True))
+    etapas.append(Etapa("transformacion", _transformacion, (incremental, formato),
+                        depende=[f"limpia_{t}" for t in TABLAS]))
+    if con_dw:
+        etapas.append(Etapa("load_dw", _load_dw, (incremental,), depende=["transformacion"],
+                            recibe=["transformacion"]))
+    etapas.append(Etapa("crear_datamart", _crear_datamart, (incremental, formato),
+                        depende=["transformacion"], recibe=[] if incremental else ["transformacion"]))
+    etapas.append(Etapa("visualiza", _visualiza, depende=["crear_datamart"], recibe=["crear_datamart"]))
+    return etapas
+
+
+def _ejecutar(nombre, funcion, args, entradas, a_log):
+    """Corre una etapa en el worker. Retorna (ok, resultado o traceback, segundos, salida)."""
+    os.chdir(BASE)
+    buffer = io.StringIO()
+    inicio = time.perf_counter()
+    try:
+        # etapa(): la línea de métricas lleva el nombre del DAG (diagnostico_crudo_ventas, ...)
+        with contextlib.redirect_stdout(buffer), etapa(nombre):
+            resultado = funcion(*args, **entradas)
+        ok = True
+    except BaseException:  # incluye sys.exit() de los scripts
+        resultado, ok = traceback.format_exc(), False
+    segundos = time.perf_counter() - inicio
+    salida = buffer.getvalue()
+    if a_log:
+        with open(RUN_LOG, "a", encoding="utf-8") as f:
+            f.write(salida)
+        salida = ""
+    return ok, resultado, segundos, salida
+
+
+def correr(etapas: list, workers: int) -> dict:
+    por_nombre = {e.nombre: e for e in etapas}
+    consumidores = {e.nombre: sum(e.nombre in o.recibe for o in etapas) for e in etapas}
+    pendientes = dict(por_nombre)
+    hechas, resultados, tiempos = set(), {}, {}
+    en_curso, fallo, avisos = {}, None, []
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pendientes or en_curso:
+            if fallo is None:
+                listas = [e for e in pendientes.values() if all(d in hechas for d in e.depende)]
+                for e in listas:
+                    entradas = {d: resultados.get(d) for d in e.recibe}
+                    futuro = pool.submit(_ejecutar, e.nombre, e.funcion, e.args, entradas, e.a_log)
+                    en_curso[futuro] = (e, time.perf_counter())
+                    del pendientes[e.nombre]
+                    # La salida en memoria se libera cuando ya la tomaron todos sus consumidores
+                    for d in e.recibe:
+                        consumidores[d] -= 1
+                        if consumidores[d] == 0:
+                            resultados.pop(d, None)
+            if not en_curso:
+                break
+            terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                e, enviado = en_curso.pop(futuro)
+                ok, resultado, segundos, salida = futuro.result()
+                tiempos[e.nombre] = (segundos, time.perf_counter() - enviado)
+                if salida:
+                    print(salida, end="")
+                if not ok and e.opcional:
+                    # Solo reportes: el error queda en run_log.txt y nadie depende de su salida
+                    print(f"[error] {e.nombre} ({segundos:.2f}s): ver run_log.txt")
+                    with open(RUN_LOG, "a", encoding="utf-8") as f:
+                        f.write(f"==== Falló la etapa {e.nombre} ====\n{resultado}\n")
+                    avisos.append(e.nombre)
+                    hechas.add(e.nombre)
+                    continue
+                if not ok:
+                    print(f"==== Falló la etapa {e.nombre} ====\n{resultado}")
+                    fallo = e.nombre
+                    continue
+                print(f"[ok] {e.nombre} ({segundos:.2f}s)")
+                hechas.add(e.nombre)
+                if consumidores[e.nombre]:
+                    resultados[e.nombre] = resultado
+
+    total = time.perf_counter() - inicio
+    return {"tiempos": tiempos, "total": total, "fallo": fallo, "avisos": avisos,
+            "omitidas": sorted(pendientes) if fallo else []}
+
+
+def imprimir_resumen(resumen: dict):
+    metricas = {m["etapa"]: m for m in leer_metricas()}
+    print("\n=== Tiempos por etapa ===")
+    print(f"{'Etapa':<32}{'Ejecución (s)':>15}{'Pared (s)':>12}{'CPU (s)':>10}{'RSS (MB)':>10}")
+    for nombre, (ejec, pared) in sorted(resumen["tiempos"].items(), key=lambda kv: -kv[1][0]):
+        m = metricas.get(nombre, {})
+        cpu = f"{m['cpu_segundos']:.2f}" if m.get("cpu_segundos") is not None else "-"
+        rss = f"{m['rss_pico_mb']:.0f}" if m.get("rss_pico_mb") is not None else "-"
+        print(f"{nombre:<32}{ejec:>15.2f}{pared:>12.2f}{cpu:>10}{rss:>10}")
+    suma = sum(t[0] for t in resumen["tiempos"].values())
+    print(f"\nTiempo total del pipeline: {resumen['total']:.2f}s "
+          f"(suma de etapas: {suma:.2f}s)")
+    if resumen["omitidas"]:
+        print("Etapas no ejecutadas por el error:", ", ".join(resumen["omitidas"]))
+    if resumen["avisos"]:
+        print("Diagnósticos con error (ver run_log.txt):", ", ".join(resumen["avisos"]))
+    print(f"Métricas de la corrida {id_corrida()}: {archivo_metricas()}")
+
+
+def main(argv=None):
+    from almacen import FORMATOS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Procesos del pool (por defecto: uno por núcleo)")
+    parser.add_argument("--sin-dw", dest="sin_dw", action="store_true",
+                        help="Omitir la carga al Data Warehouse (sin PostgreSQL disponible)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Procesar solo lo nuevo de la ingesta y fusionarlo con lo ya cargado")
+    parser.add_argument("--formato", choices=FORMATOS, default="ambos",
+                        help="Formato de la zona curada y los Data Marts (por defecto Parquet más los CSV)")
+    parser.add_argument("--perfilar", nargs="+", default=None, metavar="ETAPA",
+                        help="Correr estas etapas bajo cProfile (nombres del DAG, o * para todas)")
+    args = parser.parse_args(argv)
+
+    # Antes de crear el pool: los workers heredan el id de corrida y las etapas a perfilar
+    id_corrida()
+    if args.perfilar:
+        os.environ["ETL_PERFILAR"] = ",".join(args.perfilar)
+
+    os.chdir(BASE)
+    for carpeta in CARPETAS:
+        (BASE / carpeta).mkdir(parents=True, exist_ok=True)
+
+    resumen = correr(construir_dag(con_dw=not args.sin_dw, incremental=args.incremental,
+                                   formato=args.formato), max(1, args.workers))
+    imprimir_resumen(resumen)
+    if resumen["fallo"]:
+        print("==== Ocurrió un error. Revisa el mensaje anterior y el archivo run_log.txt ====")
+        sys.exit(1)
+    print("\n==== Flujo completado con éxito ====")
+
+
+if __name__ == "__main__":
+    main()
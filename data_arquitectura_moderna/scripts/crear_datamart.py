@@ -1,33 +1,224 @@
 # scripts/crear_datamart.py
+"""
+Data Marts de ventas por categoría
+----------------------------------
+Uso:
+  python scripts/crear_datamart.py [--formato parquet|csv|ambos] [--modo completo|incremental]
+                                   [--verificar]
+
+Los hechos se agregan una sola vez en un cubo (scripts/cubo.py) al grano que piden los
+marts de MARTS, y cada mart es un rollup de ese cubo. El cubo se guarda como
+datamart/_cubo_ventas para el refresco incremental.
+
+- completo: relee todos los hechos y reconstruye el cubo y los marts desde cero
+- incremental: solo relee las particiones anio/mes de hecho_ventas que cambiaron desde el
+  último refresco (ver estado_marts.py), reemplaza sus filas en el cubo y vuelve a
+  derivar los marts
+- --verificar: tras el incremental, reconstruye en memoria y compara ambos resultados
+"""
+import argparse
+import sys
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
-curated = Path("datalake/datos_curados")
-datamart = Path("datamart")
-datamart.mkdir(exist_ok=True)
-
-# Carga datos curados generados por etl/transformacion.py
-hecho_ventas = pd.read_csv(curated / "hecho_ventas.csv")          # id_venta,id_cliente,id_producto,id_tiempo,cantidad,total
-dim_producto = pd.read_csv(curated / "dim_producto.csv")          # id_producto,nombre_producto,categoria,proveedor
-dim_tiempo = pd.read_csv(curated / "dim_tiempo.csv")              # id_tiempo,fecha,anio,mes,dia
-
-# Join para análisis
-df = (hecho_ventas
-      .merge(dim_producto[["id_producto","categoria"]], on="id_producto", how="left")
-      .merge(dim_tiempo[["id_tiempo","anio","mes"]], on="id_tiempo", how="left"))
-
-# Data Mart 1: ventas mensuales por categoría
-mart_mes_categoria = (df.groupby(["anio","mes","categoria"], as_index=False)
-                        .agg(total_ventas=("total","sum"),
-                             unidades=("cantidad","sum"))
-                        .sort_values(["anio","mes","categoria"]))
-mart_mes_categoria.to_csv(datamart / "mart_ventas_mes_categoria.csv", index=False)
-
-# Data Mart 2: ventas anuales por categoría
-mart_anio_categoria = (df.groupby(["anio","categoria"], as_index=False)
-                         .agg(total_ventas=("total","sum"),
-                              unidades=("cantidad","sum"))
-                         .sort_values(["anio","total_ventas"], ascending=[True, False]))
-mart_anio_categoria.to_csv(datamart / "mart_ventas_anio_categoria.csv", index=False)
-
-print("✅ Data Marts generados en", datamart.resolve())
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+from almacen import guardar_tabla, leer_tabla, existe_tabla, FORMATOS, DATALAKE, DATAMART  # noqa: E402
+import estado_marts  # noqa: E402
+from cubo import Cubo, ATRIBUTOS, columnas_necesarias  # noqa: E402
+from metricas import instrumentar, etapa_actual  # noqa: E402
+from tipos import compactar_reportando  # noqa: E402
+
+curated = DATALAKE / "datos_curados"
+datamart = DATAMART
+CUBO = "_cubo_ventas"
+
+# Cada mart: niveles del rollup, medidas y orden de salida. Un mart nuevo solo agrega una
+# entrada aquí; si usa atributos nuevos el grano del cubo se amplía (sigue siendo una pasada).
+MARTS = {
+    "mart_ventas_mes_categoria": {
+        "niveles": ["anio", "mes", "categoria"],
+        "medidas": ["total_ventas", "unidades"],
+        "orden": (["anio", "mes", "categoria"], True),
+    },
+    "mart_ventas_anio_categoria": {
+        "niveles": ["anio", "categoria"],
+        "medidas": ["total_ventas", "unidades"],
+        "orden": (["anio", "total_ventas"], [True, False]),
+    },
+}
+
+
+def grano(marts: dict = MARTS) -> list:
+    """Unión ordenada de los niveles de los marts; anio/mes siempre (particiones del refresco)."""
+    atributos = ["anio", "mes"]
+    for spec in marts.values():
+        atributos += [n for n in spec["niveles"] if n not in atributos]
+    return atributos
+
+
+def leer_insumos(atributos: list, tablas: dict = None, filtros=None):
+    """
+    Hechos y dimensiones con solo las columnas que necesita el cubo, con los tipos compactos
+    de tipos.py (las tablas en memoria de transformacion.py ya vienen así).
+    """
+    cols = columnas_necesarias(atributos)
+    if tablas is not None:
+        return tablas["hecho_ventas"], {d: tablas[d] for d in cols if d != "hecho_ventas"}
+    hechos = leer_tabla(curated, "hecho_ventas", columnas=cols["hecho_ventas"], filtros=filtros)
+    hechos = compactar_reportando("hecho_ventas", hechos)
+    dims = {d: compactar_reportando(d, leer_tabla(curated, d, columnas=c))
+            for d, c in cols.items() if d != "hecho_ventas"}
+    return hechos, dims
+
+
+def derivar_marts(cubo: Cubo, marts: dict = MARTS) -> dict:
+    resultado = {}
+    for nombre, spec in marts.items():
+        columnas, ascendente = spec["orden"]
+        resultado[nombre] = (cubo.enrollar(spec["niveles"], spec["medidas"])
+                             .sort_values(columnas, ascending=ascendente, ignore_index=True))
+    return resultado
+
+
+def guardar_marts(marts: dict, cubo: Cubo, formato: str):
+    for nombre, df in marts.items():
+        guardar_tabla(df, datamart, nombre, formato=formato)
+    guardar_tabla(cubo.base, datamart, CUBO, formato="csv" if formato == "csv" else "parquet")
+
+
+def atributos_producto(atributos: list) -> list:
+    return [ATRIBUTOS[a][2] for a in atributos if ATRIBUTOS[a][0] == "dim_producto"]
+
+
+def guardar_estado(hecho_ventas, dims: dict, atributos: list):
+    cols = atributos_producto(atributos)
+    cats = estado_marts.categorias(dims["dim_producto"], cols) if cols else {}
+    previas = (estado_marts.leer(datamart) or {}).get("particiones")
+    estado_marts.guardar(datamart, estado_marts.huellas_particiones(curated, previas=previas),
+                         estado_marts.productos_por_particion(hecho_ventas), cats)
+
+
+@instrumentar("crear_datamart")
+def crear_marts(formato: str = "parquet", tablas: dict = None) -> dict:
+    """
+    Genera los marts. ``tablas`` permite recibir en memoria la salida de transformacion.py;
+    si no se entrega se leen de la zona curada.
+    """
+    datamart.mkdir(exist_ok=True)
+    atributos = grano()
+
+    # Carga datos curados generados por etl/transformacion.py (solo las columnas que se usan)
+    hecho_ventas, dims = leer_insumos(atributos, tablas)
+
+    # Una pasada por los hechos; cada mart es un rollup del cubo
+    cubo = Cubo.construir(hecho_ventas, dims, atributos)
+    marts = derivar_marts(cubo)
+    guardar_marts(marts, cubo, formato)
+    guardar_estado(hecho_ventas, dims, atributos)
+    etapa_actual().filas(entrada=len(hecho_ventas), salida=sum(len(m) for m in marts.values()))
+
+    print("✅ Data Marts generados en", datamart.resolve())
+    return marts
+
+
+@instrumentar("crear_datamart")
+def refrescar_marts(formato: str = "parquet", tablas: dict = None) -> dict:
+    """
+    Refresco incremental: reemplaza en el cubo solo las particiones (anio, mes) afectadas y
+    vuelve a derivar los marts. Sin estado previo, sin cubo o con la zona curada en CSV
+    hace un completo.
+    """
+    atributos = grano()
+    estado = estado_marts.leer(datamart)
+    huellas = estado_marts.huellas_particiones(curated, previas=estado and estado["particiones"])
+    if estado is None or huellas is None or not existe_tabla(datamart, CUBO):
+        print("Sin estado de refresco previo: reconstrucción completa")
+        return crear_marts(formato, tablas)
+    if any(ATRIBUTOS[a][0] == "dim_cliente" for a in atributos):
+        # El estado solo sigue cambios de productos; con atributos de cliente no hay delta seguro
+        print("El cubo usa atributos de cliente: reconstrucción completa")
+        return crear_marts(formato, tablas)
+    cubo_previo = leer_tabla(datamart, CUBO)
+    if list(cubo_previo.columns[:len(atributos)]) != atributos:
+        print("El grano del cubo cambió: reconstrucción completa")
+        return crear_marts(formato, tablas)
+
+    _, dims = leer_insumos(atributos, tablas)
+    cols = atributos_producto(atributos)
+    cats = estado_marts.categorias(dims["dim_producto"], cols) if cols else {}
+    afectadas = estado_marts.particiones_afectadas(estado, huellas, cats)
+    if not afectadas:
+        print("Data Marts al día: no hay particiones nuevas ni modificadas")
+        return derivar_marts(Cubo(cubo_previo, atributos))
+
+    anios = sorted({a for a, _ in afectadas})
+    # Particiones como yyyymm (= id_tiempo // 100) para filtrar con aritmética entera
+    yyyymm = [a * 100 + m for a, m in afectadas]
+    if tablas is not None:
+        hechos = tablas["hecho_ventas"]
+    else:
+        # Solo se leen los años afectados (poda de carpetas anio=)
+        hechos, _ = leer_insumos(atributos, filtros=[("anio", "in", anios)])
+    hechos = hechos[(hechos["id_tiempo"] // 100).isin(yyyymm)]
+
+    # Delta: las filas del cubo de las particiones afectadas se reemplazan por las nuevas
+    parcial = Cubo.construir(hechos, dims, atributos).base
+    previas = ~(cubo_previo["anio"] * 100 + cubo_previo["mes"]).isin(yyyymm)
+    base = (pd.concat([cubo_previo[previas], parcial], ignore_index=True)
+              .sort_values(atributos, ignore_index=True))
+    cubo = Cubo(base, atributos)
+    marts = derivar_marts(cubo)
+    guardar_marts(marts, cubo, formato)
+
+    # Estado: productos de las particiones recalculadas, el resto se conserva
+    productos = {k: v["productos"] for k, v in estado["particiones"].items()}
+    productos.update(estado_marts.productos_por_particion(hechos))
+    for a, m in afectadas:
+        if estado_marts.clave_particion(a, m) not in huellas:
+            productos.pop(estado_marts.clave_particion(a, m), None)
+    estado_marts.guardar(datamart, huellas, productos, cats)
+    etapa_actual().filas(entrada=len(hechos), salida=sum(len(m) for m in marts.values()))
+    etapa_actual().anotar("particiones_refrescadas", len(afectadas))
+
+    print(f"✅ Data Marts refrescados: {len(afectadas)} particiones (anio/mes), "
+          f"años {', '.join(map(str, anios))}; {len(hechos)} filas de hechos releídas")
+    return marts
+
+
+def comparar(incremental: dict, completo: dict) -> bool:
+    """True si ambos juegos de marts coinciden (montos con tolerancia de redondeo)."""
+    ok = True
+    for nombre, spec in MARTS.items():
+        claves, medidas = spec["niveles"], spec["medidas"]
+        a = incremental[nombre].sort_values(claves, ignore_index=True)
+        b = completo[nombre].sort_values(claves, ignore_index=True)
+        iguales = (len(a) == len(b) and a[claves].astype(str).equals(b[claves].astype(str))
+                   and np.allclose(a[medidas].to_numpy(dtype=float, na_value=np.nan),
+                                   b[medidas].to_numpy(dtype=float, na_value=np.nan), equal_nan=True))
+        print(f"{nombre}: {'OK' if iguales else 'DIFERENTE'} ({len(a)} filas vs {len(b)})")
+        ok &= iguales
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formato", choices=FORMATOS, default="ambos",
+                        help="Formato de los marts (por defecto Parquet más los CSV entregables)")
+    parser.add_argument("--modo", choices=["completo", "incremental"], default="completo",
+                        help="incremental: solo particiones anio/mes cambiadas")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Modo incremental: comparar contra una reconstrucción completa en memoria")
+    args = parser.parse_args(argv)
+    if args.modo == "completo":
+        crear_marts(args.formato)
+        return
+    marts = refrescar_marts(args.formato)
+    if args.verificar:
+        atributos = grano()
+        hechos, dims = leer_insumos(atributos)
+        if not comparar(marts, derivar_marts(Cubo.construir(hechos, dims, atributos))):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# scripts/cubo.py
+"""
+Cubo de ventas: se agrega una vez al grano más fino y todo lo demás es un rollup
+--------------------------------------------------------------------------------
+Las medidas son aditivas (suma de total, suma de cantidad, cantidad de ventas), así que
+cualquier agregado más grueso se obtiene sumando el agregado fino, sin volver a pasar por
+los hechos. Agregar un mart nuevo cuesta un groupby sobre el cubo (cientos o miles de
+filas), no una pasada más por millones de hechos.
+
+Atributos disponibles por dimensión (JERARQUIAS):
+  tiempo:   anio > mes > dia          (dim_tiempo, por id_tiempo)
+  producto: categoria > proveedor     (dim_producto, por sk_producto)
+  cliente:  ubicacion > categoria_cliente   (dim_cliente.categoria, por sk_cliente)
+
+Producto y cliente se unen por clave sustituta (SCD tipo 2, etl/scd.py): cada venta toma
+los atributos de la versión vigente en su fecha.
+
+Uso:
+  cubo = Cubo.construir(hechos, dims, ["anio", "mes", "categoria"])
+  cubo.enrollar(["anio", "categoria"])            # un grouping set
+  cubo.conjuntos([["anio"], ["categoria"], []])   # varios (GROUPING SETS)
+  cubo.rollup("tiempo", "producto")               # todos los prefijos de las jerarquías
+
+El grano fino conserva las claves nulas (dropna=False) para que ningún hecho se pierda
+en los rollups; cada rollup, como los marts de siempre, descarta los grupos con clave nula.
+"""
+from itertools import product
+
+import pandas as pd
+
+from estrella import Estrella, IndiceDimension
+
+JERARQUIAS = {
+    "tiempo": ["anio", "mes", "dia"],
+    "producto": ["categoria", "proveedor"],
+    "cliente": ["ubicacion", "categoria_cliente"],
+}
+
+# atributo -> (dimensión, clave en hechos, columna en la dimensión)
+ATRIBUTOS = {
+    "anio": ("dim_tiempo", "id_tiempo", "anio"),
+    "mes": ("dim_tiempo", "id_tiempo", "mes"),
+    "dia": ("dim_tiempo", "id_tiempo", "dia"),
+    "categoria": ("dim_producto", "sk_producto", "categoria"),
+    "proveedor": ("dim_producto", "sk_producto", "proveedor"),
+    "ubicacion": ("dim_cliente", "sk_cliente", "ubicacion"),
+    "categoria_cliente": ("dim_cliente", "sk_cliente", "categoria"),
+}
+
+ATRIBUTOS_CLAVE = {dim: clave for dim, clave, _ in ATRIBUTOS.values()}
+MEDIDAS_HECHOS = ("total", "cantidad")
+
+MEDIDAS = {
+    "total_ventas": ("total", "sum"),
+    "unidades": ("cantidad", "sum"),
+    "n_ventas": ("total", "size"),
+}
+
+
+def columnas_necesarias(atributos: list) -> dict:
+    """Columnas a leer de hechos y de cada dimensión para construir el cubo."""
+    cols = {"hecho_ventas": list(MEDIDAS_HECHOS)}
+    for a in atributos:
+        dim, clave, col = ATRIBUTOS[a]
+        if clave not in cols["hecho_ventas"]:
+            cols["hecho_ventas"].append(clave)
+        cols.setdefault(dim, [clave])
+        if col not in cols[dim]:
+            cols[dim].append(col)
+    return cols
+
+
+def unir_atributos(hechos: pd.DataFrame, dims: dict, atributos: list,
+                   estrella: Estrella = None) -> pd.DataFrame:
+    """
+    Medidas de los hechos + los atributos pedidos, resueltos por índice posicional
+    (etl/estrella.py). Los hechos sin match quedan con atributos nulos, como un left merge.
+    """
+    if estrella is None:
+        usadas = dict.fromkeys(ATRIBUTOS[a][0] for a in atributos)
+        estrella = Estrella({d: IndiceDimension(dims[d], ATRIBUTOS_CLAVE[d]) for d in usadas})
+    pedidos = {a: (ATRIBUTOS[a][0], ATRIBUTOS[a][2]) for a in atributos}
+    return estrella.unir(hechos, list(MEDIDAS_HECHOS), pedidos, faltantes="nulo")
+
+
+class Cubo:
+    def __init__(self, base: pd.DataFrame, atributos: list):
+        self.base = base
+        self.atributos = list(atributos)
+
+    @classmethod
+    def construir(cls, hechos: pd.DataFrame, dims: dict, atributos: list,
+                  estrella: Estrella = None) -> "Cubo":
+        """Una sola pasada por los hechos: agrega al grano de ``atributos``."""
+        desconocidos = [a for a in atributos if a not in ATRIBUTOS]
+        if desconocidos:
+            raise ValueError(f"Atributos desconocidos: {desconocidos} (opciones: {list(ATRIBUTOS)})")
+        df = unir_atributos(hechos, dims, atributos, estrella)
+        base = (df.groupby(list(atributos), as_index=False, dropna=False, observed=True)
+                  .agg(**MEDIDAS))
+        return cls(base, atributos)
+
+    def enrollar(self, niveles: list, medidas: list = None) -> pd.DataFrame:
+        """Agregado por ``niveles`` (subconjunto del grano), sumando el cubo."""
+        niveles = list(niveles)
+        fuera = [n for n in niveles if n not in self.atributos]
+        if fuera:
+            raise ValueError(f"{fuera} no están en el grano del cubo {self.atributos}")
+        medidas = list(medidas or MEDIDAS)
+        if not niveles:
+            return self.base[medidas].sum().to_frame().T.astype(self.base[medidas].dtypes)
+        return self.base.groupby(niveles, as_index=False, observed=True)[medidas].sum()
+
+    def conjuntos(self, grupos: list, medidas: list = None) -> dict:
+        """GROUPING SETS: un agregado por cada lista de niveles."""
+        return {tuple(g): self.enrollar(g, medidas) for g in grupos}
+
+    def rollup(self, *dimensiones: str, medidas: list = None) -> dict:
+        """Combinaciones de prefijos de las jerarquías indicadas (limitadas al grano del cubo)."""
+        prefijos = []
+        for d in dimensiones:
+            niveles = [n for n in JERARQUIAS[d] if n in self.atributos]
+            prefijos.append([niveles[:i] for i in range(len(niveles) + 1)])
+        grupos = [sum(combinacion, []) for combinacion in product(*prefijos)]
+        return self.conjuntos(grupos, medidas)
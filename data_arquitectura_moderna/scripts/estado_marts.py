@@ -0,0 +1,124 @@
+# scripts/estado_marts.py
+"""
+Estado del refresco incremental de los Data Marts
+-------------------------------------------------
+Los hechos curados están particionados por anio/mes, y cada partición aporta exactamente
+las filas (anio, mes, *) de mart_ventas_mes_categoria. Por eso basta con saber qué
+particiones cambiaron desde el último refresco:
+
+- huella (sha256) de cada partición de hecho_ventas: Parquet se escribe de forma
+  determinista, así que una partición reescrita con los mismos datos no cuenta como cambio.
+  Junto a la huella se guarda el tamaño y mtime de sus archivos: si no cambiaron la huella
+  se reutiliza sin leerlos (como ingesta.cambio), así cada refresco solo hashea las
+  particiones escritas desde el anterior
+- productos presentes en cada partición y los atributos de cada producto que usa el cubo
+  (categoría, proveedor): si un producto cambia, las particiones donde aparece también
+  se recalculan. Los productos se identifican por clave sustituta (sk_producto): con SCD
+  tipo 2 un cambio normal abre una versión nueva y solo una corrección del mismo día
+  modifica los atributos de una versión existente
+
+El estado vive en datamart/_estado_marts.json y lo escribe crear_datamart.py después de
+cada reconstrucción completa o refresco incremental.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from ingesta import sha256
+
+ARCHIVO = "_estado_marts.json"
+
+
+def clave_particion(anio, mes) -> str:
+    return f"anio={int(anio)}/mes={int(mes)}"
+
+
+def huellas_particiones(curated: Path, nombre: str = "hecho_ventas", previas: dict = None) -> dict:
+    """
+    {"huella": sha256, "firma": nombre, tamaño y mtime de sus archivos} de cada partición
+    anio=/mes= de la tabla; None si la tabla no está particionada. Con ``previas`` (las
+    particiones del estado anterior) solo se hashean las particiones cuya firma cambió.
+    """
+    raiz = Path(curated) / nombre
+    if not raiz.is_dir():
+        return None
+    previas = previas or {}
+    huellas = {}
+    for carpeta in sorted(raiz.glob("anio=*/mes=*")):
+        archivos = sorted(carpeta.glob("*.parquet"))
+        if not archivos:
+            continue
+        clave = carpeta.relative_to(raiz).as_posix()
+        firma = ";".join(f"{a.name}:{st.st_size}:{st.st_mtime_ns}" for a, st in ((a, a.stat()) for a in archivos))
+        previa = previas.get(clave, {})
+        huella = previa["huella"] if previa.get("firma") == firma else "-".join(sha256(a) for a in archivos)
+        huellas[clave] = {"huella": huella, "firma": firma}
+    return huellas
+
+
+def _id(valor) -> str:
+    # 5, 5.0 y "5" son el mismo producto (según venga de Parquet, de CSV o con nulos)
+    try:
+        return str(int(float(valor)))
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+def categorias(dim_producto: pd.DataFrame, columnas=("categoria",)) -> dict:
+    """
+    sk_producto -> valores de los atributos de producto que usa el cubo (lista de textos,
+    para que sobreviva al JSON). Por defecto solo la categoría.
+    """
+    cats = {}
+    valores = dim_producto[list(columnas)].astype(object).where(dim_producto[list(columnas)].notna())
+    for k, fila in zip(dim_producto["sk_producto"], valores.itertuples(index=False)):
+        cats.setdefault(_id(k), set()).add("|".join("" if v is None else str(v) for v in fila))
+    return {k: sorted(v) for k, v in cats.items()}
+
+
+def productos_por_particion(hechos: pd.DataFrame) -> dict:
+    """Productos que aparecen en cada partición (anio/mes derivados de id_tiempo yyyymmdd)."""
+    anio = hechos["id_tiempo"] // 10000
+    mes = hechos["id_tiempo"] // 100 % 100
+    pares = pd.DataFrame({"anio": anio, "mes": mes, "sk_producto": hechos["sk_producto"]})
+    pares = pares.dropna().drop_duplicates()
+    return {clave_particion(a, m): sorted({_id(p) for p in g["sk_producto"]})
+            for (a, m), g in pares.groupby(["anio", "mes"])}
+
+
+def leer(datamart: Path) -> dict:
+    ruta = Path(datamart) / ARCHIVO
+    if ruta.exists():
+        return json.loads(ruta.read_text(encoding="utf-8"))
+    return None
+
+
+def guardar(datamart: Path, huellas: dict, productos: dict, cats: dict):
+    ruta = Path(datamart) / ARCHIVO
+    if huellas is None:
+        # Sin particiones (zona curada en CSV) no hay refresco incremental posible
+        ruta.unlink(missing_ok=True)
+        return
+    estado = {"particiones": {k: {**h, "productos": productos.get(k, [])}
+                              for k, h in huellas.items()},
+              "categorias": cats}
+    tmp = ruta.with_suffix(".tmp")
+    tmp.write_text(json.dumps(estado, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(ruta)
+
+
+def particiones_afectadas(estado: dict, huellas: dict, cats: dict) -> set:
+    """Particiones (anio, mes) nuevas, modificadas, borradas o con productos recategorizados."""
+    previas = estado["particiones"]
+    claves = {k for k in huellas.keys() | previas.keys()
+              if huellas.get(k, {}).get("huella") != previas.get(k, {}).get("huella")}
+
+    anteriores = estado["categorias"]
+    recategorizados = {p for p in cats.keys() | anteriores.keys()
+                       if cats.get(p) != anteriores.get(p)}
+    if recategorizados:
+        claves |= {k for k, info in previas.items() if k in huellas
+                   and not recategorizados.isdisjoint(info["productos"])}
+
+    return {tuple(int(v.split("=")[1]) for v in k.split("/")) for k in claves}
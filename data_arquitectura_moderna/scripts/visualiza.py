@@ -1,41 +1,146 @@
 # scripts/visualiza.py
-import pandas as pd
-import matplotlib.pyplot as plt
+"""
+Gráficos del Data Mart
+----------------------
+Uso:
+  python scripts/visualiza.py [--formatos png svg pdf] [--workers N] [--dpi 160]
+
+Un gráfico de línea con las ventas mensuales por categoría y uno de barras por año.
+
+Sin pyplot: cada gráfico se dibuja en una Figure con el canvas Agg (no interactivo, no
+necesita pantalla ni estado global) y cada proceso reutiliza una Figure por tamaño,
+limpiándola entre gráficos. Los gráficos se reparten en un pool de procesos (--workers, por
+defecto uno por núcleo; con 1 se dibujan en este proceso) y cada uno se guarda en todos los
+--formatos pedidos. Se informa el tiempo de cada gráfico.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-dm = Path("datamart")
-viz = Path("viz")
-viz.mkdir(exist_ok=True)
-
-# Gráfico 1: ventas mensuales por categoría (gráfico de línea por categoría)
-df = pd.read_csv(dm / "mart_ventas_mes_categoria.csv")  # año, mes, categoria, total_ventas, unidades
-df["yyyymm"] = df["anio"].astype(str) + "-" + df["mes"].astype(str).str.zfill(2)
-pivot = df.pivot_table(index="yyyymm", columns="categoria", values="total_ventas", aggfunc="sum").fillna(0)
-
-plt.figure(figsize=(10,6))
-for col in pivot.columns:
-    plt.plot(pivot.index, pivot[col], label=col)
-plt.title("Ventas por mes y categoría")
-plt.xlabel("Mes")
-plt.ylabel("Total ventas")
-plt.xticks(rotation=45)
-plt.legend()
-plt.tight_layout()
-plt.savefig(viz / "ventas_mes_categoria.png", dpi=160)
-plt.close()
-
-# Gráfico 2: Gráfico de barra por año (total categoría)
-annual = pd.read_csv(dm / "mart_ventas_anio_categoria.csv")
-for y in sorted(annual["anio"].unique()):
-    subset = annual[annual["anio"] == y].sort_values("total_ventas", ascending=False)
-    plt.figure(figsize=(8,5))
-    plt.bar(subset["categoria"], subset["total_ventas"])
-    plt.title(f"Ventas por categoría - {y}")
-    plt.xlabel("Categoría")
-    plt.ylabel("Total ventas")
-    plt.xticks(rotation=20)
-    plt.tight_layout()
-    plt.savefig(viz / f"ventas_categoria_{y}.png", dpi=160)
-    plt.close()
-
-print("✅ Gráficos generados en", viz.resolve())
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "etl"))
+from almacen import leer_tabla, BASE, DATAMART  # noqa: E402
+from metricas import instrumentar, etapa_actual, parcial  # noqa: E402
+
+dm = DATAMART
+viz = BASE / "viz"
+
+# Figuras de este proceso por tamaño (ancho, alto), reutilizadas entre gráficos
+_FIGURAS = {}
+
+
+def _figura(tamano: tuple) -> Figure:
+    fig = _FIGURAS.get(tamano)
+    if fig is None:
+        fig = _FIGURAS[tamano] = Figure(figsize=tamano)
+        FigureCanvasAgg(fig)
+    fig.clear()
+    return fig
+
+
+def linea_mensual(fig: Figure, pivot: pd.DataFrame):
+    """Gráfico 1: ventas mensuales por categoría (una línea por categoría)."""
+    ax = fig.add_subplot()
+    for col in pivot.columns:
+        ax.plot(pivot.index, pivot[col], label=col)
+    ax.set_title("Ventas por mes y categoría")
+    ax.set_xlabel("Mes")
+    ax.set_ylabel("Total ventas")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.legend()
+
+
+def barras_anio(fig: Figure, subset: pd.DataFrame, anio):
+    """Gráfico 2: total por categoría de un año."""
+    ax = fig.add_subplot()
+    ax.bar(subset["categoria"].astype(str), subset["total_ventas"])
+    ax.set_title(f"Ventas por categoría - {anio}")
+    ax.set_xlabel("Categoría")
+    ax.set_ylabel("Total ventas")
+    ax.tick_params(axis="x", labelrotation=20)
+
+
+def _dibujar(nombre: str, tamano: tuple, dibujo, args: tuple, destino: str, formatos: list,
+             dpi: int) -> dict:
+    """Dibuja un gráfico y lo guarda en cada formato (corre en un worker del pool)."""
+    with parcial(nombre) as registro:
+        inicio = time.perf_counter()
+        fig = _figura(tamano)
+        dibujo(fig, *args)
+        fig.tight_layout()
+        archivos = []
+        for formato in formatos:
+            ruta = Path(destino) / f"{nombre}.{formato}"
+            fig.savefig(ruta, format=formato, dpi=dpi)
+            archivos.append(ruta)
+        registro.escrito(*archivos)
+    return {"grafico": nombre, "segundos": time.perf_counter() - inicio, "archivos": archivos,
+            "registro": registro}
+
+
+def graficos(marts: dict) -> list:
+    """(nombre, tamaño, función de dibujo, argumentos) de cada gráfico a generar."""
+    df = marts.get("mart_ventas_mes_categoria")  # año, mes, categoria, total_ventas, unidades
+    df = df.copy() if df is not None else leer_tabla(dm, "mart_ventas_mes_categoria")
+    df["yyyymm"] = df["anio"].astype(str) + "-" + df["mes"].astype(str).str.zfill(2)
+    pivot = df.pivot_table(index="yyyymm", columns="categoria", values="total_ventas", aggfunc="sum",
+                           observed=True).fillna(0)
+    lista = [("ventas_mes_categoria", (10, 6), linea_mensual, (pivot,))]
+
+    annual = marts.get("mart_ventas_anio_categoria")
+    annual = annual if annual is not None else leer_tabla(dm, "mart_ventas_anio_categoria")
+    for y in sorted(annual["anio"].unique()):
+        subset = annual[annual["anio"] == y].sort_values("total_ventas", ascending=False)
+        lista.append((f"ventas_categoria_{y}", (8, 5), barras_anio, (subset[["categoria", "total_ventas"]], y)))
+    return lista
+
+
+@instrumentar("visualiza")
+def graficar(marts: dict = None, formatos=("png",), workers: int = None, dpi: int = 160) -> list:
+    """
+    Genera los gráficos; ``marts`` permite recibir en memoria la salida de crear_datamart.py.
+    Retorna el tiempo y los archivos de cada gráfico.
+    """
+    viz.mkdir(exist_ok=True)
+    lista = graficos(marts or {})
+    formatos = list(formatos)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(lista)))
+
+    inicio = time.perf_counter()
+    argumentos = [(nombre, tamano, dibujo, args, str(viz), formatos, dpi)
+                  for nombre, tamano, dibujo, args in lista]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            resultados = list(pool.map(_dibujar, *zip(*argumentos)))
+    else:
+        resultados = [_dibujar(*a) for a in argumentos]
+    pared = time.perf_counter() - inicio
+
+    registro = etapa_actual()
+    for r in resultados:
+        registro.sumar(r.pop("registro"))
+        print(f"  {r['grafico']:<30}{r['segundos']:>7.2f}s  ({', '.join(formatos)})")
+    registro.anotar("graficos_segundos", {r["grafico"]: round(r["segundos"], 3) for r in resultados})
+    print(f"✅ {len(resultados)} gráficos generados en {viz.resolve()} ({pared:.2f}s, {workers} workers)")
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--formatos", nargs="+", default=["png"],
+                        help="Formatos de salida de cada gráfico (png, svg, pdf, ...)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos para dibujar (por defecto: uno por núcleo)")
+    parser.add_argument("--dpi", type=int, default=160)
+    args = parser.parse_args(argv)
+    graficar(formatos=args.formatos, workers=args.workers, dpi=args.dpi)
+
+
+if __name__ == "__main__":
+    main()